@@ -12,7 +12,7 @@ DESCRIPTION:
 ================================================================================
 """
 # [NEW IMPORT]
-from backend.commodities import get_gold_price, get_silver_price
+from backend.commodities import get_metals_snapshot, get_metal_history, format_vnd_price, METALS
 
 import streamlit as st
 import sys
@@ -37,16 +37,30 @@ st.set_page_config(
 
 # Import Modules (Kèm xử lý lỗi nếu thiếu file)
 try:
-    from backend.data import get_pro_data, get_history_df, get_stock_news_google, get_stock_data_full, get_market_indices
+    from backend.data import iter_pro_data, order_radar_rows, merge_fundamentals, get_history_df, get_stock_news_google, get_stock_data_full, get_market_indices
     from backend.ai import run_monte_carlo, run_prophet_ai
     from backend.logic import analyze_smart_v36, analyze_fundamental
     from backend.stock_list import get_full_market_list
+    from backend.scanner import get_last_scan_report
     from frontend.ui import load_hardcore_css, render_header
     from frontend.components import render_interactive_chart, render_market_overview, render_analysis_section
+    from backend.cache import configure_cache
+    from backend.news_index import search_news
+    from backend.prewarm import start_prewarmer, record_view, prewarm_status
 except ImportError as e:
     st.error(f"❌ SYSTEM CRITICAL ERROR: MISSING MODULES. \n{e}")
     st.stop()
 
+# Khởi tạo 1 lần cho cả server (không chạy lại mỗi lần rerun):
+# - Cache của backend: UI mặc định dùng adapter Streamlit (TL_CACHE_BACKEND để đổi sang memory / disk / sqlite)
+# - Prewarm cache trước giờ mở cửa / sau khi đóng cửa HOSE (1 luồng nền, TL_PREWARM=0 để tắt)
+@st.cache_resource
+def _bootstrap_backend():
+    configure_cache(os.environ.get("TL_CACHE_BACKEND", "streamlit"))
+    return start_prewarmer()
+
+_bootstrap_backend()
+
 # ==============================================================================
 # 2. STATE MANAGEMENT (KHỞI TẠO BỘ NHỚ ĐỆM)
 # ==============================================================================
@@ -136,20 +150,30 @@ with st.sidebar:
     
     if count > 50: st.warning("⚠️ High load! Scan may be slow.")
 
-    # --- LOGIC QUÉT RADAR (FIXED) ---
-    # Khi bấm nút này, dữ liệu sẽ được lưu vào Session State
+    # --- LOGIC QUÉT RADAR (STREAMING) ---
+    # Khi bấm nút này, yêu cầu quét được ghi vào Session State.
+    # Khung Radar bên dưới sẽ stream kết quả theo từng chunk rồi lưu vào 'radar_data'.
     if st.button("EXECUTE SCAN", key="btn_scan", type="primary", use_container_width=True):
         ticker_list = [t.strip().upper() for t in user_tickers.split(',') if t.strip()]
         if ticker_list:
-            with st.spinner("SCANNING SECTOR... (THIS MAY TAKE TIME)"):
-                # Lưu kết quả vào biến toàn cục của phiên
-                st.session_state['radar_data'] = get_pro_data(ticker_list) 
-            st.success("SCAN COMPLETE.")
-            time.sleep(0.5)
-            st.rerun() # Reload để cập nhật giao diện
+            st.session_state['scan_request'] = ticker_list
         
     st.divider()
     
+    with st.expander("⏱ CACHE PREWARM"):
+        pw = prewarm_status()
+        if not pw["enabled"]:
+            st.caption("DISABLED (TL_PREWARM=0)")
+        elif pw["current"]:
+            st.caption(f"RUNNING: {pw['current']['label']} → {pw['current']['task'] or '...'}")
+        if pw["next_run"] is not None:
+            st.caption(f"NEXT: {pw['next_label']} @ {pw['next_run']:%a %d/%m %H:%M}")
+        if pw["top_symbols"]:
+            st.caption(f"TOP VIEWED: {', '.join(pw['top_symbols'])}")
+        for run in pw["runs"][:3]:
+            st.caption(f"{run['label']} @ {run['started']:%d/%m %H:%M} — {run['duration']}s")
+            st.dataframe(pd.DataFrame(run["tasks"]), hide_index=True, use_container_width=True)
+
     with st.expander("SYSTEM LOGS", expanded=True):
         st.markdown('<div style="font-family:monospace; font-size:10px; color:#555;">> SYSTEM_READY... OK<br>> DATABASE_LOADED... OK<br>> CACHE_CLEARED... OK</div>', unsafe_allow_html=True)
 
@@ -252,33 +276,76 @@ with main_tab1:
     col_radar, col_analyst = st.columns([1.5, 2.5])
 
     # === LEFT PANE: RADAR (HIỂN THỊ TỪ BỘ NHỚ) ===
+    def render_radar_table(df_radar):
+        # CHỈ LẤY NHỮNG CỘT CẦN THIẾT
+        df_display = df_radar[["Symbol", "Price", "Pct", "Signal", "Score", "Trend"]]
+
+        st.dataframe(
+            df_display,
+            column_config={
+                "Symbol": st.column_config.TextColumn("SYM", width="small", help="Mã cổ phiếu"),
+                "Price": st.column_config.NumberColumn("PRICE", format="%.2f", width="small"),
+                "Pct": st.column_config.NumberColumn("%", format="%.2f %%", width="small"),
+                "Signal": st.column_config.TextColumn("ACTION", width="medium"),
+                "Score": st.column_config.ProgressColumn("POWER", format="%d/10", min_value=0, max_value=10, width="medium"),
+                "Trend": st.column_config.LineChartColumn("MINI CHART", width="large")
+            },
+            hide_index=True,
+            use_container_width=True,
+            height=400 
+        )
+
     with col_radar:
         st.markdown('<div class="glass-box"><h4>📡 MARKET RADAR</h4>', unsafe_allow_html=True)
         
+        # --- STREAMING SCAN: Bảng & Galaxy được lấp đầy dần theo từng chunk ---
+        scan_request = st.session_state.pop('scan_request', None)
+        if scan_request:
+            status_slot = st.empty()
+            table_slot = st.empty()
+            galaxy_slot = st.empty()
+            status_slot.caption(f"SCANNING SECTOR... 0/{len(scan_request)} TARGETS")
+            
+            parts = []
+            for i, part in enumerate(iter_pro_data(scan_request)):
+                if part.empty: continue
+                parts.append(part)
+                df_partial = order_radar_rows(pd.concat(parts, ignore_index=True), scan_request)
+                status_slot.caption(f"SCANNING SECTOR... {len(df_partial)}/{len(scan_request)} TARGETS")
+                with table_slot.container(): render_radar_table(df_partial)
+                with galaxy_slot.container(): render_market_galaxy(df_partial, key=f"galaxy_stream_{i}")
+            
+            # Lưu kết quả vào biến toàn cục của phiên
+            st.session_state['radar_data'] = order_radar_rows(pd.concat(parts, ignore_index=True), scan_request) if parts else pd.DataFrame()
+            st.rerun() # Reload để cập nhật giao diện
+        
         df_radar = st.session_state['radar_data']
         
         if not df_radar.empty:
-            # CHỈ LẤY NHỮNG CỘT CẦN THIẾT
-            df_display = df_radar[["Symbol", "Price", "Pct", "Signal", "Score", "Trend"]]
-
-            st.dataframe(
-                df_display,
-                column_config={
-                    "Symbol": st.column_config.TextColumn("SYM", width="small", help="Mã cổ phiếu"),
-                    "Price": st.column_config.NumberColumn("PRICE", format="%.2f", width="small"),
-                    "Pct": st.column_config.NumberColumn("%", format="%.2f %%", width="small"),
-                    "Signal": st.column_config.TextColumn("ACTION", width="medium"),
-                    "Score": st.column_config.ProgressColumn("POWER", format="%d/10", min_value=0, max_value=10, width="medium"),
-                    "Trend": st.column_config.LineChartColumn("MINI CHART", width="large")
-                },
-                hide_index=True,
-                use_container_width=True,
-                height=400 
-            )
+            render_radar_table(df_radar)
 
             # 👉 HIỂN THỊ GALAXY 3D
             st.markdown("---") 
             render_market_galaxy(df_radar)
+
+            # Độ trễ / số request từng chunk của lượt tải gần nhất (tinh chỉnh TL_SCAN_CHUNK_SIZE)
+            scan_report = get_last_scan_report()
+            if scan_report:
+                with st.expander("📶 LAST SCAN DOWNLOAD"):
+                    report_df = pd.DataFrame(scan_report)
+                    st.caption(f"{len(report_df)} CHUNKS · {int(report_df['requests'].sum())} REQUESTS · "
+                               f"{int(report_df['received'].sum())}/{int(report_df['symbols'].sum())} SYMBOLS")
+                    st.dataframe(report_df.assign(latency=report_df['latency'].round(2),
+                                                  missing=report_df['missing'].map(", ".join)),
+                                 hide_index=True, use_container_width=True)
+
+            # Bộ lọc cơ bản (BCTC quý, kho chung với Deep Dive) join với Radar theo 'Symbol'
+            with st.expander("🧾 FUNDAMENTAL SCREEN"):
+                screen_scope = st.radio("SCOPE", ["RADAR", "HOSE", "HNX", "UPCOM"], horizontal=True, key="screen_scope")
+                if st.toggle("LOAD FUNDAMENTALS", key="screen_load"):
+                    df_screen = merge_fundamentals(df_radar, None if screen_scope == "RADAR" else screen_scope)
+                    st.dataframe(df_screen, hide_index=True, use_container_width=True,
+                                 column_config={"F-Score": st.column_config.ProgressColumn("F-SCORE", format="%d/10", min_value=0, max_value=10)})
             
         else:
             # Nếu chưa có dữ liệu
@@ -304,6 +371,10 @@ with main_tab1:
 
         if target_symbol:
             st.markdown(f"<h1 style='color:#00f3ff; margin-top:-10px; font-family:Rajdhani; text-shadow:0 0 10px #00f3ff;'>{target_symbol} // DEEP DIVE</h1>", unsafe_allow_html=True)
+            # Đếm lượt xem (1 lần mỗi khi đổi mã, không tính rerun) -> prewarm các mã xem nhiều nhất
+            if st.session_state.get('last_viewed') != target_symbol:
+                st.session_state['last_viewed'] = target_symbol
+                record_view(target_symbol)
             
             # Phần xử lý dữ liệu chi tiết cho 1 mã
             hist_df = get_history_df(target_symbol)
@@ -384,6 +455,15 @@ with main_tab1:
                 if news:
                     for n in news: st.markdown(f"- [{n['title']}]({n['link']})")
                 else: st.info("NO NEWS DATA.")
+
+                # Tìm trong kho tin local (không gọi RSS): toàn watchlist, 7 ngày gần nhất
+                news_query = st.text_input("🔎 SEARCH NEWS (WATCHLIST · 7D)", key="news_query", placeholder="cổ tức")
+                if news_query:
+                    watchlist = [t.strip().upper() for t in st.session_state['scan_list'].split(',') if t.strip()]
+                    hits = search_news(news_query, symbols=watchlist + [target_symbol], days=7)
+                    if hits:
+                        for n in hits: st.markdown(f"- `{', '.join(n['symbols'])}` [{n['title']}]({n['link']}) · {n['published']}")
+                    else: st.info("NO MATCHING NEWS.")
                 
             # TAB 6: FINANCE
             with t6:
@@ -412,8 +492,16 @@ with main_tab2:
     with c_title:
         st.markdown("### 🏆 PRECIOUS METALS (REAL-TIME)")
     with c_btn:
-        if st.button("🔄 CẬP NHẬT (LIVE)", type="primary", use_container_width=True):
-            st.rerun()
+        force_metals = st.button("🔄 CẬP NHẬT (LIVE)", type="primary", use_container_width=True)
+
+    # Snapshot dùng chung (cache + tải song song); nguồn lỗi -> hiển thị bản tốt gần nhất
+    metals = get_metals_snapshot(force=force_metals)
+
+    def render_metal_status(snap):
+        if snap["fetched_at"] is None: return
+        updated = time.strftime("%H:%M:%S %d/%m", time.localtime(snap["fetched_at"]))
+        if snap["ok"]: st.caption(f"🟢 Cập nhật lúc {updated}")
+        else: st.caption(f"🟠 Nguồn lỗi ({snap['error']}) — đang hiển thị bản lúc {updated}")
 
     col_gold, col_silver = st.columns(2)
     
@@ -421,12 +509,14 @@ with main_tab2:
     with col_gold:
         st.markdown("""<div style='background: linear-gradient(45deg, #FFD700, #B8860B); padding: 10px; border-radius: 5px; color: black; font-weight: bold; text-align: center; margin-bottom: 10px;'>👑 GOLD PRICE (WEB-GIA)</div>""", unsafe_allow_html=True)
         
-        df_gold = get_gold_price()
+        df_gold = metals["gold"]["data"]
+        render_metal_status(metals["gold"])
         
         # [CHECK] Nếu có dữ liệu thì hiện bảng, không thì báo lỗi
         if not df_gold.empty:
+            # Dữ liệu giá là số nguyên; chỉ format kiểu VNĐ lúc hiển thị
             st.dataframe(
-                df_gold,
+                df_gold.assign(**{c: df_gold[c].map(format_vnd_price) for c in ("Mua vào", "Bán ra")}),
                 column_config={
                     "Loại vàng": st.column_config.TextColumn("Loại Vàng", width="medium"),
                     "Mua vào": st.column_config.TextColumn("Giá Mua", width="small"),
@@ -442,12 +532,13 @@ with main_tab2:
     with col_silver:
         st.markdown("""<div style='background: linear-gradient(45deg, #C0C0C0, #708090); padding: 10px; border-radius: 5px; color: black; font-weight: bold; text-align: center; margin-bottom: 10px;'>🥈 SILVER PRICE (PHU QUY)</div>""", unsafe_allow_html=True)
         
-        df_silver = get_silver_price()
+        df_silver = metals["silver"]["data"]
+        render_metal_status(metals["silver"])
         
         # [CHECK]
         if not df_silver.empty:
             st.dataframe(
-                df_silver,
+                df_silver.assign(**{c: df_silver[c].map(format_vnd_price) for c in ("GIÁ MUA VÀO", "GIÁ BÁN RA")}),
                 column_config={
                     "SẢN PHẨM": st.column_config.TextColumn("Sản Phẩm", width="medium"),
                     "ĐƠN VỊ": st.column_config.TextColumn("ĐVT", width="small"),
@@ -461,7 +552,21 @@ with main_tab2:
             st.caption("Không thể kết nối đến máy chủ Phu Quy Group.")
     
     st.markdown("---")
-    st.caption("ℹ️ Chế độ Strict Mode: Chỉ hiển thị dữ liệu thực tế tại thời điểm bấm nút.")
+
+    # --- 3. LỊCH SỬ CHÊNH LỆCH MUA/BÁN (đọc từ chuỗi snapshot trên đĩa) ---
+    with st.expander("📈 LỊCH SỬ GIÁ & CHÊNH LỆCH MUA/BÁN"):
+        c_metal, c_product = st.columns([1, 3])
+        with c_metal:
+            metal_key = st.selectbox("KIM LOẠI", ["gold", "silver"], format_func=lambda m: "VÀNG" if m == "gold" else "BẠC", key="metal_hist")
+        with c_product:
+            products = METALS.products(metal_key)
+            product = st.selectbox("SẢN PHẨM", products, key="metal_product") if products else None
+        hist = get_metal_history(metal_key, product=product, days=90) if product else pd.DataFrame()
+        if not hist.empty:
+            st.line_chart(hist.set_index("ts")[["buy", "sell", "spread"]], use_container_width=True)
+        else: st.info("CHƯA CÓ LỊCH SỬ SNAPSHOT.")
+
+    st.caption(f"ℹ️ Giá được cache {METALS.ttl // 60} phút và làm mới ở nền; bấm CẬP NHẬT để tải ngay.")
     st.markdown('</div>', unsafe_allow_html=True)
 
 st.markdown('<div style="text-align:center; color:#444; font-size:10px; margin-top:50px;">THANG LONG TERMINAL SYSTEM V36.7 // ENCRYPTED</div>', unsafe_allow_html=True)
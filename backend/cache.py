@@ -0,0 +1,531 @@
+"""
+================================================================================
+MODULE: backend/cache.py
+PROJECT: THANG LONG TERMINAL (ENTERPRISE EDITION)
+DESCRIPTION:
+    Stale-While-Revalidate Cache (Bộ nhớ đệm "trả cũ - làm mới ngầm").
+    - soft_ttl: quá hạn mềm -> trả ngay giá trị cũ, làm mới trên luồng nền.
+    - hard_ttl: quá hạn cứng -> bắt buộc chờ tải lại (dữ liệu quá cũ để hiển thị).
+    - Giới hạn số entry, loại bỏ theo LRU.
+    - Trả về bản sao (copy-on-return) để phía gọi sửa DataFrame không làm hỏng cache.
+    - Kho lưu cắm rời (CacheBackend): bộ nhớ LRU, ổ đĩa, SQLite dùng chung nhiều replica,
+      hoặc adapter Streamlit.
+      Không import Streamlit -> batch job / worker / test dùng chung engine mà không
+      phải nạp runtime Streamlit.
+================================================================================
+"""
+
+import os
+import copy
+import time
+import pickle
+import sqlite3
+import hashlib
+import logging
+import functools
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from backend.store import CACHE_ROOT
+
+logger = logging.getLogger("ThangLongCache")
+
+# Luồng nền dùng chung cho việc làm mới (giới hạn để không dội bom nguồn dữ liệu)
+_REFRESH_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="tl-swr")
+
+# Entry lưu trong backend: (value, soft_expiry, hard_expiry) - epoch giây
+Entry = Tuple[Any, float, float]
+
+# ==============================================================================
+# 1. CACHE BACKENDS (Kho lưu cắm rời)
+# ==============================================================================
+
+class CacheBackend:
+    """
+    Giao diện kho lưu entry cho swr_cache. Mỗi hàm được cache là 1 namespace.
+    - copies = True nếu get() đã trả về bản sao độc lập (không cần deepcopy thêm).
+    - acquire/release: khóa làm mới dùng chung giữa các tiến trình (backend trong 1 tiến trình
+      không cần khóa vì đã có single-flight).
+    """
+    copies = False
+
+    def get(self, namespace: str, key: Hashable) -> Optional[Entry]:
+        raise NotImplementedError
+
+    def set(self, namespace: str, key: Hashable, entry: Entry, max_entries: int) -> None:
+        raise NotImplementedError
+
+    def clear(self, namespace: Optional[str] = None) -> None:
+        raise NotImplementedError
+
+    def size(self, namespace: str) -> int:
+        raise NotImplementedError
+
+    def delete(self, namespace: str, key: Hashable) -> None:
+        raise NotImplementedError
+
+    def acquire(self, namespace: str, key: Hashable, ttl: float) -> bool:
+        return True
+
+    def release(self, namespace: str, key: Hashable) -> None:
+        pass
+
+class MemoryBackend(CacheBackend):
+    """LRU trong bộ nhớ tiến trình (mặc định)."""
+    def __init__(self):
+        self._data: Dict[str, "OrderedDict[Hashable, Entry]"] = {}
+        self._lock = threading.Lock()
+
+    def get(self, namespace, key):
+        with self._lock:
+            space = self._data.get(namespace)
+            if space is None or key not in space: return None
+            space.move_to_end(key)
+            return space[key]
+
+    def set(self, namespace, key, entry, max_entries):
+        with self._lock:
+            space = self._data.setdefault(namespace, OrderedDict())
+            space[key] = entry
+            space.move_to_end(key)
+            while len(space) > max_entries:
+                space.popitem(last=False)
+
+    def clear(self, namespace=None):
+        with self._lock:
+            if namespace is None: self._data.clear()
+            else: self._data.pop(namespace, None)
+
+    def size(self, namespace):
+        with self._lock:
+            return len(self._data.get(namespace, ()))
+
+    def delete(self, namespace, key):
+        with self._lock:
+            self._data.get(namespace, {}).pop(key, None)
+
+def _key_digest(key: Hashable) -> str:
+    return hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+
+class DiskBackend(CacheBackend):
+    """
+    Mỗi entry = 1 file pickle trong CACHE_ROOT/swr/<namespace>/, ghi atomic (file tạm + os.replace).
+    Sống sót qua restart; LRU theo thời điểm truy cập (mtime).
+    """
+    copies = True
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = os.path.join(root or CACHE_ROOT, "swr")
+
+    def _path(self, namespace: str, key: Hashable) -> str:
+        return os.path.join(self.root, namespace, f"{_key_digest(key)}.pkl")
+
+    def get(self, namespace, key):
+        path = self._path(namespace, key)
+        try:
+            with open(path, "rb") as f:
+                stored_key, entry = pickle.load(f)
+            if stored_key != key: return None
+            os.utime(path, None)
+            return entry
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Corrupted cache file {path}: {e}")
+            return None
+
+    def set(self, namespace, key, entry, max_entries):
+        path = self._path(namespace, key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump((key, entry), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+            self._evict(os.path.dirname(path), max_entries)
+        except Exception as e:
+            # Không ghi được đĩa thì bỏ qua (cache chỉ là lớp tăng tốc)
+            logger.warning(f"Cannot persist cache entry {namespace}: {e}")
+
+    def _evict(self, folder: str, max_entries: int) -> None:
+        files = [os.path.join(folder, f) for f in os.listdir(folder) if f.endswith(".pkl")]
+        if len(files) <= max_entries: return
+        files.sort(key=lambda p: os.path.getmtime(p))
+        for path in files[:len(files) - max_entries]:
+            try: os.remove(path)
+            except OSError: pass
+
+    def clear(self, namespace=None):
+        folders = [os.path.join(self.root, namespace)] if namespace else (
+            [os.path.join(self.root, d) for d in os.listdir(self.root)] if os.path.isdir(self.root) else [])
+        for folder in folders:
+            if not os.path.isdir(folder): continue
+            for f in os.listdir(folder):
+                try: os.remove(os.path.join(folder, f))
+                except OSError: pass
+
+    def size(self, namespace):
+        folder = os.path.join(self.root, namespace)
+        return len([f for f in os.listdir(folder) if f.endswith(".pkl")]) if os.path.isdir(folder) else 0
+
+    def delete(self, namespace, key):
+        try: os.remove(self._path(namespace, key))
+        except OSError: pass
+
+class SQLiteBackend(CacheBackend):
+    """
+    Kho SQLite (WAL) dùng chung cho nhiều replica trên cùng 1 máy.
+    - WAL: nhiều tiến trình đọc song song trong lúc 1 tiến trình ghi.
+    - Bảng locks: khóa làm mới có hạn (ttl) -> chỉ 1 replica gọi Yahoo cho mỗi entry,
+      replica chết giữa chừng thì khóa tự hết hạn.
+    """
+    copies = True
+    TOUCH_INTERVAL = 60     # Giây; giảm số lần ghi khi chỉ đọc (cập nhật thời điểm truy cập cho LRU)
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(CACHE_ROOT, "swr.sqlite")
+        self.owner = f"{os.getpid()}-{id(self)}"
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._conn() as conn:
+            conn.execute("""CREATE TABLE IF NOT EXISTS entries (
+                namespace TEXT, key TEXT, key_repr TEXT, value BLOB,
+                soft REAL, hard REAL, accessed REAL, PRIMARY KEY (namespace, key))""")
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries (namespace, accessed)")
+            conn.execute("""CREATE TABLE IF NOT EXISTS locks (
+                namespace TEXT, key TEXT, owner TEXT, expires REAL, PRIMARY KEY (namespace, key))""")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, namespace, key):
+        key_repr = repr(key)
+        try:
+            row = self._conn().execute(
+                "SELECT key_repr, value, soft, hard, accessed FROM entries WHERE namespace=? AND key=?",
+                (namespace, _key_digest(key))).fetchone()
+            if row is None or row[0] != key_repr: return None
+            now = time.time()
+            if now - row[4] > self.TOUCH_INTERVAL:
+                self._conn().execute("UPDATE entries SET accessed=? WHERE namespace=? AND key=?",
+                                     (now, namespace, _key_digest(key)))
+            return pickle.loads(row[1]), row[2], row[3]
+        except Exception as e:
+            logger.warning(f"SQLite cache read failed ({namespace}): {e}")
+            return None
+
+    def set(self, namespace, key, entry, max_entries):
+        value, soft, hard = entry
+        try:
+            blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+                             (namespace, _key_digest(key), repr(key), blob, soft, hard, time.time()))
+                conn.execute("""DELETE FROM entries WHERE namespace=? AND key NOT IN (
+                    SELECT key FROM entries WHERE namespace=? ORDER BY accessed DESC LIMIT ?)""",
+                             (namespace, namespace, max_entries))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        except Exception as e:
+            logger.warning(f"SQLite cache write failed ({namespace}): {e}")
+
+    def clear(self, namespace=None):
+        try:
+            if namespace is None: self._conn().execute("DELETE FROM entries")
+            else: self._conn().execute("DELETE FROM entries WHERE namespace=?", (namespace,))
+        except Exception as e:
+            logger.warning(f"SQLite cache clear failed ({namespace}): {e}")
+
+    def size(self, namespace):
+        try:
+            return self._conn().execute("SELECT COUNT(*) FROM entries WHERE namespace=?", (namespace,)).fetchone()[0]
+        except Exception as e:
+            logger.warning(f"SQLite cache size failed ({namespace}): {e}")
+            return 0
+
+    def delete(self, namespace, key):
+        try:
+            self._conn().execute("DELETE FROM entries WHERE namespace=? AND key=?", (namespace, _key_digest(key)))
+        except Exception as e:
+            logger.warning(f"SQLite cache delete failed ({namespace}): {e}")
+
+    def acquire(self, namespace, key, ttl):
+        now = time.time()
+        try:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM locks WHERE namespace=? AND key=? AND expires<?",
+                             (namespace, _key_digest(key), now))
+                cur = conn.execute("INSERT OR IGNORE INTO locks VALUES (?, ?, ?, ?)",
+                                   (namespace, _key_digest(key), self.owner, now + ttl))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            return cur.rowcount == 1
+        except Exception as e:
+            # Lỗi khóa -> vẫn cho tự tải (chậm hơn còn hơn treo)
+            logger.warning(f"SQLite cache lock failed ({namespace}): {e}")
+            return True
+
+    def release(self, namespace, key):
+        try:
+            self._conn().execute("DELETE FROM locks WHERE namespace=? AND key=? AND owner=?",
+                                 (namespace, _key_digest(key), self.owner))
+        except Exception as e:
+            logger.warning(f"SQLite cache unlock failed ({namespace}): {e}")
+
+class StreamlitBackend(CacheBackend):
+    """
+    Adapter Streamlit: entry nằm trong 1 MemoryBackend do st.cache_resource giữ,
+    nên nút "Clear cache" của Streamlit cũng xóa được. Chỉ import Streamlit khi dùng tới.
+    """
+    def __init__(self):
+        import streamlit as st
+
+        @st.cache_resource(show_spinner=False)
+        def _shared_backend() -> MemoryBackend:
+            return MemoryBackend()
+
+        self._resolve = _shared_backend
+
+    def get(self, namespace, key): return self._resolve().get(namespace, key)
+    def set(self, namespace, key, entry, max_entries): self._resolve().set(namespace, key, entry, max_entries)
+    def clear(self, namespace=None): self._resolve().clear(namespace)
+    def size(self, namespace): return self._resolve().size(namespace)
+    def delete(self, namespace, key): self._resolve().delete(namespace, key)
+
+# Backend mặc định: chọn bằng TL_CACHE_BACKEND (memory | disk | sqlite | streamlit) hoặc configure_cache()
+BACKENDS: Dict[str, Callable[[], CacheBackend]] = {
+    "memory": MemoryBackend,
+    "disk": DiskBackend,
+    "sqlite": SQLiteBackend,
+    "streamlit": StreamlitBackend,
+}
+_default_backend: Optional[CacheBackend] = None
+_backend_lock = threading.Lock()
+
+def configure_cache(backend) -> CacheBackend:
+    """
+    Đặt backend mặc định cho mọi swr_cache chưa gán backend riêng (tên hoặc instance).
+    Truyền tên trùng loại backend đang dùng -> giữ nguyên instance cũ (không mở lại kết nối,
+    luồng làm mới nền và UI dùng chung 1 kho).
+    """
+    global _default_backend
+    with _backend_lock:
+        if isinstance(backend, str):
+            if backend not in BACKENDS:
+                raise ValueError(f"Unknown cache backend: {backend}")
+            if type(_default_backend) is BACKENDS[backend]:
+                return _default_backend
+            backend = BACKENDS[backend]()
+        _default_backend = backend
+    return backend
+
+def get_default_backend() -> CacheBackend:
+    global _default_backend
+    with _backend_lock:
+        if _default_backend is None:
+            name = os.environ.get("TL_CACHE_BACKEND", "memory")
+            _default_backend = BACKENDS.get(name, MemoryBackend)()
+        return _default_backend
+
+# ==============================================================================
+# 2. SWR CACHE
+# ==============================================================================
+
+class SWRCache:
+    """Logic stale-while-revalidate cho 1 hàm được decorate, lưu entry qua CacheBackend."""
+    LOCK_POLL = 0.25    # Giây giữa 2 lần kiểm tra kết quả của replica đang giữ khóa
+
+    def __init__(self, func: Callable, soft_ttl: float, hard_ttl: float, max_entries: int,
+                 soft_until: Optional[Callable[..., float]] = None, backend: Optional[CacheBackend] = None,
+                 lock_ttl: float = 60, usable: Optional[Callable[[Any], bool]] = None,
+                 retry_ttl: float = 60):
+        if hard_ttl < soft_ttl:
+            raise ValueError("hard_ttl must be >= soft_ttl")
+        self.func = func
+        self.name = f"{func.__module__}.{func.__qualname__}"
+        self.soft_ttl = soft_ttl
+        self.hard_ttl = hard_ttl
+        self.soft_until = soft_until
+        self.usable = usable
+        self.retry_ttl = min(retry_ttl, soft_ttl)
+        self.max_entries = max(1, int(max_entries))
+        self._backend = backend
+        self.lock_ttl = lock_ttl
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refresh_errors = 0
+        self.remote_fills = 0
+
+    @property
+    def backend(self) -> CacheBackend:
+        return self._backend or get_default_backend()
+
+    def _store(self, key: Hashable, value: Any, args: tuple, kwargs: dict) -> None:
+        now = time.time()
+        if self.usable is not None and not self.usable(value):
+            # Kết quả rỗng / lỗi: không giữ tới mốc soft_until (vd. qua đêm), thử lại sau retry_ttl.
+            # Đang có giá trị tốt còn hạn cứng -> giữ giá trị đó thay vì ghi đè bằng kết quả rỗng.
+            entry = self.backend.get(self.name, key)
+            if entry is not None and now < entry[2] and self.usable(entry[0]):
+                value, hard = entry[0], entry[2]
+            else:
+                hard = now + self.retry_ttl
+            self.backend.set(self.name, key, (value, now + self.retry_ttl, hard), self.max_entries)
+            return
+        soft = self.soft_until(*args, **kwargs) if self.soft_until else now + self.soft_ttl
+        # Hạn cứng không sớm hơn hạn mềm (ví dụ: cache qua cuối tuần chờ phiên thứ 2)
+        hard = max(now + self.hard_ttl, soft)
+        self.backend.set(self.name, key, (value, soft, hard), self.max_entries)
+
+    def _refresh(self, key: Hashable, args: tuple, kwargs: dict) -> None:
+        """Chạy trên luồng nền. Lỗi -> giữ nguyên giá trị cũ. Replica khác đang làm mới -> bỏ qua."""
+        backend = self.backend
+        try:
+            if not backend.acquire(self.name, key, self.lock_ttl): return
+            try:
+                self._store(key, self.func(*args, **kwargs), args, kwargs)
+            finally:
+                backend.release(self.name, key)
+        except Exception as e:
+            with self._lock: self.refresh_errors += 1
+            logger.warning(f"Background refresh failed for {self.name}{args}: {e}")
+        finally:
+            with self._lock: self._refreshing.discard(key)
+
+    def _load(self, key: Hashable, args: tuple, kwargs: dict) -> Any:
+        """
+        Cache-miss: tải đồng bộ. Nếu replica khác đang giữ khóa của entry này thì chờ
+        nó ghi kết quả vào kho chung (tối đa lock_ttl giây) rồi mới tự tải.
+        """
+        backend = self.backend
+        deadline = time.time() + self.lock_ttl
+        while not backend.acquire(self.name, key, self.lock_ttl):
+            time.sleep(self.LOCK_POLL)
+            entry = backend.get(self.name, key)
+            if entry is not None and time.time() < entry[2]:
+                with self._lock: self.remote_fills += 1
+                return entry[0] if backend.copies else copy.deepcopy(entry[0])
+            if time.time() > deadline: break
+        try:
+            value = self.func(*args, **kwargs)
+            self._store(key, value, args, kwargs)
+            return copy.deepcopy(value)
+        finally:
+            backend.release(self.name, key)
+
+    def warm(self, args: tuple, kwargs: dict, force: bool = False) -> bool:
+        """
+        Làm mới ĐỒNG BỘ 1 entry (dùng cho prewarm trước/sau phiên). Entry còn mới -> bỏ qua
+        (trừ khi force); replica khác đang giữ khóa -> bỏ qua. Lỗi được raise cho người gọi.
+        Trả về True nếu đã tải lại.
+        """
+        key = (args, tuple(sorted(kwargs.items())))
+        backend = self.backend
+        entry = backend.get(self.name, key)
+        if not force and entry is not None and time.time() < entry[1]: return False
+        if not backend.acquire(self.name, key, self.lock_ttl): return False
+        try:
+            self._store(key, self.func(*args, **kwargs), args, kwargs)
+        finally:
+            backend.release(self.name, key)
+        return True
+
+    def _copy(self, value: Any) -> Any:
+        return value if self.backend.copies else copy.deepcopy(value)
+
+    def get(self, args: tuple, kwargs: dict) -> Any:
+        key = (args, tuple(sorted(kwargs.items())))
+        now = time.time()
+        entry = self.backend.get(self.name, key)
+        if entry is not None:
+            value, soft_expiry, hard_expiry = entry
+            if now < hard_expiry:
+                with self._lock:
+                    if now < soft_expiry:
+                        self.hits += 1
+                    else:
+                        self.stale_hits += 1
+                        if key not in self._refreshing:
+                            self._refreshing.add(key)
+                            _REFRESH_POOL.submit(self._refresh, key, args, kwargs)
+                return self._copy(value)
+
+        with self._lock: self.misses += 1
+        return self._load(key, args, kwargs)
+
+    def clear(self) -> None:
+        self.backend.clear(self.name)
+
+    def stats(self) -> Dict:
+        entries = self.backend.size(self.name)
+        with self._lock:
+            return {
+                "entries": entries,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "refresh_errors": self.refresh_errors,
+                "remote_fills": self.remote_fills
+            }
+
+# ==============================================================================
+# 3. DECORATOR
+# ==============================================================================
+
+# Mọi cache đã đăng ký (để xem thống kê / xóa toàn bộ)
+CACHES: Dict[str, SWRCache] = {}
+
+def swr_cache(soft_ttl: float, hard_ttl: Optional[float] = None, max_entries: int = 128,
+              soft_until: Optional[Callable[..., float]] = None,
+              backend: Optional[CacheBackend] = None,
+              usable: Optional[Callable[[Any], bool]] = None, retry_ttl: float = 60) -> Callable:
+    """
+    Decorator cache kiểu stale-while-revalidate.
+    Tham số của hàm phải hash được (giống st.cache_data với kiểu cơ bản).
+    soft_until(*args, **kwargs) -> epoch: hạn mềm động (ví dụ mốc phiên kế tiếp),
+    thay cho soft_ttl cố định.
+    backend: kho lưu riêng; mặc định dùng get_default_backend() tại thời điểm gọi.
+    usable(value) -> False (kết quả rỗng / lỗi đã bị nuốt): chỉ cache retry_ttl giây, bỏ qua
+    soft_until, và không ghi đè giá trị tốt đang có.
+    Hàm được decorate có thêm .clear(), .stats() và .warm(*args, **kwargs) (làm mới đồng bộ nếu đã cũ).
+    """
+    def decorate(func: Callable) -> Callable:
+        cache = SWRCache(func, soft_ttl, hard_ttl if hard_ttl is not None else soft_ttl,
+                         max_entries, soft_until, backend, usable=usable, retry_ttl=retry_ttl)
+        CACHES[cache.name] = cache
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return cache.get(args, kwargs)
+
+        wrapper.clear = cache.clear
+        wrapper.stats = cache.stats
+        wrapper.warm = lambda *args, **kwargs: cache.warm(args, kwargs)
+        wrapper.cache = cache
+        return wrapper
+    return decorate
+
+def cache_stats() -> Dict[str, Dict]:
+    return {name: cache.stats() for name, cache in CACHES.items()}
+
+def clear_all() -> None:
+    for cache in CACHES.values(): cache.clear()
@@ -2,14 +2,41 @@
 ================================================================================
 MODULE: backend/commodities.py
 DESCRIPTION: Crawler dữ liệu Vàng & Bạc Real-time (STRICT MODE + FORMATTING).
+    - Metals Service: cache snapshot, tải Vàng & Bạc song song với timeout chặt,
+      nguồn lỗi -> tiếp tục hiển thị snapshot tốt gần nhất.
+    - Mỗi snapshot được lưu vào chuỗi thời gian trên đĩa (biểu đồ chênh lệch mua/bán).
 ================================================================================
 """
+import os
+import re
+import time
+import pickle
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import lxml.html
 import pandas as pd
-import requests
+
+from backend.providers import get_provider
+from backend.store import CACHE_ROOT
+
+logger = logging.getLogger("ThangLongMetals")
+
+# Snapshot được dùng lại trong khoảng này (giây) trước khi tải lại ở nền
+METALS_TTL = int(os.environ.get("TL_METALS_TTL", 300))
+# (connect, read) giây cho mỗi trang; cả lượt tải không chờ quá METALS_DEADLINE
+METALS_TIMEOUT = (3.05, 5)
+METALS_DEADLINE = 8
+METALS_DIR = os.path.join(CACHE_ROOT, "metals")
+# Chuỗi snapshot (*_history.csv) chỉ giữ METALS_HISTORY_DAYS ngày gần nhất (dọn tối đa 1 lần / ngày)
+METALS_HISTORY_DAYS = float(os.environ.get("TL_METALS_HISTORY_DAYS", 365))
 
 def format_vnd_price(val):
     """
-    Hàm trang điểm số liệu: 
+    Hàm trang điểm số liệu (CHỈ dùng lúc hiển thị, dữ liệu gốc giữ dạng số nguyên):
     Input: 2999000 (int/str)
     Output: "2.999.000" (str chuẩn Việt Nam)
     """
@@ -19,52 +46,246 @@ def format_vnd_price(val):
     except:
         return val
 
+# ==============================================================================
+# TABLE EXTRACTOR (LXML - CHỈ PARSE BẢNG GIÁ CẦN DÙNG)
+# ==============================================================================
+
+# 1 số kiểu Việt Nam: nhóm nghìn cách bằng '.', ',' hoặc khoảng trắng ('2.999.000'), hoặc dãy chữ số liền
+_VND_NUMBER = re.compile(r"\d{1,3}(?:[.,\s]\d{3})+|\d+")
+_NON_DIGIT = re.compile(r"\D")
+
+def parse_vnd_int(text) -> Optional[int]:
+    """
+    Số kiểu Việt Nam -> số nguyên: '2.999.000' / '118,500' / ' 1 560 000 ' -> 2999000 / 118500 / 1560000.
+    Chỉ đọc số ĐẦU TIÊN trong ô: '118.500 ▲500' / '2.999.000 (+0,5%)' -> 118500 / 2999000.
+    Ô không có chữ số ('Xem tại web', 'Liên hệ', '-') -> None.
+    """
+    match = _VND_NUMBER.search(str(text))
+    return int(_NON_DIGIT.sub("", match.group())) if match else None
+
+def _cells(row) -> List[str]:
+    return [" ".join(cell.text_content().split()) for cell in row if cell.tag in ("td", "th")]
+
+def _header_row(rows: List) -> int:
+    """Vị trí dòng tiêu đề: dòng đầu tiên có ô <th>, không có thì dòng đầu của bảng."""
+    return next((i for i, row in enumerate(rows) if any(cell.tag == "th" for cell in row)), 0)
+
+def extract_table(html: str, header: str) -> Tuple[List[str], List[List[str]]]:
+    """
+    Tìm bảng có 1 ô TIÊU ĐỀ đúng bằng `header` (không phân biệt hoa thường) rồi chỉ đọc các dòng của bảng đó.
+    Trả về (tiêu đề, các dòng dữ liệu); không thấy bảng -> ([], []).
+    """
+    doc = lxml.html.fromstring(html)
+    wanted = header.casefold()
+    for table in doc.iter("table"):
+        rows = list(table.iter("tr"))
+        if not rows: continue
+        start = _header_row(rows)
+        columns = _cells(rows[start])
+        if wanted not in (c.casefold() for c in columns): continue
+        # Dòng lặp lại tiêu đề giữa bảng (vd. 'SẢN PHẨM') bị bỏ qua
+        body = [cells for cells in map(_cells, rows[start + 1:]) if cells and cells[0].casefold() != columns[0].casefold()]
+        return columns, body
+    return [], []
+
+def _price_frame(columns: List[str], rows: List[List[str]], keep: Dict[str, str], price_cols: List[str]) -> pd.DataFrame:
+    """Chọn cột theo tên (không phân biệt hoa thường), ép cột giá về Int64, bỏ dòng không có giá."""
+    index = {c.casefold(): i for i, c in enumerate(columns)}
+    if any(src.casefold() not in index for src in keep): return pd.DataFrame()
+    width = max(index[src.casefold()] for src in keep) + 1
+    data = {dst: [r[index[src.casefold()]] for r in rows if len(r) >= width] for src, dst in keep.items()}
+    df = pd.DataFrame(data)
+    for col in price_cols:
+        df[col] = pd.array([parse_vnd_int(v) for v in df[col]], dtype="Int64")
+    return df.dropna(subset=price_cols).reset_index(drop=True)
+
 def get_gold_price():
     """
     Crawl giá vàng SJC từ webgia.com.
+    Giá trả về dạng số nguyên (Int64); format hiển thị bằng format_vnd_price lúc render.
+    Lỗi mạng / trang được raise cho MetalsService (ghi đúng nguyên nhân vào snapshot).
     """
     url = "https://webgia.com/gia-vang/sjc/"
-    try:
-        dfs = pd.read_html(url, encoding='utf-8')
-        if len(dfs) > 0:
-            df = dfs[0]
-            if 'Loại vàng' in df.columns:
-                df_clean = df[['Loại vàng', 'Mua vào', 'Bán ra']].copy()
-                
-                # [LỌC RÁC]
-                df_clean = df_clean[~df_clean['Mua vào'].astype(str).str.contains("web|xem|liên hệ", case=False, na=False)]
-                df_clean = df_clean[~df_clean['Bán ra'].astype(str).str.contains("web|xem|liên hệ", case=False, na=False)]
-                
-                return df_clean
-    except Exception:
-        pass
-    return pd.DataFrame()
+    columns, rows = extract_table(get_provider().fetch_text(url, timeout=METALS_TIMEOUT), "Loại vàng")
+    # [LỌC RÁC] Dòng 'Xem tại web' / 'Liên hệ' không có giá -> bị bỏ khi ép số
+    return _price_frame(columns, rows, {'Loại vàng': 'Loại vàng', 'Mua vào': 'Mua vào', 'Bán ra': 'Bán ra'},
+                        ['Mua vào', 'Bán ra'])
 
 def get_silver_price():
     """
-    Crawl giá bạc Phú Quý + Format số đẹp.
+    Crawl giá bạc Phú Quý (giá dạng số nguyên Int64). Lỗi được raise như get_gold_price.
     """
     url = "https://giabac.phuquygroup.vn/"
-    header = {"User-Agent": "Mozilla/5.0"}
-    try:
-        response = requests.get(url, headers=header, timeout=5)
-        dfs = pd.read_html(response.text)
-        if len(dfs) > 0:
-            df = dfs[0]
-            df.columns = [c.upper() for c in df.columns] 
-            
-            if "SẢN PHẨM" in df.columns:
-                # [LỌC RÁC]
-                df = df[df['SẢN PHẨM'] != "SẢN PHẨM"]
-                df = df[df['ĐƠN VỊ'].notna()] 
-                df = df[df['ĐƠN VỊ'].str.contains("Vnđ", na=False, case=False)]
-
-                # [TRANG ĐIỂM SỐ LIỆU] Áp dụng hàm format cho 2 cột giá
-                df['GIÁ MUA VÀO'] = df['GIÁ MUA VÀO'].apply(format_vnd_price)
-                df['GIÁ BÁN RA'] = df['GIÁ BÁN RA'].apply(format_vnd_price)
-
-                return df[['SẢN PHẨM', 'ĐƠN VỊ', 'GIÁ MUA VÀO', 'GIÁ BÁN RA']]
-    except Exception:
-        pass
-        
-    return pd.DataFrame()
+    columns, rows = extract_table(get_provider().fetch_text(url, timeout=METALS_TIMEOUT), "Sản phẩm")
+    df = _price_frame(columns, rows, {'Sản phẩm': 'SẢN PHẨM', 'Đơn vị': 'ĐƠN VỊ',
+                                      'Giá mua vào': 'GIÁ MUA VÀO', 'Giá bán ra': 'GIÁ BÁN RA'},
+                      ['GIÁ MUA VÀO', 'GIÁ BÁN RA'])
+    if df.empty: return df
+    # [LỌC RÁC] Chỉ giữ các dòng niêm yết bằng VNĐ
+    return df[df['ĐƠN VỊ'].str.contains("Vnđ", case=False, regex=False)].reset_index(drop=True)
+
+# ==============================================================================
+# METALS SERVICE (CACHE + SNAPSHOT HISTORY)
+# ==============================================================================
+
+# metal -> (hàm crawl, cột tên sản phẩm, cột đơn vị, cột giá mua, cột giá bán)
+METAL_SOURCES = {
+    "gold": (get_gold_price, 'Loại vàng', None, 'Mua vào', 'Bán ra'),
+    "silver": (get_silver_price, 'SẢN PHẨM', 'ĐƠN VỊ', 'GIÁ MUA VÀO', 'GIÁ BÁN RA'),
+}
+
+class MetalsService:
+    """
+    Snapshot mỗi kim loại = {"data", "fetched_at", "ok", "error"}.
+    - Còn trong METALS_TTL: trả ngay, không gọi mạng (mọi lần Streamlit rerun).
+    - Quá hạn: trả bản cũ + làm mới ở nền. Chưa có gì (hoặc force): tải ngay, chờ tối đa METALS_DEADLINE.
+    - Nguồn lỗi: giữ data của lần tải tốt gần nhất (ok=False, error=lý do).
+    Lần tải tốt gần nhất được lưu xuống đĩa -> restart vẫn có dữ liệu để hiển thị.
+    Chuỗi snapshot chỉ ghi thêm khi giá thay đổi, giữ history_days ngày gần nhất.
+    """
+    def __init__(self, ttl: float = METALS_TTL, root: str = METALS_DIR,
+                 history_days: float = METALS_HISTORY_DAYS):
+        self.ttl = ttl
+        self.root = root
+        self.history_days = history_days
+        self._pruned: Dict[str, float] = {}
+        self._snapshots: Dict[str, Dict] = {}
+        self._checked: Dict[str, float] = {}
+        self._running: Dict[str, object] = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=len(METAL_SOURCES), thread_name_prefix="tl-metals")
+
+    # --- Lưu trữ ---
+    def _last_path(self, metal: str) -> str:
+        return os.path.join(self.root, f"{metal}_last.pkl")
+
+    def _history_path(self, metal: str) -> str:
+        return os.path.join(self.root, f"{metal}_history.csv")
+
+    def _load_last(self, metal: str) -> Optional[Dict]:
+        try:
+            with open(self._last_path(metal), "rb") as f:
+                snap = pickle.load(f)
+            return dict(snap, ok=False, error="Dữ liệu lưu từ lần tải trước")
+        except Exception:
+            return None
+
+    @staticmethod
+    def _price_rows(metal: str, df: pd.DataFrame) -> pd.DataFrame:
+        _, name_col, unit_col, buy_col, sell_col = METAL_SOURCES[metal]
+        return pd.DataFrame({
+            "product": df[name_col].astype(str).to_numpy(),
+            "unit": df[unit_col].astype(str).to_numpy() if unit_col else "",
+            "buy": df[buy_col].to_numpy(),
+            "sell": df[sell_col].to_numpy(),
+        })
+
+    def _prune(self, metal: str, now: float) -> None:
+        """Bỏ các dòng cũ hơn history_days khỏi *_history.csv (gọi khi đang giữ _lock)."""
+        if now - self._pruned.get(metal, 0) < 24 * 3600: return
+        self._pruned[metal] = now
+        path = self._history_path(metal)
+        try:
+            df = pd.read_csv(path, parse_dates=["ts"])
+        except (OSError, ValueError):
+            return
+        keep = df[df["ts"] >= datetime.fromtimestamp(now) - timedelta(days=self.history_days)]
+        if len(keep) == len(df): return
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        keep.assign(ts=keep["ts"].dt.strftime("%Y-%m-%dT%H:%M:%S")).to_csv(tmp_path, index=False)
+        os.replace(tmp_path, path)
+
+    def _persist(self, metal: str, snap: Dict, previous: Optional[pd.DataFrame] = None) -> None:
+        df = snap["data"]
+        prices = self._price_rows(metal, df)
+        # Giá y hệt lần tải tốt trước -> không ghi thêm vào chuỗi (chỉ cập nhật bản lưu cuối)
+        changed = previous is None or previous.empty or not prices.equals(self._price_rows(metal, previous))
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            if changed:
+                rows = prices.copy()
+                rows.insert(0, "ts", datetime.fromtimestamp(snap["fetched_at"]).isoformat(timespec="seconds"))
+                with self._lock:
+                    history_path = self._history_path(metal)
+                    rows.to_csv(history_path, mode="a", header=not os.path.exists(history_path), index=False)
+                    self._prune(metal, snap["fetched_at"])
+            tmp_path = f"{self._last_path(metal)}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump({"data": df, "fetched_at": snap["fetched_at"]}, f)
+            os.replace(tmp_path, self._last_path(metal))
+        except Exception as e:
+            logger.warning(f"Cannot persist {metal} snapshot: {e}")
+
+    # --- Tải ---
+    def _fetch(self, metal: str) -> None:
+        crawl = METAL_SOURCES[metal][0]
+        start = time.time()
+        try:
+            df = crawl()
+            error = None if not df.empty else "Nguồn không trả về bảng giá"
+        except Exception as e:
+            df, error = pd.DataFrame(), str(e)
+        with self._lock:
+            previous = self._snapshots.get(metal)
+            self._checked[metal] = time.time()
+            if error is None:
+                snap = {"data": df, "fetched_at": start, "ok": True, "error": None}
+            else:
+                logger.warning(f"{metal} source failed: {error}")
+                snap = dict(previous, ok=False, error=error) if previous else {"data": pd.DataFrame(), "fetched_at": None, "ok": False, "error": error}
+            self._snapshots[metal] = snap
+        if error is None: self._persist(metal, snap, previous["data"] if previous else None)
+
+    def _submit(self, metal: str):
+        with self._lock:
+            future = self._running.get(metal)
+            if future is None or future.done():
+                future = self._running[metal] = self._pool.submit(self._fetch, metal)
+            return future
+
+    def snapshot(self, force: bool = False) -> Dict[str, Dict]:
+        """{metal: snapshot} cho mọi nguồn; force=True: tải lại ngay (nút CẬP NHẬT)."""
+        now = time.time()
+        blocking = []
+        for metal in METAL_SOURCES:
+            with self._lock:
+                if metal not in self._snapshots:
+                    last = self._load_last(metal)
+                    if last: self._snapshots[metal] = last
+                has_data = metal in self._snapshots and not self._snapshots[metal]["data"].empty
+                fresh = now - self._checked.get(metal, 0) <= self.ttl
+            if force or not has_data:
+                blocking.append(self._submit(metal))
+            elif not fresh:
+                self._submit(metal)   # Làm mới ở nền, trả bản hiện có
+        if blocking:
+            # Cả 2 nguồn chạy song song; trang không bị treo quá METALS_DEADLINE
+            wait(blocking, timeout=METALS_DEADLINE)
+        with self._lock:
+            return {m: dict(self._snapshots.get(m) or {"data": pd.DataFrame(), "fetched_at": None, "ok": False,
+                                                      "error": "Đang tải..."}) for m in METAL_SOURCES}
+
+    def history(self, metal: str, product: Optional[str] = None, days: Optional[float] = None) -> pd.DataFrame:
+        """Chuỗi snapshot đã lưu: ts, product, unit, buy, sell, spread (bán - mua)."""
+        try:
+            df = pd.read_csv(self._history_path(metal), parse_dates=["ts"])
+        except (OSError, ValueError):
+            return pd.DataFrame(columns=["ts", "product", "unit", "buy", "sell", "spread"])
+        df["unit"] = df["unit"].fillna("")
+        if product is not None: df = df[df["product"] == product]
+        if days is not None: df = df[df["ts"] >= datetime.now() - timedelta(days=days)]
+        df["spread"] = df["sell"] - df["buy"]
+        return df.reset_index(drop=True)
+
+    def products(self, metal: str) -> List[str]:
+        hist = self.history(metal)
+        return list(dict.fromkeys(hist["product"])) if not hist.empty else []
+
+# Service dùng chung cho toàn tiến trình (mọi session Streamlit)
+METALS = MetalsService()
+
+def get_metals_snapshot(force: bool = False) -> Dict[str, Dict]:
+    return METALS.snapshot(force=force)
+
+def get_metal_history(metal: str, product: Optional[str] = None, days: Optional[float] = None) -> pd.DataFrame:
+    return METALS.history(metal, product=product, days=days)
@@ -11,20 +11,27 @@ DESCRIPTION:
 ================================================================================
 """
 
-import yfinance as yf
 import pandas as pd
-import pandas_ta as ta
-import feedparser
-import requests
 import time
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
-from typing import List, Dict, Union, Optional, Tuple
-import streamlit as st
+from typing import List, Dict, Iterator, Union, Optional, Tuple
 
 # [NEW] Import Logic để đồng bộ thuật toán
 from backend.logic import analyze_smart_v36 
+from backend.store import OHLCV_STORE
+from backend.scanner import iter_download_chunks
+from backend.panel import score_panel, SCORING_POOL
+from backend.features import FEATURE_STORE, tag_frame
+from backend.radar_cache import RADAR_CACHE
+from backend.singleflight import single_flight
+from backend.cache import swr_cache
+from backend.market_clock import clock_for_symbol, get_clock
+from backend.providers import get_provider
+from backend.news import NEWS_FETCHER
+from backend.screener import FUNDAMENTALS_STORE, screen_symbols, screen_universe
 
 # ==============================================================================
 # 1. SYSTEM CONFIGURATION & CONSTANTS
@@ -37,24 +44,18 @@ logging.basicConfig(
 )
 logger = logging.getLogger("ThangLongDataEngine")
 
-# User Agent giả lập trình duyệt để tránh bị chặn
-HEADERS = {
-    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-    'Accept': 'application/json, text/plain, */*',
-    'Accept-Language': 'vi-VN,vi;q=0.9,en-US;q=0.8,en;q=0.7'
-}
-
 # Danh sách các chỉ số thị trường toàn cầu (Global Indices)
+# clock: đồng hồ phiên trong backend.market_clock (quyết định thời điểm làm mới cache)
 MARKET_INDICES_CONFIG = [
-    {"id": "vn30", "name": "VN30 ETF (VN Proxy)", "symbol": "E1VFVN30.VN", "source": "yahoo", "type": "etf"},
-    {"id": "dji", "name": "DOW JONES INDU.", "symbol": "^DJI", "source": "yahoo", "type": "index"},
-    {"id": "nasdaq", "name": "NASDAQ COMP.", "symbol": "^IXIC", "source": "yahoo", "type": "index"},
-    {"id": "sp500", "name": "S&P 500", "symbol": "^GSPC", "source": "yahoo", "type": "index"},
-    {"id": "nikkei", "name": "NIKKEI 225", "symbol": "^N225", "source": "yahoo", "type": "index"},
-    {"id": "gold", "name": "GOLD FUTURES", "symbol": "GC=F", "source": "yahoo", "type": "commodity"},
-    {"id": "oil", "name": "CRUDE OIL", "symbol": "CL=F", "source": "yahoo", "type": "commodity"},
-    {"id": "btc", "name": "BITCOIN USD", "symbol": "BTC-USD", "source": "yahoo", "type": "crypto"},
-    {"id": "eth", "name": "ETHEREUM USD", "symbol": "ETH-USD", "source": "yahoo", "type": "crypto"}
+    {"id": "vn30", "name": "VN30 ETF (VN Proxy)", "symbol": "E1VFVN30.VN", "source": "yahoo", "type": "etf", "clock": "hose"},
+    {"id": "dji", "name": "DOW JONES INDU.", "symbol": "^DJI", "source": "yahoo", "type": "index", "clock": "nyse"},
+    {"id": "nasdaq", "name": "NASDAQ COMP.", "symbol": "^IXIC", "source": "yahoo", "type": "index", "clock": "nyse"},
+    {"id": "sp500", "name": "S&P 500", "symbol": "^GSPC", "source": "yahoo", "type": "index", "clock": "nyse"},
+    {"id": "nikkei", "name": "NIKKEI 225", "symbol": "^N225", "source": "yahoo", "type": "index", "clock": "jpx"},
+    {"id": "gold", "name": "GOLD FUTURES", "symbol": "GC=F", "source": "yahoo", "type": "commodity", "clock": "cme"},
+    {"id": "oil", "name": "CRUDE OIL", "symbol": "CL=F", "source": "yahoo", "type": "commodity", "clock": "cme"},
+    {"id": "btc", "name": "BITCOIN USD", "symbol": "BTC-USD", "source": "yahoo", "type": "crypto", "clock": "crypto"},
+    {"id": "eth", "name": "ETHEREUM USD", "symbol": "ETH-USD", "source": "yahoo", "type": "crypto", "clock": "crypto"}
 ]
 
 # Mapping tên cột cho chuẩn hóa dữ liệu BCTC
@@ -89,33 +90,53 @@ def _format_ticker(symbol: str) -> str:
         return f"{symbol}.VN"
     return symbol
 
+def _fetch_history_bars(ticker: str, interval: str, period: Optional[str] = None, start: Optional[datetime] = None) -> pd.DataFrame:
+    """
+    Tải nến thô từ Yahoo cho OHLCV Store.
+    Truyền `period` để tải toàn bộ, hoặc `start` để chỉ tải phần delta.
+    """
+    return get_provider().history(ticker, period=period, interval=interval, start=start)
+
 # ==============================================================================
 # 3. CORE DATA FUNCTIONS
 # ==============================================================================
 
-@st.cache_data(ttl=300) # Cache dữ liệu 5 phút để tối ưu tốc độ
-def get_market_indices() -> List[Dict]:
+# Cache mỗi nhóm chỉ số theo đồng hồ phiên riêng: trong phiên làm mới sau INDEX_LIVE_TTL giây,
+# ngoài phiên giữ nguyên tới mốc mở cửa kế tiếp (Crypto 24/7 luôn dùng INDEX_LIVE_TTL)
+INDEX_LIVE_TTL = 300
+
+def _index_group_expiry(clock: str) -> float:
+    return get_clock(clock).expiry(INDEX_LIVE_TTL)
+
+def _index_group_ok(rows: List[Dict]) -> bool:
+    # Nhóm rỗng / có chỉ số OFFLINE -> không giữ tới phiên sau, thử lại sớm
+    return bool(rows) and all(row["Status"] == "LIVE" for row in rows)
+
+@swr_cache(soft_ttl=INDEX_LIVE_TTL, hard_ttl=3600, max_entries=16, soft_until=_index_group_expiry,
+           usable=_index_group_ok)
+@single_flight # Nhiều session cache-miss cùng lúc -> chỉ 1 lượt gọi Yahoo
+def _get_index_group(clock: str) -> List[Dict]:
     """
-    Lấy dữ liệu các chỉ số thị trường (Indices/Commodities/Crypto).
+    Lấy dữ liệu các chỉ số dùng chung 1 đồng hồ phiên (VN / Mỹ / Nhật / CME / Crypto).
     Sử dụng cơ chế Batch Processing để tải nhanh.
     """
     results = []
+    group = [item for item in MARKET_INDICES_CONFIG if item["clock"] == clock]
     
     # Gom nhóm các symbol để tải 1 lần (Batch download)
-    tickers_list = [item["symbol"] for item in MARKET_INDICES_CONFIG]
-    tickers_str = " ".join(tickers_list)
+    tickers_list = [item["symbol"] for item in group]
     
     try:
         # Tải dữ liệu 5 ngày gần nhất
-        data = yf.download(tickers_str, period="5d", group_by='ticker', progress=False, threads=True)
+        data = get_provider().download(tickers_list, period="5d")
         
-        for config in MARKET_INDICES_CONFIG:
+        for config in group:
             symbol = config["symbol"]
             name = config["name"]
             
             try:
                 # Xử lý dữ liệu trả về từ yfinance (MultiIndex dataframe)
-                if len(tickers_list) > 1:
+                if isinstance(data.columns, pd.MultiIndex):
                     df = data[symbol]
                 else:
                     df = data
@@ -124,8 +145,7 @@ def get_market_indices() -> List[Dict]:
                 df = df.dropna(subset=['Close'])
                 if len(df) < 2:
                     # Fallback: Thử tải riêng lẻ nếu batch thất bại
-                    ticker_obj = yf.Ticker(symbol)
-                    df = ticker_obj.history(period="5d")
+                    df = get_provider().history(symbol, period="5d")
                 
                 if len(df) >= 2:
                     now_price = _safe_float(df['Close'].iloc[-1])
@@ -167,84 +187,62 @@ def get_market_indices() -> List[Dict]:
         
     return results
 
-@st.cache_data(ttl=3600) # Cache 1 tiếng cho tin tức
+def get_market_indices() -> List[Dict]:
+    """
+    Lấy dữ liệu các chỉ số thị trường (Indices/Commodities/Crypto), theo thứ tự MARKET_INDICES_CONFIG.
+    Mỗi nhóm đồng hồ được cache & làm mới độc lập (VN ngủ đêm/cuối tuần, Crypto chạy 24/7).
+    """
+    results = []
+    for clock in dict.fromkeys(item["clock"] for item in MARKET_INDICES_CONFIG):
+        results.extend(_get_index_group(clock))
+    return results
+
+@swr_cache(soft_ttl=3600, hard_ttl=6 * 3600, max_entries=256) # Tin tức: làm mới sau 1 tiếng
+@single_flight
 def get_stock_news_google(symbol: str) -> List[Dict]:
     """
     Lấy tin tức từ Google News RSS Feed.
-    Hỗ trợ fallback và lọc tin rác.
+    Các feed của mã được tải song song, GET có điều kiện + lưu đĩa (backend.news).
+    Top 15 tin mới nhất; mọi tin đều được lưu vào kho tin local (backend.news_index).
     """
-    clean_symbol = symbol.replace(".VN", "")
-    rss_urls = [
-        f"https://news.google.com/rss/search?q=cổ+phiếu+{clean_symbol}&hl=vi&gl=VN&ceid=VN:vi",
-        f"https://news.google.com/rss/search?q=thị+trường+chứng+khoán+{clean_symbol}&hl=vi&gl=VN&ceid=VN:vi"
-    ]
-    
-    news_collection = []
-    seen_links = set()
-    
-    for url in rss_urls:
-        try:
-            feed = feedparser.parse(url)
-            if not feed.entries: continue
-            
-            for entry in feed.entries:
-                if entry.link in seen_links: continue
-                seen_links.add(entry.link)
-                
-                # Format ngày tháng
-                published = entry.get('published', '')
-                try:
-                    dt = datetime(*entry.published_parsed[:6])
-                    published_str = dt.strftime("%H:%M %d/%m/%Y")
-                except:
-                    published_str = published[:16]
-
-                news_item = {
-                    'title': entry.title,
-                    'link': entry.link,
-                    'published': published_str,
-                    'source': entry.source.title if 'source' in entry else 'Google News',
-                    'summary': entry.get('summary', '')[:200] + '...'
-                }
-                news_collection.append(news_item)
-                
-        except Exception as e:
-            logger.error(f"Error fetching news for {symbol}: {e}")
-            continue
-            
-    # Sắp xếp theo thời gian mới nhất và lấy top 15
-    return news_collection[:15]
+    return NEWS_FETCHER.symbol_news(symbol, limit=15)
+
+HISTORY_LIVE_TTL = 600
 
-@st.cache_data(ttl=600) # Cache 10 phút
+def _history_expiry(symbol: str, period: str = "2y", interval: str = "1d") -> float:
+    # Trong phiên: 10 phút; ngoài phiên: tới lúc mở cửa phiên kế tiếp của sàn niêm yết
+    return clock_for_symbol(_format_ticker(symbol)).expiry(HISTORY_LIVE_TTL)
+
+@swr_cache(soft_ttl=HISTORY_LIVE_TTL, hard_ttl=24 * 3600, max_entries=256, soft_until=_history_expiry,
+           usable=lambda df: not df.empty) # Lỗi tải -> DataFrame rỗng, không cache tới phiên sau
+@single_flight
 def get_history_df(symbol: str, period: str = "2y", interval: str = "1d") -> pd.DataFrame:
     """
     Lấy dữ liệu lịch sử giá (OHLCV).
+    Nến được lưu trên đĩa (OHLCV Store), mỗi lần gọi chỉ tải phần nến mới.
     Tự động tính toán các chỉ báo kỹ thuật cơ bản để chuẩn bị cho phần Logic.
     """
     ticker = _format_ticker(symbol)
     try:
-        # Tải dữ liệu
-        df = yf.Ticker(ticker).history(period=period, interval=interval)
+        # Đọc từ kho nến + tải delta
+        df = OHLCV_STORE.get(ticker, period=period, interval=interval, fetcher=_fetch_history_bars)
         
         if df.empty:
             logger.warning(f"No history data for {ticker}")
             return pd.DataFrame()
             
-        # Chuẩn hóa múi giờ (Xóa timezone để tránh lỗi khi plot)
-        if df.index.tz is not None:
-            df.index = df.index.tz_localize(None)
-            
         df.index.name = "Date"
+        tag_frame(df, ticker, interval)
         
-        # --- PRE-CALCULATE BASIC INDICATORS ---
-        df['SMA_20'] = ta.sma(df['Close'], length=20)
-        df['SMA_50'] = ta.sma(df['Close'], length=50)
-        df['SMA_200'] = ta.sma(df['Close'], length=200)
-        df['Vol_SMA_20'] = ta.sma(df['Volume'], length=20)
+        # --- PRE-CALCULATE BASIC INDICATORS (qua Feature Store, tính 1 lần mỗi nến mới) ---
+        for col, source, length in (("SMA_20", "Close", 20), ("SMA_50", "Close", 50),
+                                    ("SMA_200", "Close", 200), ("Vol_SMA_20", "Volume", 20)):
+            sma = FEATURE_STORE.get(df, "sma", length=length, source=source, name=col)
+            df[col] = sma[col] if sma is not None else float('nan')
         
-        bb = ta.bbands(df['Close'], length=20, std=2)
+        bb = FEATURE_STORE.get(df, "bbands", length=20, std=2)
         if bb is not None:
-            df = pd.concat([df, bb], axis=1)
+            df = tag_frame(pd.concat([df, bb], axis=1), ticker, interval)
             
         return df
         
@@ -252,50 +250,118 @@ def get_history_df(symbol: str, period: str = "2y", interval: str = "1d") -> pd.
         logger.error(f"Error fetching history for {ticker}: {e}")
         return pd.DataFrame()
 
-@st.cache_data(ttl=3600) # Cache dữ liệu cơ bản lâu hơn (1h)
+# --- Thành phần dữ liệu cơ bản: tải song song, mỗi phần 1 cache với tuổi thọ riêng ---
+QUOTE_LIVE_TTL = 60
+
+# Pool riêng cho các thành phần Deep Dive (không tranh luồng với pool làm mới của swr_cache)
+_COMPONENT_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="tl-fundamentals")
+
+def _quote_expiry(ticker: str) -> float:
+    # Trong phiên: 1 phút; ngoài phiên: tới lúc mở cửa phiên kế tiếp
+    return clock_for_symbol(ticker).expiry(QUOTE_LIVE_TTL)
+
+@swr_cache(soft_ttl=QUOTE_LIVE_TTL, hard_ttl=24 * 3600, max_entries=256, soft_until=_quote_expiry)
+@single_flight
+def _get_quote(ticker: str) -> Dict:
+    """Giá hiện tại + giá đóng cửa phiên trước (nến ngày gần nhất)."""
+    hist = get_provider().history(ticker, period="5d")
+    closes = hist['Close'].dropna() if not hist.empty else pd.Series(dtype=float)
+    if closes.empty:
+        raise ValueError(f"No quote for {ticker}")
+    return {
+        'currentPrice': float(closes.iloc[-1]),
+        'previousClose': float(closes.iloc[-2]) if len(closes) > 1 else float(hist['Open'].iloc[-1])
+    }
+
+@swr_cache(soft_ttl=6 * 3600, hard_ttl=3 * 24 * 3600, max_entries=256) # Hồ sơ & chỉ số định giá: vài giờ
+@single_flight
+def _get_info(ticker: str) -> Dict:
+    return get_provider().info(ticker)
+
+def _statement_key(ticker: str) -> str:
+    """Khóa trong FUNDAMENTALS_STORE (cùng khóa với bộ lọc cơ bản: mã VN không đuôi .VN)."""
+    return ticker[:-3] if ticker.endswith(".VN") else ticker
+
+@single_flight
+def _get_statements(ticker: str) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    BCTC quý đọc từ kho chung của bộ lọc cơ bản (backend.screener.FUNDAMENTALS_STORE):
+    1 bản lưu, chỉ tải lại sau các mốc công bố BCTC (không còn cache riêng với TTL khác).
+    """
+    key = _statement_key(ticker)
+    record = FUNDAMENTALS_STORE.get_many([key], max_workers=1).get(key)
+    if record is None:
+        raise ValueError(f"No statements for {ticker}")
+    # Đổi tên cột ngày tháng thành string cho dễ đọc (bản sao: không sửa bản ghi trong kho)
+    return tuple(
+        df_fin.rename(columns=lambda col: col.strftime('%Y-%m-%d') if isinstance(col, datetime) else col)
+        for df_fin in (record["fin"], record["bal"], record["cash"])
+    )
+
+def _warm_statements(ticker: str) -> int:
+    """Prewarm BCTC: chỉ tải khi kho chưa có / đã qua mốc công bố. Trả về 1 nếu đã tải lại."""
+    key = _statement_key(ticker)
+    if not FUNDAMENTALS_STORE.is_stale(FUNDAMENTALS_STORE.load(key)): return 0
+    FUNDAMENTALS_STORE.get_many([key], max_workers=1)
+    return 1
+
+@swr_cache(soft_ttl=12 * 3600, hard_ttl=7 * 24 * 3600, max_entries=256) # Cổ tức / chia tách: nửa ngày
+@single_flight
+def _get_actions(ticker: str) -> Tuple[pd.Series, pd.Series]:
+    divs, splits = get_provider().actions(ticker)
+    # Chuẩn hóa múi giờ cho cổ tức
+    if not divs.empty and divs.index.tz is not None:
+        divs.index = divs.index.tz_localize(None)
+    return divs, splits
+
 def get_stock_data_full(symbol: str) -> Tuple[Dict, pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.Series, pd.Series]:
     """
     Lấy toàn bộ dữ liệu cơ bản (Fundamental Data).
+    Info, giá, BCTC và sự kiện doanh nghiệp được tải song song (~1 lượt round-trip),
+    mỗi phần cache riêng: giá ~1 phút trong phiên, BCTC vài ngày.
+    Phần nào lỗi thì trả về rỗng cho phần đó (không làm hỏng các phần còn lại).
     """
     ticker_sym = _format_ticker(symbol)
-    t = yf.Ticker(ticker_sym)
-    
-    try:
-        # 1. Info & Profile
-        info = t.info
-        
-        # Vá lỗi: Nếu Yahoo không trả về giá hiện tại
-        if 'currentPrice' not in info or info['currentPrice'] is None:
-            hist_now = t.history(period="1d")
-            if not hist_now.empty:
-                info['currentPrice'] = hist_now['Close'].iloc[-1]
-                info['previousClose'] = hist_now['Open'].iloc[-1]
-            else:
-                info['currentPrice'] = 0.0
-
-        # 2. Financial Statements (Báo cáo tài chính)
-        fin = t.quarterly_income_stmt
-        bal = t.quarterly_balance_sheet
-        cash = t.quarterly_cashflow
-        
-        # Xử lý dữ liệu BCTC: Đổi tên cột ngày tháng thành string cho dễ đọc
-        for df_fin in [fin, bal, cash]:
-            if df_fin is not None and not df_fin.empty:
-                df_fin.columns = [col.strftime('%Y-%m-%d') if isinstance(col, datetime) else col for col in df_fin.columns]
-        
-        # 3. Corporate Actions
-        divs = t.dividends
-        splits = t.splits
-        
-        # Chuẩn hóa múi giờ cho cổ tức
-        if not divs.empty and divs.index.tz is not None:
-            divs.index = divs.index.tz_localize(None)
-            
-        return info, fin, bal, cash, divs, splits
-        
-    except Exception as e:
-        logger.error(f"Fundamental data fetch error for {ticker_sym}: {e}")
-        return {}, pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.Series(), pd.Series()
+    futures = {name: _COMPONENT_POOL.submit(fn, ticker_sym) for name, fn in (
+        ("info", _get_info), ("quote", _get_quote), ("statements", _get_statements), ("actions", _get_actions)
+    )}
+    parts = {}
+    for name, future in futures.items():
+        try:
+            parts[name] = future.result()
+        except Exception as e:
+            logger.error(f"Fundamental data fetch error for {ticker_sym} ({name}): {e}")
+            parts[name] = None
+
+    # 1. Info & Profile (giá lấy từ quote luôn mới hơn bản info đã cache)
+    info = dict(parts["info"] or {})
+    if parts["quote"]:
+        info.update(parts["quote"])
+    elif info.get('currentPrice') is None:
+        info['currentPrice'] = 0.0
+
+    # 2. Financial Statements (Báo cáo tài chính)
+    fin, bal, cash = parts["statements"] or (pd.DataFrame(), pd.DataFrame(), pd.DataFrame())
+
+    # 3. Corporate Actions
+    divs, splits = parts["actions"] or (pd.Series(), pd.Series())
+
+    return info, fin, bal, cash, divs, splits
+
+def warm_market_indices() -> int:
+    """Prewarm: tải lại đồng bộ các nhóm chỉ số đã cũ. Trả về số nhóm đã tải lại."""
+    return sum(_get_index_group.warm(clock) for clock in dict.fromkeys(item["clock"] for item in MARKET_INDICES_CONFIG))
+
+def warm_deep_dive(symbol: str) -> int:
+    """
+    Prewarm màn Deep Dive của 1 mã (lịch sử giá, info/giá/BCTC/cổ tức, tin tức) đúng theo
+    khóa cache mà app sử dụng. Phần còn mới được bỏ qua. Trả về số phần đã tải lại.
+    """
+    ticker_sym = _format_ticker(symbol)
+    warmed = get_history_df.warm(symbol) + get_stock_news_google.warm(symbol) + _warm_statements(ticker_sym)
+    for fn in (_get_info, _get_quote, _get_actions):
+        warmed += fn.warm(ticker_sym)
+    return warmed
 
 # ==============================================================================
 # 4. RADAR SCANNER ENGINE (BỘ QUÉT - ĐÃ ĐỒNG BỘ LOGIC)
@@ -305,72 +371,135 @@ def get_stock_data_full(symbol: str) -> Tuple[Dict, pd.DataFrame, pd.DataFrame,
 # FILE: backend/data.py -> Hàm get_pro_data
 # ==============================================================================
 
-def get_pro_data(tickers: List[str]) -> pd.DataFrame:
+def _map_signal(raw_action: str) -> str:
+    """Quy đổi hành động tiếng Việt sang nhãn Radar."""
+    if "MUA MẠNH" in raw_action: return "STRONG BUY"
+    if "MUA" in raw_action: return "BUY"
+    if "BÁN" in raw_action: return "SELL"
+    return "WAIT"
+
+def _build_radar_rows(frames: Dict[str, pd.DataFrame], scores: Optional[pd.DataFrame] = None) -> List[Dict]:
     """
-    Bộ quét Radar: Đã FIX lỗi thiếu Vol_Ratio.
+    Chấm điểm cả nhóm mã bằng Panel Engine (vector hóa, kết quả giống analyze_smart_v36)
+    rồi đóng gói thành các dòng Radar. Mã không đủ 50 nến bị bỏ qua.
+    `scores` truyền vào khi đã chấm điểm sẵn (ví dụ từ Process Pool).
     """
+    # 1. Gọi bộ não phân tích (toàn bộ chunk trong 1 lượt)
+    if scores is None: scores = score_panel(frames)
     rows = []
-    clean_tickers = [_format_ticker(t) for t in tickers]
-    
+    for symbol, res in zip(scores.index, scores.itertuples(index=False)):
+        # 2. Trend Line
+        trend_data = frames[symbol]['Close'].dropna().tail(30).tolist()
+        
+        # 3. Tính toán thay đổi giá
+        pct_change = (res.close - res.prev_close) / res.prev_close * 100
+        
+        # === [QUAN TRỌNG] TÍNH TOÁN VOL_RATIO (Volume / TB 20 phiên) ===
+        # Tránh lỗi chia cho 0
+        vol_ratio = 1.0
+        if res.vol_avg > 0:
+            vol_ratio = float(res.vol_now) / float(res.vol_avg)
+        
+        rows.append({
+            "Symbol": symbol.replace(".VN", ""),
+            "Price": res.close / 1000.0, 
+            "Pct": pct_change,
+            "Signal": _map_signal(res.action),
+            "Score": int(res.score),
+            "Trend": trend_data,
+            "Volume": res.vol_now,      
+            "Vol_Ratio": vol_ratio  # <--- CHÌA KHÓA ĐỂ VẼ GALAXY LÀ ĐÂY
+        })
+    return rows
+
+def iter_pro_data(tickers: List[str], refresh: bool = False) -> Iterator[pd.DataFrame]:
+    """
+    Bộ quét Radar dạng Streaming: yield các dòng Radar của từng chunk
+    ngay khi chunk đó tải + phân tích xong (UI hiển thị dần, không chờ cả universe).
+    Các mã đã có dòng Radar còn mới trong RADAR_CACHE được yield ngay lượt đầu,
+    chỉ mã thiếu / cũ mới phải tải + chấm điểm lại (refresh=True để quét lại tất cả).
+    """
+    clean_tickers = list(dict.fromkeys(_format_ticker(t) for t in tickers))
+    if refresh:
+        cached_rows, stale = [], clean_tickers
+    else:
+        cached_rows, stale = RADAR_CACHE.partition(clean_tickers)
+    logger.info(f"Radar cache: {len(clean_tickers) - len(stale)} reused, {len(stale)} to scan")
+    if cached_rows: yield pd.DataFrame(cached_rows)
+    if not stale: return
+
+    scan = _iter_pro_data_parallel if SCORING_POOL.enabled_for(len(stale)) else _iter_pro_data_serial
+    for frames, part in scan(stale):
+        RADAR_CACHE.update(frames, part)
+        yield part
+
+def _analyze_chunk(frames: Dict[str, pd.DataFrame], scores=None) -> Tuple[Dict[str, pd.DataFrame], pd.DataFrame]:
+    """Đóng gói 1 chunk thành (frames, dòng Radar). Lỗi phân tích -> frames rỗng để không ghi cache."""
+    try:
+        if scores is not None: scores = scores.result()
+        return frames, pd.DataFrame(_build_radar_rows(frames, scores))
+    except Exception as e:
+        logger.warning(f"Radar analysis failed for chunk {sorted(frames)}: {e}")
+        return {}, pd.DataFrame()
+
+def _iter_pro_data_serial(clean_tickers: List[str]) -> Iterator[Tuple[Dict[str, pd.DataFrame], pd.DataFrame]]:
     try:
         # Tải dữ liệu 1 năm để đủ tính MA200 và Volume TB 20 phiên
-        data_batch = yf.download(clean_tickers, period="1y", group_by='ticker', progress=False, threads=True)
+        for frames, _ in iter_download_chunks(clean_tickers, period="1y"):
+            yield _analyze_chunk(frames)
     except Exception as e:
-        return pd.DataFrame()
+        logger.error(f"Radar download failed: {e}")
 
-    for symbol in clean_tickers:
-        try:
-            if len(clean_tickers) > 1: df = data_batch[symbol].copy()
-            else: df = data_batch.copy()
-            
-            df = df.dropna(subset=['Close'])
-            if df.empty or len(df) < 50: continue
-            
-            # 1. Gọi bộ não phân tích
-            analysis = analyze_smart_v36(df)
-            if not analysis: continue
-
-            # 2. Mapping dữ liệu cơ bản
-            score = analysis['score']
-            raw_action = analysis['action']
-            signal = "WAIT"
-            if "MUA MẠNH" in raw_action: signal = "STRONG BUY"
-            elif "MUA" in raw_action: signal = "BUY"
-            elif "BÁN" in raw_action: signal = "SELL"
-            
-            # 3. Trend Line
-            trend_data = df['Close'].tail(30).tolist()
-            
-            # 4. Tính toán thay đổi giá
-            close = df['Close'].iloc[-1]
-            prev_close = df['Close'].iloc[-2]
-            pct_change = (close - prev_close) / prev_close * 100
-            
-            # === [QUAN TRỌNG] TÍNH TOÁN VOL_RATIO ===
-            vol_now = df['Volume'].iloc[-1]
-            # Tính trung bình volume 20 phiên gần nhất
-            vol_avg = df['Volume'].rolling(window=20).mean().iloc[-1] 
-            
-            # Tránh lỗi chia cho 0
-            vol_ratio = 1.0
-            if vol_avg > 0:
-                vol_ratio = float(vol_now) / float(vol_avg)
-            
-            rows.append({
-                "Symbol": symbol.replace(".VN", ""),
-                "Price": close / 1000.0, 
-                "Pct": pct_change,
-                "Signal": signal,
-                "Score": int(score),
-                "Trend": trend_data,
-                "Volume": vol_now,      
-                "Vol_Ratio": vol_ratio  # <--- CHÌA KHÓA ĐỂ VẼ GALAXY LÀ ĐÂY
-            })
-            
-        except Exception as e:
-            continue
-            
-    return pd.DataFrame(rows)
+def _iter_pro_data_parallel(clean_tickers: List[str]) -> Iterator[Tuple[Dict[str, pd.DataFrame], pd.DataFrame]]:
+    """
+    Bản song song cho universe lớn: chunk tải xong được gửi sang
+    Process Pool chấm điểm ngay, trong lúc các luồng tải vẫn chạy tiếp.
+    Chunk nào chấm xong trước thì yield trước.
+    """
+    pending = {}
+    try:
+        for frames, _ in iter_download_chunks(clean_tickers, period="1y"):
+            pending[SCORING_POOL.submit(frames)] = frames
+            for future in [f for f in pending if f.done()]:
+                yield _analyze_chunk(pending.pop(future), future)
+    except Exception as e:
+        logger.error(f"Radar download failed: {e}")
+
+    for future in as_completed(list(pending)):
+        yield _analyze_chunk(pending.pop(future), future)
+
+def order_radar_rows(df: pd.DataFrame, tickers: List[str]) -> pd.DataFrame:
+    """Sắp xếp kết quả Radar theo đúng thứ tự watchlist người dùng nhập."""
+    if df.empty: return df
+    order = {_format_ticker(t).replace(".VN", ""): i for i, t in enumerate(tickers)}
+    return df.sort_values("Symbol", key=lambda s: s.map(order)).reset_index(drop=True)
+
+def get_pro_data(tickers: List[str], refresh: bool = False) -> pd.DataFrame:
+    """
+    Bộ quét Radar: Đã FIX lỗi thiếu Vol_Ratio.
+    Dữ liệu được tải theo chunk qua worker pool (backend.scanner), chunk lỗi được retry.
+    Mã đã quét gần đây được lấy từ RADAR_CACHE.
+    """
+    parts = [part for part in iter_pro_data(tickers, refresh=refresh) if not part.empty]
+    if not parts: return pd.DataFrame()
+    return order_radar_rows(pd.concat(parts, ignore_index=True), tickers)
+
+def merge_fundamentals(df_radar: pd.DataFrame, exchange: Optional[str] = None) -> pd.DataFrame:
+    """
+    Join bộ lọc cơ bản (backend.screener) với Radar theo cột 'Symbol'.
+    - exchange = None: các mã trên Radar + 9 chỉ số cơ bản (mã thiếu BCTC -> NaN).
+    - exchange = HOSE / HNX / UPCOM / ALL: cả sàn theo điểm cơ bản + tín hiệu Radar (nếu đã quét).
+    Điểm cơ bản đổi tên thành 'F-Score' để không trùng cột 'Score' của Radar.
+    """
+    radar_cols = ["Symbol", "Price", "Pct", "Signal", "Score"]
+    if exchange:
+        screen = screen_universe(exchange).rename(columns={"Score": "F-Score"})
+        if screen.empty or df_radar.empty: return screen
+        return screen.merge(df_radar[radar_cols], on="Symbol", how="left")
+    if df_radar.empty: return df_radar
+    screen = screen_symbols(df_radar["Symbol"].tolist()).rename(columns={"Score": "F-Score"})
+    if screen.empty: return df_radar[radar_cols]
+    return df_radar[radar_cols].merge(screen, on="Symbol", how="left")
 
 # ==============================================================================
 # END OF MODULE
@@ -0,0 +1,122 @@
+"""
+================================================================================
+MODULE: backend/features.py
+PROJECT: THANG LONG TERMINAL (ENTERPRISE EDITION)
+DESCRIPTION:
+    Memoized Feature Store (Kho chỉ báo dùng chung).
+    - Mỗi chỉ báo của 1 mã chỉ tính 1 lần cho mỗi nến mới.
+    - Khóa: (symbol, interval, dấu vân tay chuỗi nến, spec chỉ báo).
+    - get_history_df, TechnicalAnalyzer và biểu đồ Ichimoku cùng đọc từ đây.
+    - Có bộ đếm hit/miss để theo dõi hiệu quả cache.
+================================================================================
+"""
+
+import os
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+import pandas as pd
+
+from backend.indicators import indicator_frame
+
+logger = logging.getLogger("ThangLongFeatureStore")
+
+# ==============================================================================
+# 1. CONFIGURATION
+# ==============================================================================
+
+DEFAULT_MAX_ENTRIES = int(os.environ.get("TL_FEATURE_CACHE_SIZE", 512))
+
+# Spec chỉ báo: (kind, {params}) - cùng cú pháp với indicator_frame
+Spec = Tuple[str, Dict]
+
+def tag_frame(df: pd.DataFrame, symbol: str, interval: str) -> pd.DataFrame:
+    """Gắn (symbol, interval) vào df.attrs để Feature Store nhận diện chuỗi nến."""
+    df.attrs["symbol"] = symbol
+    df.attrs["interval"] = interval
+    return df
+
+def _spec_key(kind: str, params: Dict) -> Tuple:
+    return (kind,) + tuple(sorted((k, float(v) if isinstance(v, (int, float)) else v) for k, v in params.items()))
+
+def _bars_key(df: pd.DataFrame) -> Optional[Tuple]:
+    """
+    Dấu vân tay của chuỗi nến: (nến đầu, nến cuối, số nến, OHLCV nến cuối, hash cột Close).
+    Số nến + nến đầu phân biệt các period khác nhau (EMA/RMA phụ thuộc điểm khởi tạo);
+    OHLCV nến cuối bắt được nến phiên đang chạy được cập nhật cùng timestamp;
+    hash Close bắt được Yahoo điều chỉnh lại lịch sử (cổ tức / chia tách) mà không đổi nến cuối.
+    """
+    symbol = df.attrs.get("symbol")
+    if not symbol or df.empty: return None
+    last = df.iloc[-1]
+    tail = tuple(float(last[c]) for c in ("Open", "High", "Low", "Close", "Volume") if c in df.columns)
+    closes = int(pd.util.hash_pandas_object(df["Close"], index=False).sum()) if "Close" in df.columns else 0
+    return (symbol, df.attrs.get("interval", "1d"), df.index[0], df.index[-1], len(df), tail, closes)
+
+# ==============================================================================
+# 2. FEATURE STORE
+# ==============================================================================
+
+class FeatureStore:
+    """
+    Cache LRU trong bộ nhớ cho kết quả indicator_frame.
+    Frame không mang df.attrs['symbol'] thì tính trực tiếp (không cache, đếm là bypass).
+    """
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max(1, int(max_entries))
+        self._data: "OrderedDict[Tuple, Optional[pd.DataFrame]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypass = 0
+
+    def get(self, df: pd.DataFrame, kind: str, **params) -> Optional[pd.DataFrame]:
+        """Giống indicator_frame(df, kind, **params) nhưng có memo theo nến."""
+        bars = _bars_key(df)
+        if bars is None:
+            with self._lock: self.bypass += 1
+            return indicator_frame(df, kind, **params)
+
+        key = bars + (_spec_key(kind, params),)
+        with self._lock:
+            if key in self._data:
+                self.hits += 1
+                self._data.move_to_end(key)
+                cached = self._data[key]
+                return cached.copy() if cached is not None else None
+            self.misses += 1
+
+        result = indicator_frame(df, kind, **params)
+        with self._lock:
+            self._data[key] = result
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+        return result.copy() if result is not None else None
+
+    def features(self, df: pd.DataFrame, specs: Iterable[Spec]) -> Optional[pd.DataFrame]:
+        """Gộp nhiều chỉ báo thành 1 DataFrame (bỏ qua chỉ báo thiếu nến). None nếu không có cột nào."""
+        frames = [self.get(df, kind, **params) for kind, params in specs]
+        frames = [f for f in frames if f is not None]
+        return pd.concat(frames, axis=1) if frames else None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypass": self.bypass,
+                "entries": len(self._data),
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.bypass = 0
+
+# Store dùng chung cho toàn tiến trình
+FEATURE_STORE = FeatureStore()
@@ -0,0 +1,193 @@
+"""
+================================================================================
+MODULE: backend/http_client.py
+PROJECT: THANG LONG TERMINAL (ENTERPRISE EDITION)
+DESCRIPTION:
+    Shared HTTP Client (Lớp HTTP dùng chung cho mọi crawler ngoài yfinance).
+    - 1 requests.Session: giữ kết nối keep-alive (TCP/TLS) giữa các lượt gọi, nén gzip.
+    - Giới hạn số request đồng thời TỪNG HOST (không dội 1 site nhỏ như webgia.com).
+    - Timeout mặc định cho mọi request, tự retry lỗi tạm thời (429 / 5xx / rớt kết nối).
+    - Thống kê độ trễ theo host (p50 / p95 / lỗi / retry).
+================================================================================
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import deque
+from typing import Dict, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger("ThangLongHTTP")
+
+# ==============================================================================
+# 1. CONFIGURATION
+# ==============================================================================
+
+# Header giả lập trình duyệt để tránh bị chặn (dùng cho MỌI crawler)
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,application/json;q=0.8,*/*;q=0.7',
+    'Accept-Language': 'vi-VN,vi;q=0.9,en-US;q=0.8,en;q=0.7',
+    'Accept-Encoding': 'gzip, deflate'
+}
+
+# (connect, read) giây
+DEFAULT_TIMEOUT: Tuple[float, float] = (3.05, 10)
+DEFAULT_HOST_LIMIT = int(os.environ.get("TL_HTTP_HOST_LIMIT", 4))
+DEFAULT_RETRIES = int(os.environ.get("TL_HTTP_RETRIES", 2))
+
+# Retry theo status (429 / 5xx) chạy NGOÀI semaphore của host: chờ lâu không giữ chỗ của request khác.
+# Retry-After dài hơn RETRY_AFTER_MAX (giây) -> trả luôn response cho người gọi (không chờ).
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+RETRY_AFTER_MAX = float(os.environ.get("TL_HTTP_RETRY_AFTER_MAX", 10))
+BACKOFF_FACTOR = 0.3
+BACKOFF_MAX = 2.0
+
+# Giới hạn riêng cho từng host (site nhỏ -> ít kết nối hơn)
+HOST_LIMITS: Dict[str, int] = {
+    "news.google.com": 8,
+    "webgia.com": 2,
+    "giabac.phuquygroup.vn": 2,
+}
+
+Timeout = Union[float, Tuple[float, float]]
+
+# ==============================================================================
+# 2. PER-HOST STATS
+# ==============================================================================
+
+class HostStats:
+    """Bộ đếm theo host; độ trễ giữ SAMPLES mẫu gần nhất để tính phân vị."""
+    SAMPLES = 256
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.in_flight = 0
+        self.last_status: Optional[int] = None
+        self.latencies = deque(maxlen=self.SAMPLES)
+
+    def snapshot(self) -> Dict:
+        samples = sorted(self.latencies)
+        pick = lambda q: round(samples[min(len(samples) - 1, int(q * len(samples)))] * 1000, 1) if samples else None
+        return {
+            "requests": self.requests, "errors": self.errors, "retries": self.retries,
+            "in_flight": self.in_flight, "last_status": self.last_status,
+            "p50_ms": pick(0.5), "p95_ms": pick(0.95), "max_ms": pick(1.0)
+        }
+
+# ==============================================================================
+# 3. HTTP CLIENT
+# ==============================================================================
+
+class HttpClient:
+    """
+    Session dùng chung cho toàn tiến trình (requests.Session an toàn khi dùng từ nhiều luồng
+    cho các GET độc lập; pool kết nối urllib3 có khóa riêng).
+    Mỗi host có 1 semaphore: vượt giới hạn thì request chờ tới lượt.
+    - Lỗi kết nối / đọc: urllib3 retry ngay trong lượt (backoff ngắn, tối đa BACKOFF_MAX giây).
+    - 429 / 5xx: nhả semaphore, chờ (Retry-After hoặc backoff) rồi xếp hàng lại.
+    """
+    def __init__(self, pool_size: int = 16, host_limit: int = DEFAULT_HOST_LIMIT,
+                 retries: int = DEFAULT_RETRIES, timeout: Timeout = DEFAULT_TIMEOUT,
+                 host_limits: Optional[Dict[str, int]] = None):
+        self.timeout = timeout
+        self.host_limit = max(1, host_limit)
+        self.host_limits = dict(HOST_LIMITS if host_limits is None else host_limits)
+        self.session = requests.Session()
+        self.session.headers.update(DEFAULT_HEADERS)
+        self.retries = max(0, retries)
+        # Chỉ retry lỗi mạng trong adapter; retry theo status nằm ở get() (ngoài semaphore)
+        retry = Retry(total=retries, connect=retries, read=retries, status=0,
+                      backoff_factor=BACKOFF_FACTOR, backoff_max=BACKOFF_MAX,
+                      allowed_methods=frozenset({"GET", "HEAD"}), raise_on_status=False,
+                      respect_retry_after_header=False)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._guard = threading.Lock()
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._stats: Dict[str, HostStats] = {}
+
+    def _host(self, host: str) -> Tuple[threading.BoundedSemaphore, HostStats]:
+        with self._guard:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self.host_limits.get(host, self.host_limit))
+                self._stats[host] = HostStats()
+            return self._semaphores[host], self._stats[host]
+
+    @staticmethod
+    def _retry_delay(response: requests.Response, attempt: int) -> Optional[float]:
+        """Số giây chờ trước lần thử lại; None nếu server đòi chờ quá RETRY_AFTER_MAX."""
+        retry_after = response.headers.get("Retry-After")
+        if retry_after:
+            try:
+                delay = Retry().parse_retry_after(retry_after)
+            except Exception:
+                delay = None
+            if delay is not None:
+                return delay if delay <= RETRY_AFTER_MAX else None
+        return min(BACKOFF_MAX, BACKOFF_FACTOR * (2 ** attempt))
+
+    def _send(self, url: str, semaphore: threading.BoundedSemaphore, stats: HostStats,
+              **kwargs) -> requests.Response:
+        """1 lượt gửi, giữ chỗ của host chỉ trong lúc request đang chạy."""
+        with semaphore:
+            with self._guard: stats.in_flight += 1
+            start = time.perf_counter()
+            try:
+                response = self.session.get(url, **kwargs)
+            except requests.RequestException:
+                with self._guard: stats.errors += 1
+                raise
+            finally:
+                elapsed = time.perf_counter() - start
+                with self._guard:
+                    stats.in_flight -= 1
+                    stats.requests += 1
+                    stats.latencies.append(elapsed)
+        history = getattr(getattr(response.raw, "retries", None), "history", ()) or ()
+        with self._guard: stats.retries += len(history)
+        return response
+
+    def get(self, url: str, headers: Optional[Dict] = None, timeout: Optional[Timeout] = None,
+            **kwargs) -> requests.Response:
+        """GET qua pool dùng chung. Không raise theo status (người gọi tự xử lý 304 / 4xx)."""
+        semaphore, stats = self._host(urlsplit(url).hostname or "")
+        for attempt in range(self.retries + 1):
+            response = self._send(url, semaphore, stats, headers=headers, timeout=timeout or self.timeout, **kwargs)
+            if response.status_code not in RETRY_STATUSES or attempt == self.retries: break
+            delay = self._retry_delay(response, attempt)
+            if delay is None:
+                logger.warning(f"{urlsplit(url).hostname}: Retry-After exceeds {RETRY_AFTER_MAX}s, giving up")
+                break
+            response.close()
+            with self._guard: stats.retries += 1
+            time.sleep(delay)
+        with self._guard:
+            stats.last_status = response.status_code
+            if response.status_code >= 400: stats.errors += 1
+        return response
+
+    def get_text(self, url: str, timeout: Optional[Timeout] = None, **kwargs) -> str:
+        response = self.get(url, timeout=timeout, **kwargs)
+        response.raise_for_status()
+        return response.text
+
+    def stats(self) -> Dict[str, Dict]:
+        """{host: thống kê} — độ trễ tính theo mili giây, gồm cả thời gian retry."""
+        with self._guard:
+            return {host: s.snapshot() for host, s in self._stats.items()}
+
+# Client dùng chung cho toàn tiến trình
+HTTP_CLIENT = HttpClient()
+
+def http_stats() -> Dict[str, Dict]:
+    return HTTP_CLIENT.stats()
@@ -0,0 +1,376 @@
+"""
+================================================================================
+MODULE: backend/incremental.py
+PROJECT: THANG LONG TERMINAL (ENTERPRISE EDITION)
+DESCRIPTION:
+    Incremental Indicator State (Trạng thái chỉ báo cập nhật từng nến).
+    - Lưu trạng thái SuperTrend(10,3), EMA 34/89/200, Ichimoku, BB(20,2),
+      ATR(14), RSI(14) cho từng mã; tiến thêm 1 nến với chi phí O(1).
+    - Hỗ trợ sửa nến đang chạy (intraday refresh) và nối nến cuối ngày (EOD).
+    - Lưu/đọc trạng thái theo mã trên đĩa (JSON) để không phải tính lại 500 nến.
+    - analyze_smart_v36 (Deep Dive) chấm điểm qua INDICATOR_STATES với chuỗi nến có định danh.
+    Công thức giống hệt bản batch (TechnicalAnalyzer.add_indicators / pandas_ta 0.3.x).
+================================================================================
+"""
+
+import os
+import json
+import math
+import copy
+import logging
+import threading
+from collections import deque
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from backend.store import CACHE_ROOT
+
+logger = logging.getLogger("ThangLongIncremental")
+
+NAN = float("nan")
+
+# ==============================================================================
+# 1. PRIMITIVE STATES (Các khối đệ quy cơ bản)
+# ==============================================================================
+
+class _WilderState:
+    """RMA = ewm(alpha=1/length, adjust=True, min_periods=length), bỏ NaN đầu chuỗi."""
+    def __init__(self, length: int):
+        self.length = length
+        self.num = 0.0
+        self.den = 0.0
+        self.nobs = 0
+
+    def update(self, x: float) -> float:
+        if not math.isnan(x):
+            decay = 1.0 - 1.0 / self.length
+            self.num = x + decay * self.num
+            self.den = 1.0 + decay * self.den
+            self.nobs += 1
+        return self.num / self.den if self.nobs >= self.length else NAN
+
+class _EMAState:
+    """EMA khởi tạo bằng SMA của `length` nến đầu (presma), adjust=False."""
+    def __init__(self, length: int):
+        self.length = length
+        self.seed_sum = 0.0
+        self.count = 0
+        self.value = NAN
+
+    def update(self, x: float) -> float:
+        self.count += 1
+        if self.count < self.length:
+            self.seed_sum += x
+        elif self.count == self.length:
+            self.value = (self.seed_sum + x) / self.length
+        else:
+            alpha = 2.0 / (self.length + 1)
+            self.value = (1 - alpha) * self.value + alpha * x
+        return self.value
+
+# ==============================================================================
+# 2. INDICATOR STATE (Trạng thái đầy đủ của 1 mã)
+# ==============================================================================
+
+class IndicatorState:
+    """
+    Trạng thái chỉ báo của 1 mã, tiến từng nến bằng `update`.
+    Gọi `update(bar, ts)` với cùng timestamp của nến cuối -> sửa nến đó (intraday),
+    timestamp mới hơn -> nối nến mới (EOD). Nến cũ hơn bị bỏ qua.
+    """
+    ICHI_TENKAN, ICHI_KIJUN, ICHI_SENKOU = 9, 26, 52
+    BB_LENGTH, BB_STD = 20, 2.0
+    ST_LENGTH, ST_MULT = 10, 3.0
+
+    def __init__(self):
+        self.n = 0
+        self.last_ts: Optional[str] = None
+        # Nến đầu của chuỗi đã nạp -> phân biệt period dài hơn (dựng lại) với period trượt (nối tiếp)
+        self.first_ts: Optional[str] = None
+        self.first_close = NAN
+        self.prev_close = NAN
+        self.close = NAN
+        self.values: Dict[str, float] = {}
+
+        # Trend
+        self.ema = {34: _EMAState(34), 89: _EMAState(89), 200: _EMAState(200)}
+        self.st_atr = _WilderState(self.ST_LENGTH)
+        self.st_dir = 1.0
+        self.st_upper = NAN
+        self.st_lower = NAN
+
+        # Volatility & Momentum
+        self.atr = _WilderState(14)
+        self.rsi_pos = _WilderState(14)
+        self.rsi_neg = _WilderState(14)
+        self.bb_window = deque(maxlen=self.BB_LENGTH)
+
+        # Ichimoku: cửa sổ High/Low 52 nến + lịch sử Span (chưa dịch) 26 nến
+        self.highs = deque(maxlen=self.ICHI_SENKOU)
+        self.lows = deque(maxlen=self.ICHI_SENKOU)
+        self.span_a_hist = deque(maxlen=self.ICHI_KIJUN + 1)
+        self.span_b_hist = deque(maxlen=self.ICHI_KIJUN + 1)
+
+        # Ảnh chụp trạng thái trước nến cuối (để sửa nến intraday)
+        self._before_last: Optional["IndicatorState"] = None
+
+    # --- Cập nhật ---
+    def update(self, bar: Dict, ts=None) -> Dict[str, float]:
+        """Nạp 1 nến {Open, High, Low, Close, Volume}; trả về giá trị chỉ báo mới nhất."""
+        ts_key = pd.Timestamp(ts).isoformat() if ts is not None else None
+        if ts_key is not None and self.last_ts is not None:
+            if ts_key < self.last_ts: return self.latest()
+            if ts_key == self.last_ts:
+                return self.revise(bar)
+
+        self._before_last = self._snapshot()
+        self._advance(bar)
+        self.last_ts = ts_key
+        if self.n == 1: self.first_ts, self.first_close = ts_key, self.close
+        return self.latest()
+
+    def revise(self, bar: Dict) -> Dict[str, float]:
+        """Thay nến cuối bằng giá trị mới (nến đang chạy trong phiên)."""
+        if self._before_last is None: return self.update(bar)
+        base = self._before_last
+        last_ts = self.last_ts
+        self.__dict__.update(copy.deepcopy(base).__dict__)
+        self._before_last = base
+        self._advance(bar)
+        self.last_ts = last_ts
+        return self.latest()
+
+    def _snapshot(self) -> "IndicatorState":
+        """Bản sao trạng thái hiện tại (không kèm ảnh chụp cũ hơn). Kích thước cố định -> O(1)."""
+        prev, self._before_last = self._before_last, None
+        snap = copy.deepcopy(self)
+        self._before_last = prev
+        return snap
+
+    def _midprice(self, length: int) -> float:
+        if len(self.highs) < length: return NAN
+        highs = list(self.highs)[-length:]
+        lows = list(self.lows)[-length:]
+        if any(math.isnan(v) for v in highs + lows): return NAN
+        return 0.5 * (min(lows) + max(highs))
+
+    def _advance(self, bar: Dict) -> None:
+        high, low, close = float(bar['High']), float(bar['Low']), float(bar['Close'])
+        prev_close = self.close
+        self.n += 1
+        self.prev_close, self.close = prev_close, close
+        v = {'Close': close}
+
+        # True Range (nến đầu tiên không có)
+        if math.isnan(prev_close):
+            tr = NAN
+        else:
+            ranges = [abs(high - low), abs(high - prev_close), abs(prev_close - low)]
+            ranges = [r for r in ranges if not math.isnan(r)]
+            tr = max(ranges) if ranges else NAN
+
+        # 1. SuperTrend (10, 3)
+        atr_st = self.st_atr.update(tr)
+        hl2 = 0.5 * (high + low)
+        upper = hl2 + self.ST_MULT * atr_st
+        lower = hl2 - self.ST_MULT * atr_st
+        if self.n > 1:
+            if close > self.st_upper: self.st_dir = 1.0
+            elif close < self.st_lower: self.st_dir = -1.0
+            else:
+                if self.st_dir > 0 and lower < self.st_lower: lower = self.st_lower
+                if self.st_dir < 0 and upper > self.st_upper: upper = self.st_upper
+        self.st_upper, self.st_lower = upper, lower
+        if self.n >= self.ST_LENGTH:
+            v[f'SUPERT_{self.ST_LENGTH}_{self.ST_MULT}'] = (lower if self.st_dir > 0 else upper) if self.n > 1 else NAN
+
+        # 2. EMA
+        for length, state in self.ema.items():
+            val = state.update(close)
+            if self.n >= length: v[f'EMA_{length}'] = val
+
+        # 3. Ichimoku (Span dịch `kijun` nến)
+        self.highs.append(high); self.lows.append(low)
+        tenkan = self._midprice(self.ICHI_TENKAN)
+        kijun = self._midprice(self.ICHI_KIJUN)
+        self.span_a_hist.append(0.5 * (tenkan + kijun))
+        self.span_b_hist.append(self._midprice(self.ICHI_SENKOU))
+        if self.n >= self.ICHI_SENKOU:
+            shifted = len(self.span_a_hist) > self.ICHI_KIJUN
+            v[f'ISA_{self.ICHI_TENKAN}'] = self.span_a_hist[0] if shifted else NAN
+            v[f'ISB_{self.ICHI_KIJUN}'] = self.span_b_hist[0] if shifted else NAN
+            v[f'ITS_{self.ICHI_TENKAN}'] = tenkan
+            v[f'IKS_{self.ICHI_KIJUN}'] = kijun
+
+        # 4. Bollinger Bands (20, 2)
+        self.bb_window.append(close)
+        if self.n >= self.BB_LENGTH:
+            window = np.array(self.bb_window)
+            mid = window.mean()
+            std = window.std(ddof=0)
+            suffix = f'{self.BB_LENGTH}_{self.BB_STD}'
+            v[f'BBL_{suffix}'] = mid - self.BB_STD * std
+            v[f'BBM_{suffix}'] = mid
+            v[f'BBU_{suffix}'] = mid + self.BB_STD * std
+
+        # 5. ATR (14) & RSI (14)
+        atr14 = self.atr.update(tr)
+        diff = close - prev_close
+        pos_avg = self.rsi_pos.update(NAN if math.isnan(diff) else max(diff, 0.0))
+        neg_avg = self.rsi_neg.update(NAN if math.isnan(diff) else min(diff, 0.0))
+        if self.n >= 14:
+            v['ATRr_14'] = atr14
+            denom = pos_avg + abs(neg_avg)
+            v['RSI_14'] = 100 * pos_avg / denom if denom else NAN
+
+        self.values = v
+
+    # --- Truy xuất ---
+    def latest(self) -> Dict[str, float]:
+        """Giá trị chỉ báo của nến cuối, cùng tên cột với TechnicalAnalyzer.add_indicators."""
+        return dict(self.values)
+
+    def analyze(self) -> Dict:
+        """Chấm điểm nến cuối bằng đúng logic của TechnicalAnalyzer (cần >= 50 nến)."""
+        from backend.logic import TechnicalAnalyzer
+        if self.n < 50: return {}
+        return TechnicalAnalyzer.score(self.latest())
+
+    # --- Khởi tạo & đồng bộ ---
+    @classmethod
+    def from_history(cls, df: pd.DataFrame) -> "IndicatorState":
+        """Dựng trạng thái từ lịch sử nến (chạy 1 lần, sau đó chỉ cần update)."""
+        state = cls()
+        state.sync(df)
+        return state
+
+    def matches(self, df: pd.DataFrame, rtol: float = 1e-9) -> bool:
+        """
+        Trạng thái có nối tiếp được chuỗi nến của df không. Mốc neo là nến cuối đã nạp (last_ts)
+        và nến liền trước nó (prev_close): Yahoo điều chỉnh cổ tức/chia tách -> đổi giá cũ -> sai.
+        - df phủ tới nến đầu của trạng thái: phải cùng nến đầu và đủ n nến tới last_ts
+          (df dài hơn -> dựng lại để EMA/RMA khởi tạo từ đầu chuỗi dài hơn).
+        - Period trượt (df bắt đầu sau nến đầu, vd "2y" sang ngày mới): vẫn khớp, tiếp tục O(1);
+          trạng thái giữ khởi tạo từ chuỗi cũ (dài hơn) nên EMA/RMA sai khác bản batch của cửa sổ mới
+          chỉ ở mức phần dư đã tắt dần.
+        Sai -> phải dựng lại từ lịch sử.
+        """
+        df = df.dropna(subset=['Close'])
+        if self.last_ts is None or self.first_ts is None or df.empty: return False
+        closes = df['Close'].to_numpy(dtype=float)
+        last = pd.Timestamp(self.last_ts)
+        pos = int(df.index.searchsorted(last))
+        if pos >= len(df) or df.index[pos] != last: return False
+        first = pd.Timestamp(self.first_ts)
+        if df.index[0] <= first:
+            if df.index[0] != first or not math.isclose(closes[0], self.first_close, rel_tol=rtol) or self.n != pos + 1:
+                return False
+        elif pos == 0:
+            return False   # Cửa sổ không còn nến trước last_ts -> không kiểm được mốc neo
+        return pos == 0 or math.isclose(closes[pos - 1], self.prev_close, rel_tol=rtol)
+
+    def sync(self, df: pd.DataFrame) -> int:
+        """Nạp các nến chưa thấy trong df (và sửa nến cuối nếu trùng timestamp). Trả về số nến đã nạp."""
+        df = df.dropna(subset=['Close'])
+        if self.last_ts is not None:
+            df = df[df.index >= pd.Timestamp(self.last_ts)]
+        for ts, bar in zip(df.index, df[['High', 'Low', 'Close']].to_dict('records')):
+            self.update(bar, ts)
+        return len(df)
+
+    # --- Serialize ---
+    def to_dict(self) -> Dict:
+        def pack(obj):
+            if isinstance(obj, (_WilderState, _EMAState)):
+                return {"__kind__": type(obj).__name__, **obj.__dict__}
+            if isinstance(obj, IndicatorState):
+                return {k: pack(val) for k, val in obj.__dict__.items()}
+            if isinstance(obj, deque):
+                return {"__kind__": "deque", "maxlen": obj.maxlen, "items": list(obj)}
+            if isinstance(obj, dict):
+                return {"__kind__": "dict", "items": [[k, pack(val)] for k, val in obj.items()]}
+            return obj
+        return pack(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "IndicatorState":
+        def unpack(obj):
+            if isinstance(obj, dict) and "__kind__" in obj:
+                kind = obj["__kind__"]
+                if kind == "deque": return deque(obj["items"], maxlen=obj["maxlen"])
+                if kind == "dict": return {k: unpack(val) for k, val in obj["items"]}
+                prim = (_WilderState if kind == "_WilderState" else _EMAState)(obj["length"])
+                prim.__dict__.update({k: val for k, val in obj.items() if k != "__kind__"})
+                return prim
+            if isinstance(obj, dict):
+                state = cls()
+                state.__dict__.update({k: unpack(val) for k, val in obj.items()})
+                return state
+            return obj
+        return unpack(data)
+
+# ==============================================================================
+# 3. PER-SYMBOL STATE STORE (Lưu trạng thái theo mã)
+# ==============================================================================
+
+class IndicatorStateStore:
+    """
+    Lưu IndicatorState của từng mã dạng JSON trong thư mục cache (kèm bản trong RAM).
+    Khóa theo từng mã: dựng lại 1 mã không chặn Deep Dive / Radar của mã khác.
+    """
+    def __init__(self, root: Optional[str] = None):
+        self.root = os.path.join(root or CACHE_ROOT, "indicator_state")
+        self._locks: Dict[str, threading.Lock] = {}
+        self._guard = threading.Lock()
+        self._memo: Dict[str, IndicatorState] = {}
+
+    def _lock(self, key: str) -> threading.Lock:
+        with self._guard:
+            if key not in self._locks: self._locks[key] = threading.Lock()
+            return self._locks[key]
+
+    def _path(self, symbol: str, interval: str) -> str:
+        safe = "".join(c if c.isalnum() or c in ".-" else "_" for c in symbol.upper())
+        return os.path.join(self.root, f"{safe}__{interval}.json")
+
+    def load(self, symbol: str, interval: str = "1d") -> Optional[IndicatorState]:
+        try:
+            with open(self._path(symbol, interval), "r", encoding="utf-8") as f:
+                return IndicatorState.from_dict(json.load(f))
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def save(self, symbol: str, state: IndicatorState, interval: str = "1d") -> None:
+        path = self._path(symbol, interval)
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(state.to_dict(), f)
+            os.replace(tmp, path)
+        except Exception as e:
+            logger.warning(f"Cannot persist indicator state for {symbol}: {e}")
+
+    def sync(self, symbol: str, df: pd.DataFrame, interval: str = "1d") -> IndicatorState:
+        """
+        Trạng thái của mã khớp với df: chỉ nạp nến mới / sửa nến đang chạy (O(1) mỗi nến).
+        Period trượt sang ngày mới vẫn nối tiếp; chưa có hoặc không khớp (lịch sử bị điều chỉnh,
+        period dài hơn) -> dựng lại từ df.
+        """
+        key = self._path(symbol, interval)
+        with self._lock(key):
+            state = self._memo.get(key) or self.load(symbol, interval)
+            if state is not None and state.matches(df):
+                before = (state.n, state.close)
+                state.sync(df)
+                changed = (state.n, state.close) != before
+            else:
+                state, changed = IndicatorState.from_history(df), True
+            self._memo[key] = state
+            if changed: self.save(symbol, state, interval)
+            return state
+
+# Kho trạng thái dùng chung cho toàn tiến trình
+INDICATOR_STATES = IndicatorStateStore()
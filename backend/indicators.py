@@ -0,0 +1,335 @@
+"""
+================================================================================
+MODULE: backend/indicators.py
+PROJECT: THANG LONG TERMINAL (ENTERPRISE EDITION)
+DESCRIPTION:
+    Pure-NumPy Indicator Kernels (Bộ chỉ báo kỹ thuật nội bộ).
+    - SMA, EMA, RMA, ATR, RSI, BBands, SuperTrend, Ichimoku.
+    - Nhận mảng 1D (1 mã) hoặc 2D (thời gian x mã), tính theo trục thời gian.
+    - Các chỉ báo đệ quy (EMA, RMA, SuperTrend) là vòng lặp chặt trên mảng liền bộ nhớ.
+    - indicator_frame(): trả về cột cùng tên với pandas_ta để thay thế trực tiếp.
+    Công thức bám theo pandas_ta 0.3.x (nhánh không dùng TA-Lib).
+    RMA (nền của ATR / RSI / SuperTrend) khởi tạo kiểu pandas_ta 0.3.x: ewm(adjust=True).
+    pandas-ta-classic (và TA-Lib) khởi tạo bằng SMA của `length` giá trị đầu -> ATR / RSI / SuperTrend
+    lệch ở đoạn đầu chuỗi rồi hội tụ (sai số giảm theo (1 - 1/length)^n); SMA / EMA / BBands / Ichimoku khớp tuyệt đối.
+    Kiểm tra đối chiếu: tests/test_indicators.py (công thức tham chiếu + pandas_ta nếu đã cài).
+    Đo tốc độ (bars/second từng kernel): `python -m backend.indicators`
+================================================================================
+"""
+
+import sys
+import time
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from typing import Dict, Optional, Tuple
+
+EPSILON = sys.float_info.epsilon
+
+# ==============================================================================
+# 1. ARRAY HELPERS
+# ==============================================================================
+
+def _as_array(x) -> np.ndarray:
+    """Chuyển Series/list sang mảng float64 liền bộ nhớ."""
+    if isinstance(x, (pd.Series, pd.DataFrame)): x = x.to_numpy(dtype=float)
+    return np.ascontiguousarray(x, dtype=np.float64)
+
+def _rolling(x: np.ndarray, length: int, func) -> np.ndarray:
+    """Áp func lên cửa sổ trượt theo trục 0. Cửa sổ chứa NaN -> NaN (min_periods=length)."""
+    out = np.full(x.shape, np.nan)
+    if x.shape[0] >= length:
+        out[length - 1:] = func(sliding_window_view(x, length, axis=0), axis=-1)
+    return out
+
+def shift(x: np.ndarray, periods: int) -> np.ndarray:
+    """Giống Series.shift: dương = dịch xuống, âm = dịch lên."""
+    out = np.full(x.shape, np.nan)
+    n = x.shape[0]
+    if 0 <= periods < n: out[periods:] = x[:n - periods]
+    elif -n < periods < 0: out[:n + periods] = x[-periods:]
+    return out
+
+def non_zero_range(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """a - b, cộng epsilon cho cả chuỗi nếu có phần tử bằng 0 (như pandas_ta)."""
+    diff = a - b
+    has_zero = np.any(diff == 0, axis=0)
+    return diff + EPSILON * has_zero
+
+def _first_valid(x: np.ndarray) -> np.ndarray:
+    return np.argmax(~np.isnan(x), axis=0)
+
+# ==============================================================================
+# 2. KERNELS
+# ==============================================================================
+
+def sma(x, length: int) -> np.ndarray:
+    return _rolling(_as_array(x), length, np.mean)
+
+def stdev(x, length: int, ddof: int = 0) -> np.ndarray:
+    return _rolling(_as_array(x), length, lambda w, axis: np.std(w, axis=axis, ddof=ddof))
+
+def rolling_max(x, length: int) -> np.ndarray:
+    return _rolling(_as_array(x), length, np.max)
+
+def rolling_min(x, length: int) -> np.ndarray:
+    return _rolling(_as_array(x), length, np.min)
+
+def ema(x, length: int) -> np.ndarray:
+    """EMA khởi tạo bằng SMA của `length` giá trị đầu (presma), adjust=False."""
+    x = _as_array(x)
+    out = np.full(x.shape, np.nan)
+    T = x.shape[0]
+    if T < length: return out
+    alpha = 2.0 / (length + 1)
+    seed_row = _first_valid(x) + length - 1
+    seed = sma(x, length)
+    if x.ndim == 1:
+        # 1 mã: vòng lặp số thực thuần (nhanh hơn nhiều so với np.where từng bước)
+        start = int(seed_row)
+        if start >= T: return out
+        vals = x.tolist()
+        prev = float(seed[start])
+        res = [prev]
+        for v in vals[start + 1:]:
+            prev = (1 - alpha) * prev + alpha * v
+            res.append(prev)
+        out[start:] = res
+        return out
+    prev = np.full(x.shape[1:], np.nan)
+    for t in range(T):
+        cur = np.where(t > seed_row, (1 - alpha) * prev + alpha * x[t], np.nan)
+        cur = np.where(t == seed_row, seed[t], cur)
+        out[t] = cur
+        prev = cur
+    return out
+
+def rma(x, length: int) -> np.ndarray:
+    """
+    Wilder MA = ewm(alpha=1/length, adjust=True, min_periods=length), bỏ NaN đầu chuỗi.
+    Khác pandas-ta-classic / TA-Lib (khởi tạo bằng SMA) ở đoạn đầu, hội tụ sau vài chục x length nến.
+    """
+    x = _as_array(x)
+    decay = 1.0 - 1.0 / length
+    out = np.full(x.shape, np.nan)
+    if x.ndim == 1:
+        num = den = 0.0; nobs = 0
+        res = out.tolist()
+        for t, v in enumerate(x.tolist()):
+            if v == v:   # bỏ qua NaN
+                num = v + decay * num
+                den = 1.0 + decay * den
+                nobs += 1
+            if nobs >= length: res[t] = num / den
+        return np.array(res)
+    num = np.zeros(x.shape[1:]); den = np.zeros(x.shape[1:]); nobs = np.zeros(x.shape[1:])
+    for t in range(x.shape[0]):
+        obs = ~np.isnan(x[t])
+        num = np.where(obs, np.where(obs, x[t], 0.0) + decay * num, num)
+        den = np.where(obs, 1.0 + decay * den, den)
+        nobs = nobs + obs
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out[t] = np.where(nobs >= length, num / den, np.nan)
+    return out
+
+def true_range(high, low, close) -> np.ndarray:
+    high, low, close = _as_array(high), _as_array(low), _as_array(close)
+    prev_close = shift(close, 1)
+    ranges = np.stack([non_zero_range(high, low), high - prev_close, prev_close - low])
+    with np.errstate(invalid="ignore"):
+        tr = np.fmax.reduce(np.abs(ranges), axis=0)
+    tr[np.isnan(prev_close)] = np.nan   # nến đầu tiên không có True Range
+    return tr
+
+def atr(high, low, close, length: int = 14) -> np.ndarray:
+    return rma(true_range(high, low, close), length)
+
+def rsi(close, length: int = 14) -> np.ndarray:
+    close = _as_array(close)
+    diff = close - shift(close, 1)
+    positive = np.where(diff < 0, 0.0, diff)
+    negative = np.where(diff > 0, 0.0, diff)
+    pos_avg = rma(positive, length)
+    neg_avg = rma(negative, length)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return 100 * pos_avg / (pos_avg + np.abs(neg_avg))
+
+def bbands(close, length: int = 20, std: float = 2.0, ddof: int = 0) -> Tuple[np.ndarray, ...]:
+    """Trả về (lower, mid, upper, bandwidth, percent)."""
+    close = _as_array(close)
+    mid = sma(close, length)
+    dev = std * stdev(close, length, ddof)
+    lower, upper = mid - dev, mid + dev
+    ulr = non_zero_range(upper, lower)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        bandwidth = 100 * ulr / mid
+        percent = non_zero_range(close, lower) / ulr
+    return lower, mid, upper, bandwidth, percent
+
+def supertrend(high, low, close, length: int = 10, multiplier: float = 3.0) -> Tuple[np.ndarray, ...]:
+    """Trả về (trend, direction, long, short). Vòng lặp theo thời gian, vector theo mã."""
+    high, low, close = _as_array(high), _as_array(low), _as_array(close)
+    hl2 = 0.5 * (high + low)
+    matr = multiplier * atr(high, low, close, length)
+    upper = hl2 + matr
+    lower = hl2 - matr
+    T = close.shape[0]
+    if close.ndim == 1:
+        return _supertrend_1d(close.tolist(), upper.tolist(), lower.tolist())
+    trend = np.full(close.shape, np.nan)
+    direction = np.ones(close.shape)
+    for i in range(1, T):
+        up_break = close[i] > upper[i - 1]
+        down_break = close[i] < lower[i - 1]
+        direction[i] = np.where(up_break, 1.0, np.where(down_break, -1.0, direction[i - 1]))
+        hold = ~up_break & ~down_break
+        lower[i] = np.where(hold & (direction[i] > 0) & (lower[i] < lower[i - 1]), lower[i - 1], lower[i])
+        upper[i] = np.where(hold & (direction[i] < 0) & (upper[i] > upper[i - 1]), upper[i - 1], upper[i])
+        trend[i] = np.where(direction[i] > 0, lower[i], upper[i])
+    long = np.where(direction > 0, trend, np.nan)
+    short = np.where(direction < 0, trend, np.nan)
+    long[0] = short[0] = np.nan
+    return trend, direction, long, short
+
+def _supertrend_1d(close: list, upper: list, lower: list) -> Tuple[np.ndarray, ...]:
+    """Vòng lặp SuperTrend cho 1 mã trên list số thực (so sánh với NaN luôn False như pandas)."""
+    T = len(close)
+    nan = float("nan")
+    direction = [1.0] * T; trend = [nan] * T; long = [nan] * T; short = [nan] * T
+    for i in range(1, T):
+        if close[i] > upper[i - 1]: direction[i] = 1.0
+        elif close[i] < lower[i - 1]: direction[i] = -1.0
+        else:
+            direction[i] = direction[i - 1]
+            if direction[i] > 0 and lower[i] < lower[i - 1]: lower[i] = lower[i - 1]
+            if direction[i] < 0 and upper[i] > upper[i - 1]: upper[i] = upper[i - 1]
+        if direction[i] > 0: trend[i] = long[i] = lower[i]
+        else: trend[i] = short[i] = upper[i]
+    return np.array(trend), np.array(direction), np.array(long), np.array(short)
+
+def midprice(high, low, length: int) -> np.ndarray:
+    return 0.5 * (rolling_min(low, length) + rolling_max(high, length))
+
+def ichimoku(high, low, close, tenkan: int = 9, kijun: int = 26, senkou: int = 52) -> Tuple[np.ndarray, ...]:
+    """Trả về (span_a, span_b, tenkan_sen, kijun_sen, chikou). Span đã dịch `kijun` nến."""
+    high, low, close = _as_array(high), _as_array(low), _as_array(close)
+    tenkan_sen = midprice(high, low, tenkan)
+    kijun_sen = midprice(high, low, kijun)
+    span_a = shift(0.5 * (tenkan_sen + kijun_sen), kijun)
+    span_b = shift(midprice(high, low, senkou), kijun)
+    return span_a, span_b, tenkan_sen, kijun_sen, shift(close, -kijun)
+
+# ==============================================================================
+# 3. PANDAS ADAPTER (Tên cột giống pandas_ta)
+# ==============================================================================
+
+def indicator_frame(df: pd.DataFrame, kind: str, **params) -> Optional[pd.DataFrame]:
+    """
+    Tính 1 chỉ báo trên DataFrame OHLCV, trả về các cột mang tên chuẩn pandas_ta
+    (SUPERT_10_3.0, EMA_34, ISA_9, BBU_20_2.0, ATRr_14, RSI_14...).
+    Trả về None khi không đủ nến (giống pandas_ta) để phía gọi giữ nguyên logic mặc định.
+    """
+    n = len(df)
+    idx = df.index
+    if kind == "sma":
+        length = params.get("length", 10); source = params.get("source", "Close")
+        if n < length: return None
+        name = params.get("name", f"SMA_{length}")
+        return pd.DataFrame({name: sma(df[source], length)}, index=idx)
+    if kind == "ema":
+        length = params.get("length", 10)
+        if n < length: return None
+        return pd.DataFrame({f"EMA_{length}": ema(df['Close'], length)}, index=idx)
+    if kind == "atr":
+        length = params.get("length", 14)
+        if n < length: return None
+        return pd.DataFrame({f"ATRr_{length}": atr(df['High'], df['Low'], df['Close'], length)}, index=idx)
+    if kind == "rsi":
+        length = params.get("length", 14)
+        if n < length: return None
+        return pd.DataFrame({f"RSI_{length}": rsi(df['Close'], length)}, index=idx)
+    if kind == "bbands":
+        length = params.get("length", 5); std = float(params.get("std", 2.0))
+        if n < length: return None
+        cols = bbands(df['Close'], length, std)
+        names = [f"BB{p}_{length}_{std}" for p in ("L", "M", "U", "B", "P")]
+        return pd.DataFrame(dict(zip(names, cols)), index=idx)
+    if kind == "supertrend":
+        length = params.get("length", 7); mult = float(params.get("multiplier", 3.0))
+        if n < length: return None
+        cols = supertrend(df['High'], df['Low'], df['Close'], length, mult)
+        names = [f"SUPERT{p}_{length}_{mult}" for p in ("", "d", "l", "s")]
+        return pd.DataFrame(dict(zip(names, cols)), index=idx)
+    if kind == "ichimoku":
+        tenkan = params.get("tenkan", 9); kijun = params.get("kijun", 26); senkou = params.get("senkou", 52)
+        if n < max(tenkan, kijun, senkou): return None
+        cols = ichimoku(df['High'], df['Low'], df['Close'], tenkan, kijun, senkou)
+        names = [f"ISA_{tenkan}", f"ISB_{kijun}", f"ITS_{tenkan}", f"IKS_{kijun}", f"ICS_{kijun}"]
+        return pd.DataFrame(dict(zip(names, cols)), index=idx)
+    raise ValueError(f"Unknown indicator: {kind}")
+
+# ==============================================================================
+# 4. BENCHMARK
+# ==============================================================================
+
+def _sample_ohlcv(n_bars: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = np.cumprod(1 + rng.normal(0, 0.02, n_bars)) * 20000
+    high = close * (1 + np.abs(rng.normal(0, 0.01, n_bars)))
+    low = close * (1 - np.abs(rng.normal(0, 0.01, n_bars)))
+    return pd.DataFrame({
+        "Open": (high + low) / 2, "High": high, "Low": low, "Close": close,
+        "Volume": rng.integers(100_000, 1_000_000, n_bars).astype(float)
+    }, index=pd.bdate_range(end="2025-12-31", periods=n_bars))
+
+# (kind, params) được đo tốc độ
+KERNEL_SPECS = [
+    ("sma", {"length": 20}),
+    ("ema", {"length": 34}),
+    ("ema", {"length": 200}),
+    ("atr", {"length": 14}),
+    ("rsi", {"length": 14}),
+    ("bbands", {"length": 20, "std": 2}),
+    ("supertrend", {"length": 10, "multiplier": 3}),
+    ("ichimoku", {"tenkan": 9, "kijun": 26, "senkou": 52}),
+]
+
+def benchmark(n_bars: int = 500, n_symbols: int = 450, repeat: int = 3) -> Dict[str, Dict[str, float]]:
+    """
+    Đo tốc độ từng kernel (bars/second): 1 mã n_bars nến, và panel n_bars x n_symbols.
+    """
+    single = _sample_ohlcv(n_bars)
+    panel = {col: np.column_stack([_sample_ohlcv(n_bars, seed)[col].to_numpy() for seed in range(n_symbols)])
+             for col in ("High", "Low", "Close")}
+    H, L, C = panel["High"], panel["Low"], panel["Close"]
+    panel_calls = {
+        "sma": lambda p: sma(C, p["length"]),
+        "ema": lambda p: ema(C, p["length"]),
+        "atr": lambda p: atr(H, L, C, p["length"]),
+        "rsi": lambda p: rsi(C, p["length"]),
+        "bbands": lambda p: bbands(C, p["length"], float(p["std"])),
+        "supertrend": lambda p: supertrend(H, L, C, p["length"], float(p["multiplier"])),
+        "ichimoku": lambda p: ichimoku(H, L, C, p["tenkan"], p["kijun"], p["senkou"]),
+    }
+
+    def best_of(fn):
+        best = float("inf")
+        for _ in range(repeat):
+            t0 = time.perf_counter(); fn(); best = min(best, time.perf_counter() - t0)
+        return best
+
+    results = {}
+    for kind, params in KERNEL_SPECS:
+        label = f"{kind}({','.join(str(v) for v in params.values())})"
+        t_single = best_of(lambda: indicator_frame(single, kind, **params))
+        t_panel = best_of(lambda: panel_calls[kind](params))
+        results[label] = {
+            "single_bars_per_sec": n_bars / t_single,
+            "panel_bars_per_sec": n_bars * n_symbols / t_panel
+        }
+    return results
+
+if __name__ == "__main__":
+    print("=== BENCHMARK (bars/second) ===")
+    for label, res in benchmark().items():
+        print(f"{label:<28} single: {res['single_bars_per_sec']:>14,.0f}   panel: {res['panel_bars_per_sec']:>14,.0f}")
@@ -12,10 +12,13 @@ DESCRIPTION:
 """
 
 import pandas as pd
-import pandas_ta as ta
 import numpy as np
 from typing import Dict, List, Tuple, Optional
 
+from backend.features import FEATURE_STORE
+from backend.incremental import INDICATOR_STATES
+from backend.statements import StatementMatrix
+
 # ==============================================================================
 # 1. TECHNICAL ANALYSIS ENGINE (BỘ MÁY KỸ THUẬT)
 # ==============================================================================
@@ -37,24 +40,25 @@ class TechnicalAnalyzer:
         """Tính toán và nạp chỉ báo vào DataFrame."""
         if not self.validate(): return self.df
         
-        # 1. Trend Indicators
-        # SuperTrend (10, 3)
-        sti = ta.supertrend(self.df['High'], self.df['Low'], self.df['Close'], length=10, multiplier=3)
-        if sti is not None: self.df = self.df.join(sti)
-        
-        # EMA
-        self.df.ta.ema(length=34, append=True)
-        self.df.ta.ema(length=89, append=True)
-        self.df.ta.ema(length=200, append=True)
-
-        # Ichimoku Cloud
-        ichimoku = ta.ichimoku(self.df['High'], self.df['Low'], self.df['Close'], tenkan=9, kijun=26, senkou=52)
-        if ichimoku is not None: self.df = self.df.join(ichimoku[0])
-
-        # 2. Volatility & Momentum
-        self.df.ta.bbands(length=20, std=2, append=True)
-        self.df.ta.atr(length=14, append=True)
-        self.df.ta.rsi(length=14, append=True)
+        # Mỗi chỉ báo trả về None nếu không đủ nến (giữ nguyên giá trị mặc định khi chấm điểm)
+        specs = [
+            # 1. Trend Indicators
+            ("supertrend", {"length": 10, "multiplier": 3}),   # SuperTrend (10, 3)
+            ("ema", {"length": 34}),                            # EMA
+            ("ema", {"length": 89}),
+            ("ema", {"length": 200}),
+            ("ichimoku", {"tenkan": 9, "kijun": 26, "senkou": 52}),  # Ichimoku Cloud
+            # 2. Volatility & Momentum
+            ("bbands", {"length": 20, "std": 2}),
+            ("atr", {"length": 14}),
+            ("rsi", {"length": 14}),
+        ]
+        # Đọc qua Feature Store: chỉ báo đã tính ở get_history_df / lượt trước không bị tính lại
+        new_cols = FEATURE_STORE.features(self.df, specs)
+        if new_cols is not None:
+            attrs = dict(self.df.attrs)
+            self.df = pd.concat([self.df.drop(columns=new_cols.columns, errors='ignore'), new_cols], axis=1)
+            self.df.attrs.update(attrs)
         
         # Update latest row
         self.latest = self.df.iloc[-1]
@@ -66,50 +70,57 @@ class TechnicalAnalyzer:
         """
         if not self.validate(): return {}
         if 'RSI_14' not in self.df.columns: self.add_indicators()
-            
+        return self.score(self.latest)
+
+    @staticmethod
+    def score(latest) -> Dict:
+        """
+        Chấm điểm từ giá trị chỉ báo của nến cuối (Series hoặc dict).
+        Chỉ báo vắng mặt (không đủ nến) dùng giá trị mặc định như cũ.
+        """
         score = 0
         pros = []
         cons = []
-        close = self.latest['Close']
+        close = latest['Close']
         
         # --- A. SCORING LOGIC ---
         
         # 1. SuperTrend (Quan trọng nhất: +/- 2 điểm)
-        st_col = [c for c in self.df.columns if 'SUPERT' in c]
+        st_col = [c for c in latest.keys() if 'SUPERT' in c]
         if st_col:
-            if close > self.latest[st_col[0]]: 
+            if close > latest[st_col[0]]: 
                 score += 2; pros.append("SuperTrend: Uptrend (Tăng)")
             else: 
                 score -= 2; cons.append("SuperTrend: Downtrend (Giảm)")
                 
         # 2. EMA (Trend dài hạn: +/- 1 điểm)
-        ema34 = self.latest.get('EMA_34', 0)
-        ema89 = self.latest.get('EMA_89', 0)
-        ema200 = self.latest.get('EMA_200', 0)
+        ema34 = latest.get('EMA_34', 0)
+        ema89 = latest.get('EMA_89', 0)
+        ema200 = latest.get('EMA_200', 0)
         
         if close > ema34 > ema89: score += 1; pros.append("EMA: Xếp lớp tăng giá đẹp")
         if close < ema200: score -= 1; cons.append("EMA: Giá dưới MA200 (Dài hạn xấu)")
             
         # 3. Ichimoku (+1 điểm)
-        span_a = self.latest.get('ISA_9', 0)
-        span_b = self.latest.get('ISB_26', 0)
+        span_a = latest.get('ISA_9', 0)
+        span_b = latest.get('ISB_26', 0)
         if close > span_a and close > span_b: score += 1; pros.append("Ichimoku: Giá nằm trên Mây")
             
         # 4. RSI (+/- 1 điểm)
-        rsi = self.latest.get('RSI_14', 50)
+        rsi = latest.get('RSI_14', 50)
         if 50 <= rsi <= 70: score += 0.5
         elif rsi < 30: score += 1.5; pros.append("RSI: Quá bán (Dễ có nhịp hồi)")
         elif rsi > 75: score -= 1.0; cons.append("RSI: Quá mua (Cẩn trọng chỉnh)")
             
         # 5. Bollinger Bands (+2 điểm nếu Breakout)
-        bb_upper = self.latest.get('BBU_20_2.0', 0)
+        bb_upper = latest.get('BBU_20_2.0', 0)
         if close > bb_upper: score += 2; pros.append("Bollinger: Breakout dải trên (Tiền vào)")
             
         # --- B. CLASSIFICATION ---
         final_score = max(0, min(10, 5 + score)) # Base score = 5
         
         # Tính toán Entry/Stop/Target theo ATR
-        atr = self.latest.get('ATRr_14', close * 0.02)
+        atr = latest.get('ATRr_14', close * 0.02)
         entry_price = close
         stop_loss = close - (2 * atr)
         take_profit = close + (4 * atr)
@@ -153,18 +164,9 @@ class FundamentalAnalyzer:
         self.fin = fin   # Income Statement
         self.bal = bal   # Balance Sheet
         self.cash = cash # Cash Flow
+        # BCTC chuẩn hóa: tra theo chỉ số dòng/cột thay vì tìm tên dòng mỗi lần
+        self.matrix = StatementMatrix.from_statements(fin, bal, cash)
         
-    def get_val(self, df, row_names, col_idx=0):
-        """Hàm an toàn lấy dữ liệu từ BCTC (vì tên dòng có thể thay đổi)."""
-        if df.empty: return 0.0
-        for name in row_names:
-            if name in df.index:
-                try:
-                    val = df.loc[name].iloc[col_idx]
-                    return float(val) if val is not None else 0.0
-                except: return 0.0
-        return 0.0
-
     def analyze(self) -> Dict:
         score = 0
         details = []
@@ -180,16 +182,17 @@ class FundamentalAnalyzer:
         elif roe < 0.05: score -= 1; details.append("⚠️ ROE Quá thấp")
         
         # 2. Net Margin
-        rev = self.get_val(self.fin, ['Total Revenue', 'Operating Revenue'], 0)
-        ni = self.get_val(self.fin, ['Net Income', 'Net Income Common Stockholders'], 0)
+        m = self.matrix
+        rev = m.value('revenue', 0)
+        ni = m.value('net_income', 0)
         nm = (ni / rev) if rev else 0
         metrics['Net Margin'] = f"{nm*100:.1f}%"
         if nm > 0.15: score += 1
         elif nm < 0.02: score -= 1
         
         # 3. BEP (EBIT / Assets)
-        ebit = self.get_val(self.fin, ['EBIT', 'Operating Income', 'Pretax Income'], 0)
-        assets = self.get_val(self.bal, ['Total Assets'], 0)
+        ebit = m.value('ebit', 0)
+        assets = m.value('total_assets', 0)
         bep = (ebit / assets) if assets else 0
         metrics['BEP'] = f"{bep*100:.1f}%"
         if bep > 0.1: score += 1
@@ -197,7 +200,7 @@ class FundamentalAnalyzer:
         # --- NHÓM 2: SỨC KHỎE TÀI CHÍNH (SOLVENCY) ---
         
         # 4. Debt/Asset
-        liab = self.get_val(self.bal, ['Total Liabilities Net Minority Interest', 'Total Liabilities'], 0)
+        liab = m.value('total_liabilities', 0)
         da = (liab / assets) if assets else 0
         metrics['Debt/Asset'] = f"{da:.2f}"
         
@@ -209,15 +212,15 @@ class FundamentalAnalyzer:
             elif da > 0.8: score -= 1; details.append("⚠️ Nợ vay rủi ro")
             
         # 5. Current Ratio
-        curr_asset = self.get_val(self.bal, ['Current Assets', 'Total Current Assets'], 0)
-        curr_liab = self.get_val(self.bal, ['Current Liabilities', 'Total Current Liabilities'], 0)
+        curr_asset = m.value('current_assets', 0)
+        curr_liab = m.value('current_liabilities', 0)
         cr = (curr_asset / curr_liab) if curr_liab else 0
         metrics['Current Ratio'] = f"{cr:.2f}"
         if cr > 1.2: score += 1
         elif cr < 0.9: score -= 1; details.append("⚠️ Áp lực thanh khoản ngắn hạn")
         
         # 6. Operating Cash Flow (OCF)
-        ocf = self.get_val(self.cash, ['Operating Cash Flow', 'Cash Flow From Continuing Operating Activities'], 0)
+        ocf = m.value('operating_cash_flow', 0)
         metrics['OCF'] = f"{ocf/1e9:,.0f}B"
         if ocf > 0: score += 1; details.append("Dòng tiền KD Dương (+)")
         else: score -= 1; details.append("⚠️ Dòng tiền KD Âm (-)")
@@ -225,20 +228,20 @@ class FundamentalAnalyzer:
         # --- NHÓM 3: TĂNG TRƯỞNG & HIỆU QUẢ (GROWTH) ---
         
         # 7. Revenue Growth (YoY)
-        rev_prev = self.get_val(self.fin, ['Total Revenue', 'Operating Revenue'], 4) # Cùng kỳ năm ngoái
+        rev_prev = m.value('revenue', 4) # Cùng kỳ năm ngoái
         rev_g = ((rev - rev_prev) / rev_prev) if rev_prev else 0
         metrics['Rev Growth'] = f"{rev_g*100:.1f}%"
         if rev_g > 0.15: score += 1; details.append(f"Tăng trưởng DT tốt ({rev_g:.1%})")
         
         # 8. Inventory Turnover
-        inv = self.get_val(self.bal, ['Inventory'], 0)
-        cogs = self.get_val(self.fin, ['Cost Of Revenue', 'Cost of Goods Sold'], 0)
+        inv = m.value('inventory', 0)
+        cogs = m.value('cogs', 0)
         inv_turn = (cogs / inv) if inv else 0
         metrics['Inv Turnover'] = f"{inv_turn:.1f}x" if inv else "N/A"
         if inv > 0 and inv_turn > 4: score += 1
         
         # 9. NI Growth (YoY)
-        ni_prev = self.get_val(self.fin, ['Net Income', 'Net Income Common Stockholders'], 4)
+        ni_prev = m.value('net_income', 4)
         ni_g = ((ni - ni_prev) / abs(ni_prev)) if ni_prev else 0
         metrics['NI Growth'] = f"{ni_g*100:.1f}%"
         if ni_g > 0.15: score += 1
@@ -264,6 +267,14 @@ class FundamentalAnalyzer:
 # ==============================================================================
 
 def analyze_smart_v36(df: pd.DataFrame) -> Optional[Dict]:
+    """
+    Chuỗi nến có định danh (get_history_df gắn symbol vào df.attrs): dùng trạng thái chỉ báo
+    incremental -> nến mới / nến đang chạy chỉ tốn O(1) thay vì tính lại toàn bộ chỉ báo.
+    Kết quả giống hệt TechnicalAnalyzer (cùng công thức, cùng chuỗi nến).
+    """
+    symbol = df.attrs.get("symbol") if df is not None else None
+    if symbol and TechnicalAnalyzer(df).validate():
+        return INDICATOR_STATES.sync(symbol, df, df.attrs.get("interval", "1d")).analyze()
     analyzer = TechnicalAnalyzer(df)
     return analyzer.analyze()
 
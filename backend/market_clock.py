@@ -0,0 +1,216 @@
+"""
+================================================================================
+MODULE: backend/market_clock.py
+PROJECT: THANG LONG TERMINAL (ENTERPRISE EDITION)
+DESCRIPTION:
+    Market Session Clock (Đồng hồ phiên giao dịch).
+    - HOSE / HNX / UPCOM: phiên sáng, nghỉ trưa, phiên chiều, ngày nghỉ lễ.
+    - Đồng hồ riêng cho sàn Mỹ, Nhật, hợp đồng tương lai CME và Crypto (24/7).
+    - Cache hết hạn đúng MỐC PHIÊN kế tiếp thay vì TTL cố định:
+      ngoài giờ giao dịch (đêm, cuối tuần, lễ) không tải lại dữ liệu không đổi.
+================================================================================
+"""
+
+import os
+import json
+import logging
+from datetime import date, datetime, timedelta
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from backend.stock_list import get_exchange
+
+logger = logging.getLogger("ThangLongMarketClock")
+
+# ==============================================================================
+# 1. CONFIGURATION
+# ==============================================================================
+
+# Phiên = (phút bắt đầu, phút kết thúc) tính từ 00:00 giờ địa phương
+Session = Tuple[int, int]
+
+def _hm(hour: int, minute: int = 0) -> int:
+    return hour * 60 + minute
+
+# Ngày nghỉ lễ của Sở GDCK (cập nhật hằng năm theo thông báo chính thức).
+# Có thể bổ sung bằng file JSON {"hose": ["2027-01-01", ...]} qua biến TL_MARKET_HOLIDAYS.
+# Năm chưa có lịch nghỉ (chưa công bố) -> cảnh báo khi khởi động (xem check_holiday_coverage).
+VN_HOLIDAYS = frozenset(date.fromisoformat(d) for d in [
+    # 2025
+    "2025-01-01", "2025-01-27", "2025-01-28", "2025-01-29", "2025-01-30", "2025-01-31",
+    "2025-04-07", "2025-04-30", "2025-05-01", "2025-05-02", "2025-09-01", "2025-09-02",
+    # 2026
+    "2026-01-01", "2026-02-16", "2026-02-17", "2026-02-18", "2026-02-19", "2026-02-20",
+    "2026-04-27", "2026-04-30", "2026-05-01", "2026-09-01", "2026-09-02",
+])
+
+# Dữ liệu Yahoo cho sàn VN trễ vài phút -> coi phiên còn "sống" thêm 1 khoảng sau giờ đóng cửa
+VN_DATA_SETTLE = 15
+
+def _load_extra_holidays() -> Dict[str, FrozenSet[date]]:
+    path = os.environ.get("TL_MARKET_HOLIDAYS")
+    if not path: return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+        return {name: frozenset(date.fromisoformat(d) for d in days) for name, days in raw.items()}
+    except (OSError, ValueError) as e:
+        logger.warning(f"Cannot load holiday file {path}: {e}")
+        return {}
+
+# ==============================================================================
+# 2. MARKET CLOCK
+# ==============================================================================
+
+class MarketClock:
+    """
+    Lịch phiên của 1 thị trường.
+    - sessions: {thứ (0=Thứ 2): [phiên, ...]}; None = giao dịch liên tục (Crypto).
+    - settle: số phút dữ liệu còn thay đổi sau khi phiên kết thúc (trễ dữ liệu).
+    Mốc (boundary) = lúc bắt đầu phiên hoặc lúc kết thúc phiên + settle.
+    """
+    def __init__(self, name: str, tz: str, sessions: Optional[Dict[int, List[Session]]],
+                 holidays: Iterable[date] = (), settle: int = 0):
+        self.name = name
+        self.tz = ZoneInfo(tz)
+        self.sessions = sessions
+        self.holidays = frozenset(holidays)
+        self.settle = settle
+
+    def now(self) -> datetime:
+        return datetime.now(self.tz)
+
+    def localize(self, now: Optional[datetime] = None) -> datetime:
+        """Quy `now` (None = hiện tại, naive = giờ địa phương) về múi giờ của sàn."""
+        if now is None: return self.now()
+        if now.tzinfo is None: now = now.replace(tzinfo=self.tz)
+        return now.astimezone(self.tz)
+
+    def is_trading_day(self, day: date) -> bool:
+        if self.sessions is None: return True
+        return day not in self.holidays and bool(self.sessions.get(day.weekday()))
+
+    def _windows(self, day: date) -> List[Tuple[datetime, datetime]]:
+        """Các khoảng dữ liệu đang 'sống' trong 1 ngày (phiên + settle)."""
+        if not self.is_trading_day(day): return []
+        midnight = datetime(day.year, day.month, day.day, tzinfo=self.tz)
+        return [
+            (midnight + timedelta(minutes=start), midnight + timedelta(minutes=end + self.settle))
+            for start, end in self.sessions[day.weekday()]
+        ]
+
+    def trading_hours(self, day: date) -> Optional[Tuple[datetime, datetime]]:
+        """(giờ mở cửa phiên đầu, giờ đóng cửa phiên cuối) của 1 ngày; None nếu nghỉ / giao dịch liên tục."""
+        if self.sessions is None or not self.is_trading_day(day): return None
+        midnight = datetime(day.year, day.month, day.day, tzinfo=self.tz)
+        sessions = self.sessions[day.weekday()]
+        return midnight + timedelta(minutes=sessions[0][0]), midnight + timedelta(minutes=sessions[-1][1])
+
+    def _boundaries(self, now: datetime, back: int = 10, ahead: int = 15) -> List[datetime]:
+        out = []
+        for offset in range(-back, ahead + 1):
+            for start, end in self._windows(now.date() + timedelta(days=offset)):
+                out.extend((start, end))
+        return sorted(out)
+
+    def is_open(self, now: Optional[datetime] = None) -> bool:
+        """Dữ liệu có đang thay đổi không (trong phiên, kể cả khoảng settle)."""
+        if self.sessions is None: return True
+        now = self.localize(now)
+        for offset in (-1, 0):
+            for start, end in self._windows(now.date() + timedelta(days=offset)):
+                if start <= now < end: return True
+        return False
+
+    def next_boundary(self, now: Optional[datetime] = None) -> Optional[datetime]:
+        """Mốc phiên kế tiếp sau `now` (None với thị trường 24/7)."""
+        if self.sessions is None: return None
+        now = self.localize(now)
+        return next((b for b in self._boundaries(now) if b > now), None)
+
+    def last_boundary(self, now: Optional[datetime] = None) -> Optional[datetime]:
+        """Mốc phiên gần nhất <= `now` (None với thị trường 24/7)."""
+        if self.sessions is None: return None
+        now = self.localize(now)
+        past = [b for b in self._boundaries(now) if b <= now]
+        return past[-1] if past else None
+
+    def expiry(self, live_ttl: float, now: Optional[datetime] = None) -> float:
+        """
+        Thời điểm (epoch) cache nên được làm mới.
+        - Trong phiên: sau live_ttl giây, nhưng không vượt quá mốc kế tiếp (nghỉ trưa / đóng cửa).
+        - Ngoài phiên: đúng lúc mở phiên kế tiếp.
+        """
+        now = self.localize(now)
+        boundary = self.next_boundary(now)
+        if not self.is_open(now) and boundary is not None:
+            return boundary.timestamp()
+        live_until = now.timestamp() + live_ttl
+        return min(live_until, boundary.timestamp()) if boundary is not None else live_until
+
+# ==============================================================================
+# 3. CLOCK REGISTRY
+# ==============================================================================
+
+_WEEKDAYS = range(5)
+_VN_SESSIONS = [(_hm(9), _hm(11, 30)), (_hm(13), _hm(14, 45))]      # Có ATC 14:30-14:45
+_UPCOM_SESSIONS = [(_hm(9), _hm(11, 30)), (_hm(13), _hm(15))]
+_extra = _load_extra_holidays()
+
+MARKET_CLOCKS: Dict[str, MarketClock] = {
+    "hose": MarketClock("hose", "Asia/Ho_Chi_Minh", {d: _VN_SESSIONS for d in _WEEKDAYS},
+                        VN_HOLIDAYS | _extra.get("hose", frozenset()), settle=VN_DATA_SETTLE),
+    "hnx": MarketClock("hnx", "Asia/Ho_Chi_Minh", {d: _VN_SESSIONS for d in _WEEKDAYS},
+                       VN_HOLIDAYS | _extra.get("hnx", frozenset()), settle=VN_DATA_SETTLE),
+    "upcom": MarketClock("upcom", "Asia/Ho_Chi_Minh", {d: _UPCOM_SESSIONS for d in _WEEKDAYS},
+                         VN_HOLIDAYS | _extra.get("upcom", frozenset()), settle=VN_DATA_SETTLE),
+    "nyse": MarketClock("nyse", "America/New_York", {d: [(_hm(9, 30), _hm(16))] for d in _WEEKDAYS},
+                        _extra.get("nyse", frozenset())),
+    "jpx": MarketClock("jpx", "Asia/Tokyo", {d: [(_hm(9), _hm(11, 30)), (_hm(12, 30), _hm(15, 30))] for d in _WEEKDAYS},
+                       _extra.get("jpx", frozenset())),
+    # CME Globex: Chủ nhật 17:00 -> Thứ 6 16:00 (giờ Chicago), nghỉ 16:00-17:00 mỗi ngày
+    "cme": MarketClock("cme", "America/Chicago", {
+        0: [(0, _hm(16)), (_hm(17), _hm(24))], 1: [(0, _hm(16)), (_hm(17), _hm(24))],
+        2: [(0, _hm(16)), (_hm(17), _hm(24))], 3: [(0, _hm(16)), (_hm(17), _hm(24))],
+        4: [(0, _hm(16))], 6: [(_hm(17), _hm(24))]
+    }, _extra.get("cme", frozenset())),
+    "crypto": MarketClock("crypto", "UTC", None),
+}
+
+def get_clock(name: str) -> MarketClock:
+    return MARKET_CLOCKS.get(name, MARKET_CLOCKS["nyse"])
+
+def clock_for_symbol(ticker: str) -> MarketClock:
+    """
+    Đoán đồng hồ theo hậu tố mã Yahoo (.VN, .HN, -USD, =F, .T...).
+    Yahoo gắn .VN cho cả 3 sàn VN -> tra sàn niêm yết trong backend/stock_list.py
+    (UPCOM đóng cửa 15:00, muộn hơn HOSE/HNX); mã không có trong danh sách -> HOSE.
+    """
+    ticker = ticker.upper()
+    if ticker.endswith(".VN"):
+        return MARKET_CLOCKS.get((get_exchange(ticker) or "HOSE").lower(), MARKET_CLOCKS["hose"])
+    if ticker.endswith(".HN"): return MARKET_CLOCKS["hnx"]
+    if ticker.endswith("-USD"): return MARKET_CLOCKS["crypto"]
+    if ticker.endswith("=F"): return MARKET_CLOCKS["cme"]
+    if ticker.endswith(".T") or ticker == "^N225": return MARKET_CLOCKS["jpx"]
+    return MARKET_CLOCKS["nyse"]
+
+def check_holiday_coverage(today: Optional[date] = None) -> List[str]:
+    """
+    Các đồng hồ sàn VN chưa có ngày nghỉ lễ nào cho năm hiện tại (hoặc năm sau, nếu đang tháng 12):
+    Tết sẽ bị coi là ngày giao dịch. Ghi cảnh báo để bổ sung VN_HOLIDAYS / TL_MARKET_HOLIDAYS.
+    """
+    today = today or date.today()
+    years = [today.year] + ([today.year + 1] if today.month == 12 else [])
+    missing = []
+    for name in ("hose", "hnx", "upcom"):
+        covered = {d.year for d in MARKET_CLOCKS[name].holidays}
+        for year in years:
+            if year not in covered:
+                missing.append(f"{name}:{year}")
+    if missing:
+        logger.warning(f"No market holidays configured for {', '.join(missing)} - "
+                       f"update VN_HOLIDAYS or provide TL_MARKET_HOLIDAYS")
+    return missing
+
+check_holiday_coverage()
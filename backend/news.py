@@ -0,0 +1,207 @@
+"""
+================================================================================
+MODULE: backend/news.py
+PROJECT: THANG LONG TERMINAL (ENTERPRISE EDITION)
+DESCRIPTION:
+    News Feed Engine (Bộ tải tin tức RSS).
+    - Tải các feed Google News SONG SONG qua worker pool giới hạn (kết nối keep-alive dùng chung).
+    - GET có điều kiện (ETag / If-Modified-Since): feed không đổi -> server trả 304, không tải lại.
+    - Lưu nội dung feed + tin đã parse xuống đĩa; chỉ parse lại khi nội dung thực sự thay đổi.
+    - API batch: lấy tin cho cả watchlist trong 1 lượt gọi.
+    - Mọi tin tải về được ghi vào kho tin local (backend.news_index) để tìm kiếm sau.
+================================================================================
+"""
+
+import os
+import json
+import calendar
+import time
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import feedparser
+
+from backend.news_index import NEWS_INDEX, NewsIndex
+from backend.providers import get_provider
+from backend.store import CACHE_ROOT
+
+logger = logging.getLogger("ThangLongNews")
+
+# ==============================================================================
+# 1. CONFIGURATION
+# ==============================================================================
+
+FEED_DIR = os.path.join(CACHE_ROOT, "news", "feeds")
+DEFAULT_NEWS_WORKERS = int(os.environ.get("TL_NEWS_WORKERS", 8))
+DEFAULT_LIMIT = 15
+
+def news_urls(symbol: str) -> List[str]:
+    """Các truy vấn Google News RSS cho 1 mã."""
+    clean_symbol = symbol.replace(".VN", "")
+    return [
+        f"https://news.google.com/rss/search?q=cổ+phiếu+{clean_symbol}&hl=vi&gl=VN&ceid=VN:vi",
+        f"https://news.google.com/rss/search?q=thị+trường+chứng+khoán+{clean_symbol}&hl=vi&gl=VN&ceid=VN:vi"
+    ]
+
+def parse_feed(text: str) -> List[Dict]:
+    """Parse nội dung RSS thành danh sách tin (định dạng dùng cho UI)."""
+    items = []
+    for entry in feedparser.parse(text).entries:
+        if 'link' not in entry: continue
+        # Format ngày tháng
+        published = entry.get('published', '')
+        published_ts = None
+        try:
+            dt = datetime(*entry.published_parsed[:6])
+            published_str = dt.strftime("%H:%M %d/%m/%Y")
+            published_ts = calendar.timegm(entry.published_parsed)
+        except Exception:
+            published_str = published[:16]
+
+        items.append({
+            'title': entry.get('title', ''),
+            'link': entry.link,
+            'published': published_str,
+            'published_ts': published_ts,
+            'source': entry.source.title if 'source' in entry else 'Google News',
+            'summary': entry.get('summary', '')[:200] + '...'
+        })
+    return items
+
+# ==============================================================================
+# 2. ON-DISK FEED CACHE
+# ==============================================================================
+
+class FeedCache:
+    """Mỗi feed = <sha1(url)>.xml (nội dung gốc) + <sha1(url)>.json (validator, hash, tin đã parse)."""
+    def __init__(self, root: str = FEED_DIR):
+        self.root = root
+
+    def _paths(self, url: str):
+        digest = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.root, f"{digest}.xml"), os.path.join(self.root, f"{digest}.json")
+
+    def load(self, url: str) -> Optional[Dict]:
+        _, meta_path = self._paths(url)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                record = json.load(f)
+            return record if record.get("url") == url else None
+        except (OSError, ValueError):
+            return None
+
+    def save(self, url: str, record: Dict, body: Optional[str]) -> None:
+        body_path, meta_path = self._paths(url)
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+            if body is not None:
+                with open(body_path + suffix, "w", encoding="utf-8") as f:
+                    f.write(body)
+                os.replace(body_path + suffix, body_path)
+            with open(meta_path + suffix, "w", encoding="utf-8") as f:
+                json.dump(record, f, ensure_ascii=False)
+            os.replace(meta_path + suffix, meta_path)
+        except Exception as e:
+            logger.warning(f"Cannot persist feed {url}: {e}")
+
+# ==============================================================================
+# 3. NEWS FETCHER
+# ==============================================================================
+
+class NewsFetcher:
+    """
+    Tải feed qua worker pool dùng chung (giới hạn số kết nối đồng thời tới Google News).
+    Bộ đếm: requests (lượt GET), not_modified (304), unchanged (200 nhưng nội dung y cũ),
+    parsed (phải parse lại), errors.
+    """
+    def __init__(self, max_workers: int = DEFAULT_NEWS_WORKERS, cache: Optional[FeedCache] = None,
+                 index: Optional[NewsIndex] = None):
+        self.cache = cache or FeedCache()
+        self.index = index or NEWS_INDEX
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="tl-news")
+        self._lock = threading.Lock()
+        self.counters = {"requests": 0, "not_modified": 0, "unchanged": 0, "parsed": 0, "errors": 0}
+
+    def _count(self, name: str) -> None:
+        with self._lock: self.counters[name] += 1
+
+    def fetch_feed(self, url: str) -> List[Dict]:
+        """Tin của 1 feed. Lỗi mạng -> trả bản đã lưu (nếu có)."""
+        record = self.cache.load(url)
+        try:
+            self._count("requests")
+            status, text, etag, last_modified = get_provider().fetch_conditional(
+                url, etag=record.get("etag") if record else None,
+                last_modified=record.get("last_modified") if record else None
+            )
+        except Exception as e:
+            self._count("errors")
+            logger.error(f"Error fetching feed {url}: {e}")
+            return record["items"] if record else []
+
+        if status == 304 and record:
+            self._count("not_modified")
+            return record["items"]
+
+        content_hash = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        if record and record.get("hash") == content_hash:
+            self._count("unchanged")
+            items = record["items"]
+            body = None
+        else:
+            self._count("parsed")
+            items = parse_feed(text)
+            body = text
+        self.cache.save(url, {
+            "url": url, "etag": etag, "last_modified": last_modified,
+            "hash": content_hash, "fetched_at": time.time(), "items": items
+        }, body)
+        return items
+
+    def fetch_many(self, urls: List[str]) -> Dict[str, List[Dict]]:
+        """Tải nhiều feed song song (tối đa max_workers kết nối cùng lúc)."""
+        urls = list(dict.fromkeys(urls))
+        futures = {url: self._pool.submit(self.fetch_feed, url) for url in urls}
+        return {url: future.result() for url, future in futures.items()}
+
+    @staticmethod
+    def merge(feeds: List[List[Dict]], limit: int = DEFAULT_LIMIT) -> List[Dict]:
+        """Gộp các feed của 1 mã, bỏ tin trùng link, mới nhất trước (tin không có ngày xếp cuối)."""
+        seen_links = set()
+        merged = []
+        for items in feeds:
+            for item in items:
+                if item['link'] in seen_links: continue
+                seen_links.add(item['link'])
+                merged.append(item)
+        merged.sort(key=lambda item: item.get('published_ts') or 0, reverse=True)
+        return merged[:limit]
+
+    def symbol_news(self, symbol: str, limit: int = DEFAULT_LIMIT) -> List[Dict]:
+        urls = news_urls(symbol)
+        feeds = self.fetch_many(urls)
+        self.index.add(symbol, [item for u in urls for item in feeds[u]])
+        return self.merge([feeds[u] for u in urls], limit)
+
+    def batch(self, symbols: List[str], limit: int = DEFAULT_LIMIT) -> Dict[str, List[Dict]]:
+        """Tin cho cả watchlist: mọi feed của mọi mã được tải chung 1 lượt qua worker pool."""
+        urls_by_symbol = {symbol: news_urls(symbol) for symbol in symbols}
+        feeds = self.fetch_many([u for urls in urls_by_symbol.values() for u in urls])
+        for symbol, urls in urls_by_symbol.items():
+            self.index.add(symbol, [item for u in urls for item in feeds[u]])
+        return {symbol: self.merge([feeds[u] for u in urls], limit) for symbol, urls in urls_by_symbol.items()}
+
+    def stats(self) -> Dict:
+        with self._lock: return dict(self.counters)
+
+# Bộ tải dùng chung cho toàn tiến trình
+NEWS_FETCHER = NewsFetcher()
+
+def get_news_batch(symbols: List[str], limit: int = DEFAULT_LIMIT) -> Dict[str, List[Dict]]:
+    """API batch: {symbol: [tin]} cho cả watchlist."""
+    return NEWS_FETCHER.batch(symbols, limit)
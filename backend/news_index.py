@@ -0,0 +1,211 @@
+"""
+================================================================================
+MODULE: backend/news_index.py
+PROJECT: THANG LONG TERMINAL (ENTERPRISE EDITION)
+DESCRIPTION:
+    Local News Store (Kho tin tức + chỉ mục toàn văn).
+    - Mọi tin đã tải được lưu lại (SQLite, khử trùng theo link), gắn với các mã liên quan.
+    - Chỉ mục ngược (inverted index) trên tiêu đề + tóm tắt:
+      "tin nhắc tới 'cổ tức' trong 7 ngày qua trên cả watchlist" trả về tức thì, không gọi RSS.
+    - Feed theo mã sắp xếp đúng theo thời gian đăng.
+================================================================================
+"""
+
+import os
+import re
+import html
+import time
+import sqlite3
+import logging
+import threading
+import unicodedata
+from typing import Dict, List, Optional
+
+from backend.store import CACHE_ROOT
+
+logger = logging.getLogger("ThangLongNewsIndex")
+
+# ==============================================================================
+# 1. TEXT NORMALIZATION
+# ==============================================================================
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_TOKEN_RE = re.compile(r"\w+")
+
+def normalize_text(text: str) -> str:
+    """Bỏ thẻ HTML, chuẩn Unicode NFC (tiếng Việt có dấu gõ tổ hợp / dựng sẵn như nhau), chữ thường."""
+    text = html.unescape(_TAG_RE.sub(" ", text or ""))
+    return " ".join(_TOKEN_RE.findall(unicodedata.normalize("NFC", text).lower()))
+
+def tokenize(text: str) -> List[str]:
+    return normalize_text(text).split()
+
+# ==============================================================================
+# 2. NEWS INDEX
+# ==============================================================================
+
+class NewsIndex:
+    """
+    Kho tin SQLite (WAL, kết nối riêng mỗi thread):
+    - items: 1 dòng / link (khử trùng), kèm published_ts (epoch UTC) và first_seen.
+    - item_symbols: tin <-> mã (1 tin có thể thuộc nhiều mã).
+    - postings: term -> item (chỉ mục ngược trên tiêu đề + tóm tắt).
+    Tin không có ngày đăng được xếp theo lúc lần đầu thấy (first_seen).
+    """
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(CACHE_ROOT, "news", "index.sqlite")
+        self._uri = False
+        self._ready = False
+        self._keepalive: Optional[sqlite3.Connection] = None
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+
+    @staticmethod
+    def _create_schema(conn: sqlite3.Connection) -> None:
+        conn.execute("""CREATE TABLE IF NOT EXISTS items (
+            id INTEGER PRIMARY KEY, link TEXT UNIQUE, title TEXT, summary TEXT, source TEXT,
+            published TEXT, published_ts REAL, first_seen REAL, body TEXT)""")
+        conn.execute("CREATE INDEX IF NOT EXISTS items_time ON items (COALESCE(published_ts, first_seen))")
+        conn.execute("""CREATE TABLE IF NOT EXISTS item_symbols (
+            item_id INTEGER, symbol TEXT, PRIMARY KEY (symbol, item_id)) WITHOUT ROWID""")
+        conn.execute("""CREATE TABLE IF NOT EXISTS postings (
+            term TEXT, item_id INTEGER, PRIMARY KEY (term, item_id)) WITHOUT ROWID""")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False, uri=self._uri)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _setup(self) -> None:
+        """
+        Tạo thư mục + schema ở lần dùng đầu tiên (không phải lúc import).
+        Thư mục cache không ghi được -> dùng SQLite trong RAM (mất khi restart, app vẫn chạy).
+        """
+        with self._init_lock:
+            if self._ready: return
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                conn = self._connect()
+                self._create_schema(conn)
+                self._local.conn = conn
+            except Exception as e:
+                logger.warning(f"News index unavailable at {self.path} ({e}); using in-memory index")
+                self.path, self._uri = f"file:tl_news_{id(self)}?mode=memory&cache=shared", True
+                # Giữ 1 kết nối mở để DB trong RAM tồn tại suốt tiến trình
+                self._keepalive = self._connect()
+                self._create_schema(self._keepalive)
+            self._ready = True
+
+    def _conn(self) -> sqlite3.Connection:
+        if not self._ready: self._setup()
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _symbol(symbol: str) -> str:
+        return symbol.upper().replace(".VN", "")
+
+    def add(self, symbol: str, items: List[Dict]) -> int:
+        """Lưu các tin của 1 mã; tin đã có (cùng link) chỉ được gắn thêm mã. Trả về số tin mới."""
+        symbol = self._symbol(symbol)
+        added = 0
+        try:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for item in items:
+                    body = normalize_text(f"{item.get('title', '')} {item.get('summary', '')}")
+                    cur = conn.execute(
+                        """INSERT OR IGNORE INTO items (link, title, summary, source, published, published_ts, first_seen, body)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                        (item['link'], item.get('title', ''), item.get('summary', ''), item.get('source', ''),
+                         item.get('published', ''), item.get('published_ts'), time.time(), body))
+                    if cur.rowcount:
+                        item_id = cur.lastrowid
+                        conn.executemany("INSERT OR IGNORE INTO postings VALUES (?, ?)",
+                                         [(term, item_id) for term in set(body.split())])
+                        added += 1
+                    else:
+                        item_id = conn.execute("SELECT id FROM items WHERE link=?", (item['link'],)).fetchone()[0]
+                    conn.execute("INSERT OR IGNORE INTO item_symbols VALUES (?, ?)", (item_id, symbol))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        except Exception as e:
+            logger.warning(f"Cannot index news for {symbol}: {e}")
+            return 0
+        return added
+
+    def _select(self, where: List[str], params: List, limit: int) -> List[Dict]:
+        sql = f"""SELECT i.id, i.title, i.link, i.published, i.published_ts, i.source, i.summary,
+            (SELECT GROUP_CONCAT(symbol) FROM item_symbols s WHERE s.item_id = i.id)
+            FROM items i WHERE {' AND '.join(where) or '1'}
+            ORDER BY COALESCE(i.published_ts, i.first_seen) DESC LIMIT ?"""
+        try:
+            rows = self._conn().execute(sql, (*params, limit)).fetchall()
+        except Exception as e:
+            logger.warning(f"News index query failed: {e}")
+            return []
+        return [{
+            'title': r[1], 'link': r[2], 'published': r[3], 'published_ts': r[4],
+            'source': r[5], 'summary': r[6], 'symbols': sorted((r[7] or "").split(","))
+        } for r in rows]
+
+    @staticmethod
+    def _filters(symbols: Optional[List[str]], days: Optional[float]):
+        where, params = [], []
+        if symbols:
+            symbols = [NewsIndex._symbol(s) for s in symbols]
+            where.append(f"i.id IN (SELECT item_id FROM item_symbols WHERE symbol IN ({','.join('?' * len(symbols))}))")
+            params.extend(symbols)
+        if days is not None:
+            where.append("COALESCE(i.published_ts, i.first_seen) >= ?")
+            params.append(time.time() - days * 86400)
+        return where, params
+
+    def feed(self, symbol: str, limit: int = 15, days: Optional[float] = None) -> List[Dict]:
+        """Tin của 1 mã, mới nhất trước."""
+        where, params = self._filters([symbol], days)
+        return self._select(where, params, limit)
+
+    def search(self, query: str, symbols: Optional[List[str]] = None, days: Optional[float] = None,
+               limit: int = 50, phrase: bool = True) -> List[Dict]:
+        """
+        Tìm tin chứa mọi từ của `query` (phrase=True: các từ phải liền nhau theo đúng thứ tự),
+        lọc theo danh sách mã và số ngày gần đây. Ví dụ: search("cổ tức", watchlist, days=7).
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms: return []
+        where, params = self._filters(symbols, days)
+        where.insert(0, f"""i.id IN (SELECT item_id FROM postings WHERE term IN ({','.join('?' * len(terms))})
+            GROUP BY item_id HAVING COUNT(*) = {len(terms)})""")
+        params[:0] = terms
+        if phrase and len(terms) > 1:
+            # Khớp cả cụm trên văn bản đã chuẩn hóa (bao bằng khoảng trắng để không dính nửa từ)
+            where.append("(' ' || i.body || ' ') LIKE ?")
+            params.append(f"% {normalize_text(query)} %")
+        return self._select(where, params, limit)
+
+    def stats(self) -> Dict:
+        try:
+            conn = self._conn()
+            return {
+                "items": conn.execute("SELECT COUNT(*) FROM items").fetchone()[0],
+                "symbols": conn.execute("SELECT COUNT(DISTINCT symbol) FROM item_symbols").fetchone()[0],
+                "terms": conn.execute("SELECT COUNT(DISTINCT term) FROM postings").fetchone()[0],
+            }
+        except Exception as e:
+            logger.warning(f"News index stats failed: {e}")
+            return {"items": 0, "symbols": 0, "terms": 0}
+
+# Kho tin dùng chung cho toàn tiến trình (mọi replica trên máy dùng chung file SQLite; mở ở lần dùng đầu)
+NEWS_INDEX = NewsIndex()
+
+def search_news(query: str, symbols: Optional[List[str]] = None, days: Optional[float] = None, limit: int = 50) -> List[Dict]:
+    """Tìm tin trong kho local (không gọi RSS)."""
+    return NEWS_INDEX.search(query, symbols=symbols, days=days, limit=limit)
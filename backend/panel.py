@@ -0,0 +1,185 @@
+"""
+================================================================================
+MODULE: backend/panel.py
+PROJECT: THANG LONG TERMINAL (ENTERPRISE EDITION)
+DESCRIPTION:
+    Vectorized Cross-Sectional Scoring Engine (Bộ chấm điểm toàn thị trường).
+    - Gom cả universe thành ma trận 2D NumPy (thời gian x mã).
+    - Tính SuperTrend, EMA 34/89/200, Ichimoku, BBands, ATR, RSI theo cột, 1 lượt
+      (kernel NumPy trong backend.indicators).
+    - Chấm điểm 0-10 + Hành động bằng phép toán mảng.
+    - Tùy chọn: Process Pool chấm điểm song song cho universe lớn (TL_SCAN_WORKERS).
+    Kết quả trùng khớp với backend.logic.analyze_smart_v36 (cùng công thức pandas_ta).
+================================================================================
+"""
+
+import os
+import threading
+import multiprocessing as mp
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from backend import indicators as ind
+
+# ==============================================================================
+# 1. PANEL BUILDER
+# ==============================================================================
+
+PANEL_FIELDS = ("Open", "High", "Low", "Close", "Volume")
+
+def build_panel(frames: Dict[str, pd.DataFrame]) -> Tuple[List[str], Dict[str, np.ndarray], np.ndarray]:
+    """
+    Gom {symbol: DataFrame} thành các ma trận (T x N) căn lề PHẢI theo số nến.
+    Mỗi cột là chuỗi nến đã dropna(Close) của 1 mã, nến mới nhất nằm ở hàng cuối,
+    phần thiếu phía trên là NaN. Nhờ vậy các công thức đệ quy cho từng mã
+    chạy đúng như khi phân tích riêng lẻ.
+    """
+    symbols, cleaned = [], []
+    for symbol, df in frames.items():
+        if df is None or df.empty or 'Close' not in df.columns: continue
+        df = df.dropna(subset=['Close'])
+        if df.empty: continue
+        symbols.append(symbol)
+        cleaned.append(df)
+
+    lengths = np.array([len(df) for df in cleaned], dtype=np.int64)
+    T = int(lengths.max()) if len(lengths) else 0
+    arrays = {}
+    for field in PANEL_FIELDS:
+        mat = np.full((T, len(cleaned)), np.nan)
+        for j, df in enumerate(cleaned):
+            if field in df.columns:
+                mat[T - lengths[j]:, j] = df[field].to_numpy(dtype=float)
+        arrays[field] = mat
+    return symbols, arrays, lengths
+
+# ==============================================================================
+# 2. CROSS-SECTIONAL SCORING (Chấm điểm toàn bộ universe)
+# ==============================================================================
+
+def score_arrays(symbols: List[str], H: np.ndarray, L: np.ndarray, C: np.ndarray,
+                 V: np.ndarray, lengths: np.ndarray) -> pd.DataFrame:
+    """
+    Chấm điểm trên các ma trận (T x N) đã căn lề phải (đầu ra của build_panel).
+    Chỉ nhận mảng NumPy nên có thể gửi gọn sang process worker.
+    """
+    keep = lengths >= 50
+    if not keep.any(): return pd.DataFrame()
+    symbols = [s for s, k in zip(symbols, keep) if k]
+    lengths = lengths[keep]
+    # Cắt bớt hàng chỉ toàn NaN sau khi loại mã ngắn
+    T = int(lengths.max())
+    H, L, C, V = (m[-T:, keep] for m in (H, L, C, V))
+
+    # --- Chỉ báo (mỗi chỉ báo chỉ lấy hàng cuối để chấm điểm) ---
+    close = C[-1]
+    st_line = ind.supertrend(H, L, C, 10, 3.0)[0][-1]
+    # Chỉ báo không được tạo khi thiếu nến -> indicator_frame trả None -> Analyzer dùng mặc định 0
+    ema34 = np.where(lengths >= 34, ind.ema(C, 34)[-1], 0.0)
+    ema89 = np.where(lengths >= 89, ind.ema(C, 89)[-1], 0.0)
+    ema200 = np.where(lengths >= 200, ind.ema(C, 200)[-1], 0.0)
+    span_a, span_b = ind.ichimoku(H, L, C, 9, 26, 52)[:2]
+    span_a = np.where(lengths >= 52, span_a[-1], 0.0)
+    span_b = np.where(lengths >= 52, span_b[-1], 0.0)
+    rsi14 = ind.rsi(C, 14)[-1]
+    bb_upper = ind.bbands(C, 20, 2.0)[2][-1]
+    atr14 = ind.atr(H, L, C, 14)[-1]
+
+    # --- A. SCORING LOGIC (giống TechnicalAnalyzer.analyze) ---
+    with np.errstate(invalid="ignore"):
+        score = np.where(close > st_line, 2.0, -2.0)
+        score += ((close > ema34) & (ema34 > ema89)).astype(float)
+        score -= (close < ema200).astype(float)
+        score += ((close > span_a) & (close > span_b)).astype(float)
+        score += np.select([(rsi14 >= 50) & (rsi14 <= 70), rsi14 < 30, rsi14 > 75], [0.5, 1.5, -1.0], 0.0)
+        score += 2.0 * (close > bb_upper)
+
+    # --- B. CLASSIFICATION ---
+    final_score = np.clip(5 + score, 0, 10)
+    action = np.select(
+        [final_score >= 8, final_score >= 6, final_score <= 4],
+        ["MUA MẠNH 💎", "MUA (BUY)", "BÁN / CẮT LỖ"],
+        "QUAN SÁT"
+    )
+
+    return pd.DataFrame({
+        "score": final_score,
+        "action": action,
+        "close": close,
+        "prev_close": C[-2],
+        "atr": atr14,
+        "vol_now": V[-1],
+        "vol_avg": ind.sma(V[-20:], 20)[-1],
+        "length": lengths
+    }, index=symbols)
+
+def score_panel(frames: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """
+    Chấm điểm kỹ thuật cả universe trong 1 lượt.
+    Trả về DataFrame (index = symbol): score, action, close, prev_close, atr, vol_now, vol_avg, length.
+    Mã có ít hơn 50 nến bị loại (giống TechnicalAnalyzer.validate).
+    """
+    symbols, p, lengths = build_panel(frames)
+    return score_arrays(symbols, p["High"], p["Low"], p["Close"], p["Volume"], lengths)
+
+# ==============================================================================
+# 3. PROCESS POOL (Song song hóa chấm điểm cho universe lớn)
+# ==============================================================================
+
+# 0/1 = chấm điểm tuần tự trong tiến trình chính (mặc định)
+DEFAULT_SCAN_WORKERS = int(os.environ.get("TL_SCAN_WORKERS", 0))
+# Quét ít mã hơn ngưỡng này luôn chạy tuần tự (chi phí gửi/nhận lớn hơn lợi ích)
+PARALLEL_MIN_SYMBOLS = int(os.environ.get("TL_SCAN_PARALLEL_MIN", 200))
+
+def _score_packed(symbols: List[str], packed: np.ndarray, lengths: np.ndarray) -> pd.DataFrame:
+    """Entry point trong worker: packed là mảng (4 x T x N) High/Low/Close/Volume."""
+    return score_arrays(symbols, packed[0], packed[1], packed[2], packed[3], lengths)
+
+class ScoringPool:
+    """
+    Process pool chấm điểm: mỗi chunk được gửi dưới dạng 1 mảng float64 (4 x T x N)
+    thay vì pickle DataFrame. Pool tạo lười (lần submit đầu tiên) và dùng lại giữa các lượt quét.
+    Dùng context 'spawn' vì tiến trình Streamlit có nhiều luồng (fork không an toàn).
+    """
+    def __init__(self, workers: int = DEFAULT_SCAN_WORKERS):
+        self.workers = max(0, int(workers))
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def enabled_for(self, n_symbols: int) -> bool:
+        return self.workers > 1 and n_symbols >= PARALLEL_MIN_SYMBOLS
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=mp.get_context("spawn"))
+            return self._pool
+
+    def submit(self, frames: Dict[str, pd.DataFrame]) -> Future:
+        """Gửi 1 nhóm mã sang worker, Future trả về DataFrame giống score_panel."""
+        symbols, p, lengths = build_panel(frames)
+        packed = np.stack([p[f] for f in ("High", "Low", "Close", "Volume")]) if symbols else np.empty((4, 0, 0))
+        return self._executor().submit(_score_packed, symbols, packed, lengths)
+
+    def score(self, frames: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+        """Chia universe thành `workers` phần theo cột, chấm điểm song song rồi gộp lại."""
+        if not self.enabled_for(len(frames)): return score_panel(frames)
+        items = list(frames.items())
+        parts = [dict(items[i::self.workers]) for i in range(self.workers)]
+        results = [f.result() for f in [self.submit(part) for part in parts if part]]
+        results = [r for r in results if not r.empty]
+        if not results: return pd.DataFrame()
+        scores = pd.concat(results)
+        return scores.reindex([s for s in frames if s in scores.index])
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+# Pool dùng chung cho toàn tiến trình
+SCORING_POOL = ScoringPool()
@@ -0,0 +1,304 @@
+"""
+================================================================================
+MODULE: backend/prewarm.py
+PROJECT: THANG LONG TERMINAL (ENTERPRISE EDITION)
+DESCRIPTION:
+    Cache Prewarmer (Làm nóng cache theo lịch phiên HOSE).
+    - Chạy nền 3 lượt mỗi ngày giao dịch: TRƯỚC giờ mở cửa, NGAY SAU khi mở cửa (quét lại Radar
+      trong lúc RADAR_CACHE còn phục vụ dòng cũ) và SAU khi phiên đóng + settle,
+      để người dùng đầu tiên không phải chờ tải lạnh.
+    - Nội dung: chỉ số thị trường, Radar các sàn trong backend/stock_list.py,
+      màn Deep Dive của các mã được xem nhiều nhất.
+    - Giới hạn tốc độ (mã / giây) để không dội Yahoo; trạng thái + thời gian từng bước xem được trên UI.
+================================================================================
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from collections import Counter, deque
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from backend.store import CACHE_ROOT
+from backend.market_clock import MarketClock, get_clock
+from backend.stock_list import get_full_market_list
+
+logger = logging.getLogger("ThangLongPrewarm")
+
+# ==============================================================================
+# 1. CONFIGURATION
+# ==============================================================================
+
+PREWARM_ENABLED = os.environ.get("TL_PREWARM", "1") != "0"
+PREWARM_CLOCK = "hose"
+# Lượt sáng: trước giờ mở cửa bao nhiêu phút; lượt chiều: sau mốc đóng cửa + settle bao nhiêu phút
+PREWARM_LEAD_MIN = int(os.environ.get("TL_PREWARM_LEAD_MIN", 30))
+PREWARM_AFTER_MIN = int(os.environ.get("TL_PREWARM_AFTER_MIN", 5))
+# Lượt 'open': sau giờ mở cửa bao nhiêu phút (phải nằm trong radar_cache.OPEN_GRACE)
+PREWARM_OPEN_DELAY_MIN = int(os.environ.get("TL_PREWARM_OPEN_DELAY_MIN", 1))
+PREWARM_EXCHANGES = [x.strip().upper() for x in os.environ.get("TL_PREWARM_EXCHANGES", "HOSE,HNX,UPCOM").split(",") if x.strip()]
+PREWARM_TOP = int(os.environ.get("TL_PREWARM_TOP", 10))             # Số mã Deep Dive xem nhiều nhất
+PREWARM_RATE = float(os.environ.get("TL_PREWARM_RATE", 5))          # Mã / giây
+PREWARM_BATCH = 50                                                  # Mã / lượt quét Radar
+PREWARM_MIN_GAP = 600                                               # Giây tối thiểu giữa 2 lượt
+PREWARM_ON_START = os.environ.get("TL_PREWARM_ON_START", "0") == "1"
+PREWARM_DIR = os.path.join(CACHE_ROOT, "prewarm")
+
+# ==============================================================================
+# 2. RATE LIMITER & VIEW COUNTER
+# ==============================================================================
+
+class RateLimiter:
+    """Giãn đều công việc: acquire(n) chờ sao cho trung bình không vượt `rate` đơn vị / giây."""
+    def __init__(self, rate: float):
+        self.rate = max(rate, 0.01)
+        self._next_free = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, n: int = 1, stop: Optional[threading.Event] = None) -> None:
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_free)
+            self._next_free = start + n / self.rate
+        delay = start - now
+        if delay > 0:
+            if stop is not None: stop.wait(delay)
+            else: time.sleep(delay)
+
+class ViewCounter:
+    """Đếm lượt xem Deep Dive theo mã (lưu JSON, ghi xuống đĩa tối đa 1 lần / SAVE_EVERY giây)."""
+    SAVE_EVERY = 30
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(PREWARM_DIR, "views.json")
+        self._lock = threading.Lock()
+        self._saved_at = 0.0
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.counts = Counter(json.load(f))
+        except Exception:
+            self.counts = Counter()
+
+    def record(self, symbol: str) -> None:
+        symbol = symbol.strip().upper().replace(".VN", "")
+        if not symbol: return
+        with self._lock:
+            self.counts[symbol] += 1
+            due = time.time() - self._saved_at >= self.SAVE_EVERY
+        if due: self.save()
+
+    def save(self) -> None:
+        with self._lock:
+            data = dict(self.counts)
+            self._saved_at = time.time()
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            logger.warning(f"Cannot save view counts: {e}")
+
+    def top(self, n: int) -> List[str]:
+        with self._lock:
+            return [symbol for symbol, _ in self.counts.most_common(n)]
+
+# ==============================================================================
+# 3. SCHEDULE
+# ==============================================================================
+
+def upcoming_runs(clock: MarketClock, now: Optional[datetime] = None, days: int = 15,
+                  lead_min: int = PREWARM_LEAD_MIN, after_min: int = PREWARM_AFTER_MIN,
+                  open_delay_min: int = PREWARM_OPEN_DELAY_MIN) -> List[Tuple[datetime, str]]:
+    """
+    Các lượt prewarm sắp tới (giờ sàn, tăng dần), chỉ trong ngày giao dịch:
+    'pre-open' = mở cửa - lead_min; 'open' = mở cửa + open_delay_min (quét lại Radar bắt buộc);
+    'post-close' = đóng cửa + settle + after_min.
+    """
+    now = clock.localize(now)
+    runs = []
+    for offset in range(days):
+        hours = clock.trading_hours(now.date() + timedelta(days=offset))
+        if hours is None: continue
+        opens, closes = hours
+        runs.append((opens - timedelta(minutes=lead_min), "pre-open"))
+        runs.append((opens + timedelta(minutes=open_delay_min), "open"))
+        runs.append((closes + timedelta(minutes=clock.settle + after_min), "post-close"))
+    return [(when, label) for when, label in runs if when > now]
+
+# ==============================================================================
+# 4. PREWARMER
+# ==============================================================================
+
+class Prewarmer:
+    """
+    1 luồng nền (daemon) chờ tới lượt kế tiếp trong upcoming_runs() rồi chạy lần lượt các bước:
+    indices -> radar:<SÀN> -> deep-dive. Bước lỗi được ghi lại, không chặn các bước sau.
+    Dữ liệu đã còn mới trong cache được bỏ qua (không tải lại); riêng lượt 'open' quét lại
+    toàn bộ Radar vì dòng tạm dùng đầu phiên vẫn được RADAR_CACHE coi là còn dùng được.
+    """
+    HISTORY = 20
+
+    def __init__(self, clock: Optional[MarketClock] = None, exchanges: Optional[List[str]] = None,
+                 top: int = PREWARM_TOP, rate: float = PREWARM_RATE, views: Optional[ViewCounter] = None):
+        self.clock = clock or get_clock(PREWARM_CLOCK)
+        self.exchanges = list(exchanges if exchanges is not None else PREWARM_EXCHANGES)
+        self.top = top
+        self.limiter = RateLimiter(rate)
+        self.views = views or ViewCounter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._runs = deque(maxlen=self.HISTORY)
+        self._current: Optional[Dict] = None
+        self._next: Optional[Tuple[datetime, str]] = None
+        self._last_started = 0.0
+        self._manual = False
+
+    # --- Điều khiển ---
+    def start(self, run_now: bool = PREWARM_ON_START) -> "Prewarmer":
+        """Khởi động luồng nền (gọi nhiều lần vẫn chỉ có 1 luồng)."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive(): return self
+            self._stop.clear()
+            self._manual = run_now
+            self._thread = threading.Thread(target=self._loop, name="tl-prewarm", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+
+    def trigger(self) -> None:
+        """Yêu cầu chạy 1 lượt ngay (vẫn tôn trọng PREWARM_MIN_GAP)."""
+        with self._lock: self._manual = True
+        self._wake.set()
+
+    def record_view(self, symbol: str) -> None:
+        self.views.record(symbol)
+
+    # --- Vòng lặp ---
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            with self._lock:
+                manual, self._manual = self._manual, False
+            if manual:
+                self.run("manual")
+                continue
+            runs = upcoming_runs(self.clock)
+            with self._lock: self._next = runs[0] if runs else None
+            if not runs:
+                self._wake.wait(3600)
+            else:
+                when, label = runs[0]
+                delay = (when - self.clock.now()).total_seconds()
+                # Chờ theo từng đoạn ngắn: máy ngủ / đổi giờ hệ thống không làm lỡ lượt chạy
+                if self._wake.wait(min(max(delay, 0), 900)) or delay > 900:
+                    self._wake.clear()
+                    continue
+                self.run(label)
+            self._wake.clear()
+
+    def run(self, label: str = "manual") -> Optional[Dict]:
+        """Chạy 1 lượt prewarm đồng bộ. Trả về bản ghi lượt chạy (None nếu bị giãn cách / đang chạy)."""
+        with self._lock:
+            if self._current is not None or time.time() - self._last_started < PREWARM_MIN_GAP:
+                logger.info(f"Prewarm '{label}' skipped (running or within {PREWARM_MIN_GAP}s of last run)")
+                return None
+            self._last_started = time.time()
+            record = {"label": label, "started": datetime.now(self.clock.tz), "finished": None,
+                      "duration": None, "tasks": []}
+            self._current = record
+
+        logger.info(f"Prewarm '{label}' started")
+        steps: List[Tuple[str, Callable[[], str]]] = [("indices", self._warm_indices)]
+        refresh = label == "open"
+        steps += [(f"radar:{ex}", lambda ex=ex: self._warm_radar(ex, refresh)) for ex in self.exchanges]
+        steps.append(("deep-dive", self._warm_deep_dive))
+        for name, step in steps:
+            if self._stop.is_set(): break
+            with self._lock: record["task"] = name
+            start = time.perf_counter()
+            try:
+                detail, ok = step(), True
+            except Exception as e:
+                detail, ok = str(e), False
+                logger.warning(f"Prewarm step {name} failed: {e}")
+            record["tasks"].append({"task": name, "ok": ok, "seconds": round(time.perf_counter() - start, 2),
+                                    "detail": detail})
+
+        self.views.save()
+        with self._lock:
+            record.pop("task", None)
+            record["finished"] = datetime.now(self.clock.tz)
+            record["duration"] = round((record["finished"] - record["started"]).total_seconds(), 2)
+            self._runs.append(record)
+            self._current = None
+        logger.info(f"Prewarm '{label}' finished in {record['duration']}s")
+        return record
+
+    # --- Các bước ---
+    def _warm_indices(self) -> str:
+        from backend.data import warm_market_indices
+        return f"{warm_market_indices()} groups refreshed"
+
+    def _warm_radar(self, exchange: str, refresh: bool = False) -> str:
+        """Radar 1 sàn qua iter_pro_data: mã còn mới trong RADAR_CACHE được bỏ qua (refresh=True: quét lại hết)."""
+        from backend.data import iter_pro_data
+        symbols = get_full_market_list(exchange)
+        rows = 0
+        for i in range(0, len(symbols), PREWARM_BATCH):
+            if self._stop.is_set(): break
+            batch = symbols[i:i + PREWARM_BATCH]
+            self.limiter.acquire(len(batch), self._stop)
+            rows += sum(len(part) for part in iter_pro_data(batch, refresh=refresh))
+        return f"{rows}/{len(symbols)} rows"
+
+    def _warm_deep_dive(self) -> str:
+        from backend.data import warm_deep_dive
+        symbols = self.views.top(self.top)
+        warmed, failed = 0, []
+        for symbol in symbols:
+            if self._stop.is_set(): break
+            self.limiter.acquire(1, self._stop)
+            try:
+                warmed += warm_deep_dive(symbol)
+            except Exception as e:
+                failed.append(symbol)
+                logger.warning(f"Prewarm deep dive failed for {symbol}: {e}")
+        detail = f"{len(symbols)} symbols, {warmed} parts refreshed"
+        return f"{detail}, failed: {', '.join(failed)}" if failed else detail
+
+    # --- Trạng thái ---
+    def status(self) -> Dict:
+        with self._lock:
+            current = dict(self._current) if self._current else None
+            return {
+                "enabled": PREWARM_ENABLED,
+                "running": self._thread is not None and self._thread.is_alive(),
+                "current": current and {"label": current["label"], "task": current.get("task"),
+                                        "started": current["started"]},
+                "next_run": self._next[0] if self._next else None,
+                "next_label": self._next[1] if self._next else None,
+                "top_symbols": self.views.top(self.top),
+                "runs": list(reversed(self._runs)),
+            }
+
+# Prewarmer dùng chung cho toàn tiến trình (app khởi động 1 lần qua st.cache_resource)
+PREWARMER = Prewarmer()
+
+def start_prewarmer() -> Prewarmer:
+    """Khởi động prewarmer nếu được bật (TL_PREWARM != '0')."""
+    return PREWARMER.start() if PREWARM_ENABLED else PREWARMER
+
+def record_view(symbol: str) -> None:
+    PREWARMER.record_view(symbol)
+
+def prewarm_status() -> Dict:
+    return PREWARMER.status()
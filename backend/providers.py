@@ -0,0 +1,420 @@
+"""
+================================================================================
+MODULE: backend/providers.py
+PROJECT: THANG LONG TERMINAL (ENTERPRISE EDITION)
+DESCRIPTION:
+    Data Provider Layer (Lớp nguồn dữ liệu).
+    - Mọi lượt gọi ra Internet (yfinance, RSS, crawler HTML) đi qua 1 DataProvider.
+    - LiveProvider: gọi thật.
+    - RecordingProvider: gọi thật + ghi lại phản hồi xuống đĩa.
+    - ReplayProvider: phát lại phản hồi đã ghi (offline), có thể bơm độ trễ & tỉ lệ lỗi
+      để load-test get_pro_data / Deep Dive trong điều kiện kiểm soát được.
+    Chọn bằng TL_DATA_PROVIDER = live | record | replay (hoặc set_provider()).
+================================================================================
+"""
+
+import os
+import time
+import random
+import pickle
+import shutil
+import hashlib
+import tempfile
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+import yfinance as yf
+
+from backend.http_client import HTTP_CLIENT, HttpClient
+from backend.store import CACHE_ROOT, period_start
+
+logger = logging.getLogger("ThangLongProviders")
+
+# ==============================================================================
+# 1. CONFIGURATION
+# ==============================================================================
+
+PROVIDER_DIR = os.environ.get("TL_PROVIDER_DIR", os.path.join(CACHE_ROOT, "provider"))
+
+class ProviderError(Exception):
+    """Lỗi từ nguồn dữ liệu (bao gồm lỗi được bơm vào khi replay)."""
+
+class ReplayMiss(ProviderError):
+    """Không có phản hồi đã ghi cho lượt gọi này."""
+
+# Kết quả GET có điều kiện: (status, text, etag, last_modified)
+Conditional = Tuple[int, str, Optional[str], Optional[str]]
+
+def _strip_tz(df: pd.DataFrame) -> pd.DataFrame:
+    # Chuẩn hóa múi giờ (Xóa timezone để tránh lỗi khi plot / so sánh)
+    if df is not None and not df.empty and getattr(df.index, "tz", None) is not None:
+        df.index = df.index.tz_localize(None)
+    return df
+
+# ==============================================================================
+# 2. PROVIDER INTERFACE & LIVE IMPLEMENTATION
+# ==============================================================================
+
+class DataProvider:
+    """Giao diện nguồn dữ liệu dùng chung cho backend.data / scanner / commodities."""
+
+    def history(self, ticker: str, period: Optional[str] = None, interval: str = "1d",
+                start: Optional[datetime] = None) -> pd.DataFrame:
+        """Nến OHLCV 1 mã (index không timezone). Truyền `start` để chỉ lấy phần delta."""
+        raise NotImplementedError
+
+    def download(self, tickers: List[str], period: str = "5d", interval: str = "1d") -> pd.DataFrame:
+        """Nến nhiều mã trong 1 lượt (cột MultiIndex theo ticker)."""
+        raise NotImplementedError
+
+    def info(self, ticker: str) -> Dict:
+        raise NotImplementedError
+
+    def statements(self, ticker: str) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+        """BCTC theo quý: (kết quả kinh doanh, cân đối kế toán, lưu chuyển tiền tệ)."""
+        raise NotImplementedError
+
+    def actions(self, ticker: str) -> Tuple[pd.Series, pd.Series]:
+        """Sự kiện doanh nghiệp: (cổ tức, chia tách)."""
+        raise NotImplementedError
+
+    def fetch_text(self, url: str, timeout: float = 10) -> str:
+        """Nội dung text của 1 URL (RSS, trang HTML cần crawl)."""
+        raise NotImplementedError
+
+    def fetch_conditional(self, url: str, etag: Optional[str] = None, last_modified: Optional[str] = None,
+                          timeout: float = 10) -> Conditional:
+        """
+        GET có điều kiện (If-None-Match / If-Modified-Since).
+        Trả về (status, text, etag, last_modified); status 304 = nội dung không đổi, text rỗng.
+        Mặc định: GET thường (provider không hỗ trợ validator).
+        """
+        return 200, self.fetch_text(url, timeout=timeout), None, None
+
+class LiveProvider(DataProvider):
+    """
+    Gọi thẳng Yahoo Finance / Internet. HTTP (RSS, crawler HTML) đi qua backend.http_client.
+    Mọi request Yahoo chạy trên 1 pool giới hạn (pool_size) dùng chung cho cả tiến trình.
+    """
+    def __init__(self, pool_size: int = 16, client: Optional[HttpClient] = None):
+        self.client = client or HTTP_CLIENT
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="tl-live")
+
+    def history(self, ticker, period=None, interval="1d", start=None):
+        t = yf.Ticker(ticker)
+        if start is not None:
+            df = t.history(start=start, interval=interval)
+        else:
+            df = t.history(period=period or "1y", interval=interval)
+        return _strip_tz(df)
+
+    def _history_or_none(self, ticker: str, period: str, interval: str) -> Optional[pd.DataFrame]:
+        try:
+            df = yf.Ticker(ticker).history(period=period, interval=interval, auto_adjust=True)
+        except Exception as e:
+            logger.warning(f"Download failed for {ticker}: {e}")
+            return None
+        return _strip_tz(df) if df is not None and not df.empty else None
+
+    def download(self, tickers, period="5d", interval="1d"):
+        """
+        Giống yf.download(group_by='ticker', auto_adjust=True): yf.download cũng gọi Ticker.history
+        cho từng mã, nhưng qua trạng thái toàn cục (số luồng của multitasking, cờ hide_exceptions)
+        nên không gọi song song an toàn. Ở đây mỗi lượt có kết quả riêng -> các chunk của
+        scanner tải song song, tổng số request đồng thời giới hạn bởi pool của provider.
+        """
+        tickers = list(dict.fromkeys(tickers))
+        futures = {t: self._executor.submit(self._history_or_none, t, period, interval) for t in tickers}
+        frames = {t: df for t, df in ((t, f.result()) for t, f in futures.items()) if df is not None}
+        if not frames: return pd.DataFrame()
+        return pd.concat(frames, axis=1, sort=True, names=["Ticker", "Price"])
+
+    def info(self, ticker):
+        return dict(yf.Ticker(ticker).info or {})
+
+    def statements(self, ticker):
+        # 3 báo cáo = 3 request độc lập -> tải song song (mỗi luồng 1 đối tượng Ticker riêng)
+        attrs = ("quarterly_income_stmt", "quarterly_balance_sheet", "quarterly_cashflow")
+        futures = [self._executor.submit(lambda attr: getattr(yf.Ticker(ticker), attr), attr) for attr in attrs]
+        return tuple(f.result() for f in futures)
+
+    def actions(self, ticker):
+        t = yf.Ticker(ticker)
+        return t.dividends, t.splits
+
+    def fetch_text(self, url, timeout=10):
+        return self.client.get_text(url, timeout=timeout)
+
+    def fetch_conditional(self, url, etag=None, last_modified=None, timeout=10):
+        headers = {}
+        if etag: headers["If-None-Match"] = etag
+        if last_modified: headers["If-Modified-Since"] = last_modified
+        response = self.client.get(url, headers=headers, timeout=timeout)
+        if response.status_code == 304:
+            return 304, "", etag, last_modified
+        response.raise_for_status()
+        return 200, response.text, response.headers.get("ETag"), response.headers.get("Last-Modified")
+
+# ==============================================================================
+# 3. RECORD / REPLAY
+# ==============================================================================
+
+def _call_key(method: str, args: tuple) -> Tuple:
+    return (method,) + tuple(a.isoformat() if isinstance(a, datetime) else a for a in args)
+
+def _download_args(tickers, period: str, interval: str) -> tuple:
+    # Khóa của nến ngày giữ nguyên dạng cũ -> các bản ghi có sẵn vẫn phát lại được
+    return (tuple(tickers), period) if interval == "1d" else (tuple(tickers), period, interval)
+
+def _key_path(root: str, key: Tuple) -> str:
+    digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+    return os.path.join(root, key[0], f"{digest}.pkl")
+
+class RecordingProvider(DataProvider):
+    """Gọi provider bên trong rồi ghi (key, kết quả) xuống `root` để phát lại sau."""
+    def __init__(self, inner: Optional[DataProvider] = None, root: str = PROVIDER_DIR):
+        self.inner = inner or LiveProvider()
+        self.root = root
+
+    def _record(self, method: str, *args):
+        result = getattr(self.inner, method)(*args)
+        self._write(_call_key(method, args), result)
+        return result
+
+    def _write(self, key: Tuple, result: Any) -> None:
+        path = _key_path(self.root, key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump((key, result), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Cannot record {key}: {e}")
+
+    def history(self, ticker, period=None, interval="1d", start=None):
+        return self._record("history", ticker, period, interval, start)
+
+    def download(self, tickers, period="5d", interval="1d"):
+        return self._record("download", *_download_args(tickers, period, interval))
+
+    def info(self, ticker): return self._record("info", ticker)
+    def statements(self, ticker): return self._record("statements", ticker)
+    def actions(self, ticker): return self._record("actions", ticker)
+    def fetch_text(self, url, timeout=10): return self._record("fetch_text", url)
+
+    def fetch_conditional(self, url, etag=None, last_modified=None, timeout=10):
+        # Chỉ ghi phản hồi có nội dung (304 không dùng được khi phát lại)
+        result = self.inner.fetch_conditional(url, etag, last_modified, timeout)
+        if result[0] != 304:
+            key = _call_key("fetch_conditional", (url,))
+            self._write(key, result)
+        return result
+
+class ReplayProvider(DataProvider):
+    """
+    Phát lại phản hồi đã ghi. Không cần mạng.
+    - latency: (min, max) giây trễ ngẫu nhiên cho mỗi lượt gọi.
+    - error_rate: tỉ lệ lượt gọi bị bơm ProviderError (0..1).
+    - history thiếu key chính xác (delta fetch với `start` khác lúc ghi) -> cắt từ bản ghi
+      dài nhất của cùng (ticker, interval).
+    """
+    def __init__(self, root: str = PROVIDER_DIR, latency: Tuple[float, float] = (0.0, 0.0),
+                 error_rate: float = 0.0, seed: Optional[int] = None):
+        self.root = root
+        self.latency = latency
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._histories: Dict[Tuple[str, str], pd.DataFrame] = {}
+        self.calls = 0
+        self.misses = 0
+        self.injected_errors = 0
+        self._index_histories()
+
+    def _index_histories(self) -> None:
+        folder = os.path.join(self.root, "history")
+        if not os.path.isdir(folder): return
+        for name in os.listdir(folder):
+            if not name.endswith(".pkl"): continue
+            try:
+                with open(os.path.join(folder, name), "rb") as f:
+                    key, df = pickle.load(f)
+            except Exception:
+                continue
+            _, ticker, _, interval, _ = key
+            current = self._histories.get((ticker, interval))
+            if df is not None and not df.empty and (current is None or len(df) > len(current)):
+                self._histories[(ticker, interval)] = df
+
+    def _simulate(self) -> None:
+        with self._rng_lock:
+            self.calls += 1
+            delay = self._rng.uniform(*self.latency) if self.latency[1] > 0 else 0.0
+            fail = self._rng.random() < self.error_rate
+            if fail: self.injected_errors += 1
+        if delay: time.sleep(delay)
+        if fail: raise ProviderError("Injected replay error")
+
+    def _replay(self, method: str, *args) -> Any:
+        self._simulate()
+        key = _call_key(method, args)
+        try:
+            with open(_key_path(self.root, key), "rb") as f:
+                stored_key, result = pickle.load(f)
+            if stored_key == key: return result
+        except FileNotFoundError:
+            pass
+        with self._rng_lock: self.misses += 1
+        raise ReplayMiss(f"No recording for {key}")
+
+    def history(self, ticker, period=None, interval="1d", start=None):
+        try:
+            return self._replay("history", ticker, period, interval, start)
+        except ReplayMiss:
+            df = self._histories.get((ticker, interval))
+            if df is None: raise
+            lower = pd.Timestamp(start) if start is not None else period_start(period or "1y")
+            return df[df.index >= lower].copy() if lower is not None else df.copy()
+
+    def download(self, tickers, period="5d", interval="1d"):
+        return self._replay("download", *_download_args(tickers, period, interval))
+    def info(self, ticker): return self._replay("info", ticker)
+    def statements(self, ticker): return self._replay("statements", ticker)
+    def actions(self, ticker): return self._replay("actions", ticker)
+    def fetch_text(self, url, timeout=10): return self._replay("fetch_text", url)
+
+    def fetch_conditional(self, url, etag=None, last_modified=None, timeout=10):
+        status, text, rec_etag, rec_modified = self._replay("fetch_conditional", url)
+        # Validator trùng bản ghi -> giả lập 304 như server thật
+        if etag and etag == rec_etag:
+            return 304, "", rec_etag, rec_modified
+        return status, text, rec_etag, rec_modified
+
+    def stats(self) -> Dict:
+        with self._rng_lock:
+            return {"calls": self.calls, "misses": self.misses, "injected_errors": self.injected_errors}
+
+# ==============================================================================
+# 4. PROVIDER REGISTRY
+# ==============================================================================
+
+def _parse_latency(raw: str) -> Tuple[float, float]:
+    """'50' -> (0.05, 0.05); '20-200' -> (0.02, 0.2) (mili giây)."""
+    if not raw: return (0.0, 0.0)
+    lo, _, hi = raw.partition("-")
+    return (float(lo) / 1000, float(hi or lo) / 1000)
+
+def _provider_from_env() -> DataProvider:
+    mode = os.environ.get("TL_DATA_PROVIDER", "live")
+    if mode == "record": return RecordingProvider()
+    if mode == "replay":
+        seed = os.environ.get("TL_REPLAY_SEED")
+        return ReplayProvider(
+            latency=_parse_latency(os.environ.get("TL_REPLAY_LATENCY_MS", "")),
+            error_rate=float(os.environ.get("TL_REPLAY_ERROR_RATE", 0)),
+            seed=int(seed) if seed else None
+        )
+    return LiveProvider()
+
+_provider: Optional[DataProvider] = None
+_provider_lock = threading.Lock()
+
+def get_provider() -> DataProvider:
+    global _provider
+    with _provider_lock:
+        if _provider is None: _provider = _provider_from_env()
+        return _provider
+
+def set_provider(provider: DataProvider) -> DataProvider:
+    """Đổi nguồn dữ liệu cho toàn tiến trình (ví dụ khi load-test)."""
+    global _provider
+    with _provider_lock:
+        _provider = provider
+    return provider
+
+# ==============================================================================
+# 5. LOAD TEST HARNESS
+# ==============================================================================
+
+def _disk_stores() -> List[Tuple[Any, str]]:
+    """(kho trên đĩa, thư mục con) mà Radar / Deep Dive đọc ghi."""
+    from backend.incremental import INDICATOR_STATES
+    from backend.screener import FUNDAMENTALS_STORE
+    from backend.store import OHLCV_STORE
+    return [(OHLCV_STORE, "ohlcv"), (FUNDAMENTALS_STORE, "fundamentals"), (INDICATOR_STATES, "indicator_state")]
+
+def reset_stores() -> None:
+    """Xóa dữ liệu của các kho (đĩa + RAM), cache SWR và Radar để lượt gọi sau đi tới provider."""
+    from backend.cache import clear_all
+    from backend.features import FEATURE_STORE
+    from backend.radar_cache import RADAR_CACHE
+    for store, _ in _disk_stores():
+        shutil.rmtree(store.root, ignore_errors=True)
+        getattr(store, "_memo", {}).clear()
+    FEATURE_STORE.clear()
+    clear_all()
+    RADAR_CACHE.invalidate()
+
+@contextmanager
+def isolated_stores(root: Optional[str] = None) -> Iterator[str]:
+    """
+    Trỏ các kho trên đĩa về thư mục tạm và dùng cache SWR / Radar trong RAM riêng,
+    để dữ liệu replay / load-test không lẫn vào kho thật dưới CACHE_ROOT. Khôi phục khi xong.
+    """
+    from backend.cache import MemoryBackend, configure_cache, get_default_backend
+    from backend.features import FEATURE_STORE
+    stores = _disk_stores()
+    saved_roots = [store.root for store, _ in stores]
+    saved_backend = get_default_backend()
+    root = root or tempfile.mkdtemp(prefix="tl_loadtest_")
+    try:
+        for store, folder in stores:
+            store.root = os.path.join(root, folder)
+            getattr(store, "_memo", {}).clear()
+        configure_cache(MemoryBackend())
+        FEATURE_STORE.clear()
+        yield root
+    finally:
+        for (store, _), saved in zip(stores, saved_roots):
+            store.root = saved
+            getattr(store, "_memo", {}).clear()
+        configure_cache(saved_backend)
+        FEATURE_STORE.clear()
+        shutil.rmtree(root, ignore_errors=True)
+
+def run_load_test(tickers: List[str], deep_dive: Optional[List[str]] = None, rounds: int = 3,
+                  provider: Optional[DataProvider] = None) -> List[Dict]:
+    """
+    Đo thời gian quét Radar (get_pro_data, quét lại toàn bộ) và Deep Dive
+    (get_history_df + get_stock_data_full + analyze) trên provider cho trước (mặc định ReplayProvider).
+    Chạy trong isolated_stores(): kho nến / BCTC / trạng thái chỉ báo và cache được xóa trước mỗi vòng
+    để mọi lượt gọi đều đi tới provider; kho thật dưới CACHE_ROOT không bị ghi.
+    """
+    from backend.data import get_pro_data, get_history_df, get_stock_data_full
+    from backend.logic import analyze_smart_v36
+
+    previous = get_provider()
+    set_provider(provider or ReplayProvider())
+    results = []
+    try:
+        with isolated_stores():
+            for i in range(rounds):
+                reset_stores()
+                t0 = time.perf_counter()
+                radar = get_pro_data(tickers, refresh=True)
+                t1 = time.perf_counter()
+                for symbol in deep_dive or tickers[:3]:
+                    analyze_smart_v36(get_history_df(symbol))
+                    get_stock_data_full(symbol)
+                t2 = time.perf_counter()
+                results.append({"round": i, "radar_rows": len(radar), "radar_s": t1 - t0, "deep_dive_s": t2 - t1})
+                logger.info(f"Load test round {i}: {results[-1]}")
+    finally:
+        set_provider(previous)
+    return results
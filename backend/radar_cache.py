@@ -0,0 +1,109 @@
+"""
+================================================================================
+MODULE: backend/radar_cache.py
+PROJECT: THANG LONG TERMINAL (ENTERPRISE EDITION)
+DESCRIPTION:
+    Per-Symbol Radar Cache (Bộ nhớ đệm kết quả Radar theo từng mã).
+    - Mỗi mã lưu 1 dòng Radar kèm nến cuối đã dùng để chấm điểm.
+    - Sửa watchlist (thêm / bớt mã) chỉ quét lại các mã thiếu hoặc đã cũ.
+    - Dùng chung cho mọi session trong cùng 1 tiến trình server
+      (hoặc mọi replica trên máy khi dùng backend SQLite).
+================================================================================
+"""
+
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from backend.cache import CacheBackend, get_default_backend
+from backend.market_clock import clock_for_symbol
+
+# ==============================================================================
+# 1. CONFIGURATION
+# ==============================================================================
+
+# Trong phiên, nến ngày còn đang chạy -> dòng Radar chỉ được dùng lại trong khoảng này (giây)
+INTRADAY_TTL = int(os.environ.get("TL_RADAR_INTRADAY_TTL", 300))
+# Vài phút đầu phiên: dòng tải trong giờ nghỉ ngay trước đó (prewarm trước giờ mở cửa / sau đóng cửa)
+# vẫn được dùng tạm trong lúc prewarmer quét lại cả universe (stale-while-revalidate lúc mở phiên)
+OPEN_GRACE = int(os.environ.get("TL_RADAR_OPEN_GRACE", 600))
+
+# ==============================================================================
+# 2. RADAR CACHE
+# ==============================================================================
+
+class RadarCache:
+    """
+    Cache {ticker: (row, bar, fetched_at)} lưu qua CacheBackend (namespace riêng),
+    nên dùng backend SQLite thì mọi replica trên máy dùng chung các dòng Radar.
+    - row: dòng Radar (None = đã tải nhưng không đủ nến để chấm điểm).
+    - bar: timestamp nến cuối dùng để tính row.
+    Một dòng còn dùng được khi được tải SAU mốc phiên gần nhất của sàn niêm yết
+    (backend.market_clock: đã có nến hoàn thành mới nhất);
+    trong phiên (hoặc thị trường 24/7) thì thêm điều kiện không quá INTRADAY_TTL giây,
+    trừ OPEN_GRACE giây đầu phiên: dòng tải trong giờ nghỉ liền trước vẫn dùng được.
+    """
+    NAMESPACE = "backend.radar_cache.rows"
+    MAX_ENTRIES = 5000
+    RETAIN = 7 * 24 * 3600      # Giây giữ 1 dòng trong kho (độ mới do _is_fresh quyết định)
+
+    def __init__(self, intraday_ttl: int = INTRADAY_TTL, backend: Optional[CacheBackend] = None,
+                 open_grace: int = OPEN_GRACE):
+        self.intraday_ttl = intraday_ttl
+        self.open_grace = open_grace
+        self._backend = backend
+
+    @property
+    def backend(self) -> CacheBackend:
+        return self._backend or get_default_backend()
+
+    def _is_fresh(self, ticker: str, fetched_at: float, now: Optional[datetime]) -> bool:
+        clock = clock_for_symbol(ticker)
+        now = clock.localize(now)
+        boundary = clock.last_boundary(now)
+        if boundary is None:
+            return now.timestamp() - fetched_at <= self.intraday_ttl
+        if clock.is_open(now):
+            if now.timestamp() - fetched_at <= self.intraday_ttl: return True
+            # Trong phiên, mốc gần nhất là lúc mở phiên: dòng tải sau mốc đóng cửa trước đó
+            # (giờ nghỉ, dữ liệu không đổi) được dùng tạm open_grace giây đầu phiên
+            if (now - boundary).total_seconds() > self.open_grace: return False
+            previous = clock.last_boundary(boundary - timedelta(seconds=1))
+            return previous is not None and previous.timestamp() <= fetched_at < boundary.timestamp()
+        return fetched_at >= boundary.timestamp()
+
+    def partition(self, tickers: List[str], now: Optional[datetime] = None) -> Tuple[List[Dict], List[str]]:
+        """Tách watchlist thành (các dòng Radar còn dùng được, các mã cần quét lại)."""
+        rows, stale = [], []
+        for ticker in tickers:
+            entry = self.backend.get(self.NAMESPACE, ticker)
+            if entry is None or not self._is_fresh(ticker, entry[0][2], now):
+                stale.append(ticker)
+            elif entry[0][0] is not None:
+                rows.append(dict(entry[0][0]))
+        return rows, stale
+
+    def update(self, frames: Dict[str, pd.DataFrame], rows: pd.DataFrame) -> None:
+        """Ghi kết quả 1 chunk vừa quét. Mã tải lỗi (không có trong frames) không được ghi."""
+        by_symbol = {} if rows.empty else {r["Symbol"]: r for r in rows.to_dict("records")}
+        fetched_at = time.time()
+        for ticker, df in frames.items():
+            closes = df['Close'].dropna()
+            bar = closes.index[-1] if not closes.empty else None
+            value = (by_symbol.get(ticker.replace(".VN", "")), bar, fetched_at)
+            self.backend.set(self.NAMESPACE, ticker, (value, fetched_at, fetched_at + self.RETAIN), self.MAX_ENTRIES)
+
+    def invalidate(self, tickers: Optional[List[str]] = None) -> None:
+        if tickers is None:
+            self.backend.clear(self.NAMESPACE)
+            return
+        for ticker in tickers: self.backend.delete(self.NAMESPACE, ticker)
+
+    def stats(self) -> Dict:
+        return {"entries": self.backend.size(self.NAMESPACE)}
+
+# Cache dùng chung cho toàn tiến trình (mọi session Streamlit; mọi replica nếu backend là SQLite)
+RADAR_CACHE = RadarCache()
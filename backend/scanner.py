@@ -0,0 +1,191 @@
+"""
+================================================================================
+MODULE: backend/scanner.py
+PROJECT: THANG LONG TERMINAL (ENTERPRISE EDITION)
+DESCRIPTION:
+    Radar Download Engine (Bộ tải dữ liệu cho Radar).
+    - Chia universe thành các chunk nhỏ (chunk_size tùy chỉnh).
+    - Mỗi chunk = 1 lượt tải gộp (yf.download), chỉ mã lỗi/thiếu mới tải lẻ từng mã.
+    - Tải các chunk qua Worker Pool giới hạn số luồng (không dội bom Yahoo).
+    - Chunk lỗi / thiếu mã -> Retry với Exponential Backoff.
+    - Ghi nhận độ trễ từng chunk để tinh chỉnh chunk_size theo throttling.
+================================================================================
+"""
+
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from backend.providers import get_provider
+
+logger = logging.getLogger("ThangLongScanner")
+
+# ==============================================================================
+# 1. CONFIGURATION
+# ==============================================================================
+
+DEFAULT_CHUNK_SIZE = int(os.environ.get("TL_SCAN_CHUNK_SIZE", 25))
+DEFAULT_MAX_WORKERS = int(os.environ.get("TL_SCAN_DOWNLOAD_WORKERS", 6))
+DEFAULT_RETRIES = 2          # Số lần thử lại cho các mã bị thiếu trong chunk
+DEFAULT_BACKOFF = 1.0        # Giây, nhân đôi sau mỗi lần thử lại
+
+# Fetcher 1 mã: (ticker, period, interval) -> DataFrame OHLCV
+SymbolFetcher = Callable[[str, str, str], pd.DataFrame]
+# Fetcher gộp: (tickers, period, interval) -> {ticker: DataFrame OHLCV}
+BatchFetcher = Callable[[List[str], str, str], Dict[str, pd.DataFrame]]
+
+# Báo cáo của lần quét gần nhất (để UI / log tra cứu)
+_last_reports: List[Dict] = []
+_reports_lock = threading.Lock()
+
+# ==============================================================================
+# 2. HELPERS
+# ==============================================================================
+
+def _fetch_symbol_yahoo(ticker: str, period: str, interval: str) -> pd.DataFrame:
+    """Tải nến 1 mã qua DataProvider (Ticker.history khi chạy live) - dùng cho mã tải gộp bị lỗi."""
+    return get_provider().history(ticker, period=period, interval=interval)
+
+def split_download(raw: Optional[pd.DataFrame], symbols: List[str]) -> Dict[str, pd.DataFrame]:
+    """
+    Tách kết quả yf.download (cột MultiIndex theo ticker) thành {ticker: OHLCV}.
+    Bỏ các dòng toàn NaN (ngày mã khác có giao dịch còn mã này thì không) và mã không có giá.
+    """
+    if raw is None or raw.empty: return {}
+    parts: Dict[str, pd.DataFrame] = {}
+    if isinstance(raw.columns, pd.MultiIndex):
+        level = 0 if set(symbols) & set(raw.columns.get_level_values(0)) else 1
+        available = set(raw.columns.get_level_values(level))
+        parts = {s: raw.xs(s, axis=1, level=level) for s in symbols if s in available}
+    elif len(symbols) == 1:
+        parts = {symbols[0]: raw}
+
+    frames = {}
+    for symbol, df in parts.items():
+        if 'Close' not in df.columns: continue
+        df = df.dropna(how="all").copy()
+        df.columns.name = None
+        if df.index.tz is not None: df.index = df.index.tz_localize(None)
+        if not df['Close'].dropna().empty: frames[symbol] = df
+    return frames
+
+def _fetch_batch_yahoo(symbols: List[str], period: str, interval: str) -> Dict[str, pd.DataFrame]:
+    """
+    Cả chunk trong 1 lượt provider.download. LiveProvider giữ kết quả riêng cho từng lượt
+    (không dùng trạng thái toàn cục của yf.download), nên các worker tải các chunk song song.
+    """
+    return split_download(get_provider().download(symbols, period=period, interval=interval), symbols)
+
+def chunk_list(items: List[str], chunk_size: int) -> List[List[str]]:
+    """Cắt danh sách thành các chunk liên tiếp."""
+    size = max(1, int(chunk_size))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+def _download_chunk(chunk_id: int, symbols: List[str], period: str, interval: str,
+                    fetcher: SymbolFetcher, retries: int, backoff: float,
+                    batch_fetcher: Optional[BatchFetcher] = None) -> Tuple[Dict[str, pd.DataFrame], Dict]:
+    """
+    Tải 1 chunk: lượt đầu tải gộp cả chunk (nếu có batch_fetcher), các lượt sau chỉ tải lẻ
+    những mã lỗi/thiếu, với backoff tăng dần.
+    """
+    frames: Dict[str, pd.DataFrame] = {}
+    pending = list(symbols)
+    attempts = 0
+    requests = 0
+    last_error = None
+    t0 = time.perf_counter()
+
+    if batch_fetcher is not None:
+        attempts, requests = 1, 1
+        try:
+            frames.update(batch_fetcher(pending, period, interval))
+        except Exception as e:
+            last_error = str(e)
+        pending = [s for s in pending if s not in frames]
+
+    while pending and attempts <= retries:
+        if attempts > 0:
+            time.sleep(backoff * (2 ** (attempts - 1)))
+        attempts += 1
+        failed = []
+        for symbol in pending:
+            requests += 1
+            try:
+                df = fetcher(symbol, period, interval)
+                if df is None or df.empty or df['Close'].dropna().empty:
+                    failed.append(symbol)
+                    continue
+                frames[symbol] = df
+            except Exception as e:
+                last_error = str(e)
+                failed.append(symbol)
+        pending = failed
+
+    report = {
+        "chunk": chunk_id,
+        "symbols": len(symbols),
+        "received": len(frames),
+        "missing": pending,
+        "attempts": attempts,
+        "requests": requests,
+        "latency": time.perf_counter() - t0,
+        "error": last_error
+    }
+    return frames, report
+
+# ==============================================================================
+# 3. PUBLIC API
+# ==============================================================================
+
+def iter_download_chunks(tickers: List[str], period: str = "1y", interval: str = "1d",
+                         chunk_size: int = DEFAULT_CHUNK_SIZE, max_workers: int = DEFAULT_MAX_WORKERS,
+                         retries: int = DEFAULT_RETRIES, backoff: float = DEFAULT_BACKOFF,
+                         fetcher: Optional[SymbolFetcher] = None,
+                         batch_fetcher: Optional[BatchFetcher] = None) -> Iterator[Tuple[Dict[str, pd.DataFrame], Dict]]:
+    """
+    Tải universe theo chunk qua worker pool giới hạn.
+    Yield (frames, report) ngay khi mỗi chunk xong (thứ tự hoàn thành, không theo thứ tự gửi).
+    Mặc định mỗi chunk tải gộp qua provider; truyền riêng `fetcher` (không kèm batch_fetcher) -> tải từng mã.
+    Người gọi dừng sớm -> các chunk chưa chạy bị hủy, không chờ tải hết universe.
+    """
+    if fetcher is None and batch_fetcher is None:
+        batch_fetcher = _fetch_batch_yahoo
+    fetcher = fetcher or _fetch_symbol_yahoo
+    chunks = chunk_list(list(dict.fromkeys(tickers)), chunk_size)
+    reports = []
+    if not chunks: return
+
+    t0 = time.perf_counter()
+    pool = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks))), thread_name_prefix="tl-scan")
+    try:
+        futures = [
+            pool.submit(_download_chunk, i, chunk, period, interval, fetcher, retries, backoff, batch_fetcher)
+            for i, chunk in enumerate(chunks)
+        ]
+        for future in as_completed(futures):
+            frames, report = future.result()
+            reports.append(report)
+            logger.info(
+                f"Chunk {report['chunk']}: {report['received']}/{report['symbols']} symbols "
+                f"in {report['latency']:.2f}s ({report['requests']} requests, {report['attempts']} attempts)"
+            )
+            if report["missing"]:
+                logger.warning(f"Chunk {report['chunk']} dropped {report['missing']}: {report['error']}")
+            yield frames, report
+    finally:
+        # Không chờ các chunk còn xếp hàng khi người gọi dừng sớm (generator bị đóng)
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    logger.info(f"Scan download: {len(chunks)} chunks, {time.perf_counter() - t0:.2f}s total")
+    with _reports_lock:
+        _last_reports[:] = sorted(reports, key=lambda r: r["chunk"])
+
+def get_last_scan_report() -> List[Dict]:
+    """Báo cáo độ trễ từng chunk của lần quét gần nhất (hiển thị dưới Radar)."""
+    with _reports_lock:
+        return list(_last_reports)
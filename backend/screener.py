@@ -0,0 +1,349 @@
+"""
+================================================================================
+MODULE: backend/screener.py
+PROJECT: THANG LONG TERMINAL (ENTERPRISE EDITION)
+DESCRIPTION:
+    Universe Fundamental Screener (Bộ lọc cơ bản toàn sàn).
+    - Tải & lưu BCTC quý cho cả danh sách sàn (backend.stock_list) vào kho trên đĩa.
+    - Chỉ tải lại sau các mốc công bố BCTC (lịch báo cáo quý), không phải mỗi lần mở app.
+    - Tính 9 chỉ số sức khỏe tài chính cho TẤT CẢ mã trong 1 lượt vector hóa
+      -> DataFrame sắp xếp được, join với Radar theo cột 'Symbol'.
+    - Chuỗi quý lưu dần theo thời gian + chỉ số TTM cho MỌI quý -> lịch sử điểm sức khỏe.
+================================================================================
+"""
+
+import os
+import time
+import pickle
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from backend.providers import get_provider
+from backend.statements import FLOW_ROWS, ROW, StatementMatrix, merge_history, quarterly_frame, stack_matrices
+from backend.stock_list import get_full_market_list
+from backend.store import CACHE_ROOT
+
+logger = logging.getLogger("ThangLongScreener")
+
+# ==============================================================================
+# 1. CONFIGURATION & REPORTING CALENDAR
+# ==============================================================================
+
+DEFAULT_SCREEN_WORKERS = int(os.environ.get("TL_SCREEN_WORKERS", 8))
+
+# Hạn công bố BCTC quý (ngày sau khi kết thúc quý): riêng lẻ 20 ngày, hợp nhất 45 ngày
+# (30 ngày: mốc giữa, nhiều công ty nộp muộn hơn hạn riêng lẻ). BCTC năm kiểm toán: 90 ngày.
+REPORT_LAGS = (20, 30, 45)
+ANNUAL_AUDIT_LAG = 90
+
+# Không có BCTC (mã mới, Yahoo lỗi) -> thử lại sau khoảng này (giây)
+EMPTY_RETRY = 24 * 3600
+
+# Các field lấy từ info (bỏ phần còn lại cho nhẹ kho)
+INFO_FIELDS = ("returnOnEquity", "sector", "marketCap", "longName")
+
+def _quarter_ends(year: int) -> List[date]:
+    return [date(year, 3, 31), date(year, 6, 30), date(year, 9, 30), date(year, 12, 31)]
+
+def reporting_dates(start: date, end: date) -> List[date]:
+    """Các mốc công bố BCTC nằm trong [start, end]."""
+    out = set()
+    for year in range(start.year - 1, end.year + 1):
+        for q_end in _quarter_ends(year):
+            lags = REPORT_LAGS + ((ANNUAL_AUDIT_LAG,) if q_end.month == 12 else ())
+            out.update(q_end + timedelta(days=lag) for lag in lags)
+    return sorted(d for d in out if start <= d <= end)
+
+def needs_refresh(fetched_at: float, now: Optional[float] = None) -> bool:
+    """Đã qua 1 mốc công bố BCTC kể từ lần tải gần nhất chưa."""
+    now = now or time.time()
+    fetched = date.fromtimestamp(fetched_at)
+    return bool(reporting_dates(fetched + timedelta(days=1), date.fromtimestamp(now)))
+
+# ==============================================================================
+# 2. FUNDAMENTALS STORE
+# ==============================================================================
+
+class FundamentalsStore:
+    """
+    Kho BCTC quý trên đĩa: CACHE_ROOT/fundamentals/<SYMBOL>.pkl
+    = {"info", "fin", "bal", "cash", "history", "fetched_at"} (ghi atomic: file tạm + os.replace).
+    history: chuỗi quý chuẩn hóa (backend.statements.quarterly_frame) gộp qua mọi lần tải.
+    failed_at: lần tải lại gần nhất trả về BCTC rỗng (bản ghi giữ BCTC tốt trước đó).
+    """
+    def __init__(self, root: Optional[str] = None):
+        self.root = os.path.join(root or CACHE_ROOT, "fundamentals")
+        self._memo: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, symbol: str) -> str:
+        safe = "".join(c if c.isalnum() or c in ".-" else "_" for c in symbol.upper())
+        return os.path.join(self.root, f"{safe}.pkl")
+
+    def load(self, symbol: str) -> Optional[Dict]:
+        with self._lock:
+            if symbol in self._memo: return self._memo[symbol]
+        try:
+            with open(self._path(symbol), "rb") as f:
+                record = pickle.load(f)
+        except Exception:
+            return None
+        with self._lock: self._memo[symbol] = record
+        return record
+
+    def save(self, symbol: str, record: Dict) -> None:
+        with self._lock: self._memo[symbol] = record
+        path = self._path(symbol)
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                # Ma trận chuẩn hóa dựng lại được từ BCTC -> không ghi xuống đĩa
+                pickle.dump({k: v for k, v in record.items() if k != "matrix"}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Cannot persist fundamentals for {symbol}: {e}")
+
+    def is_stale(self, record: Optional[Dict], now: Optional[float] = None) -> bool:
+        if record is None: return True
+        now = now or time.time()
+        if record["fin"].empty and record["bal"].empty:
+            return now - record["fetched_at"] > EMPTY_RETRY
+        # Lần tải gần nhất trả về rỗng (lỗi tạm thời) -> giữ BCTC cũ, thử lại sau EMPTY_RETRY
+        if record.get("failed_at") and now - record["failed_at"] <= EMPTY_RETRY: return False
+        return needs_refresh(record["fetched_at"], now)
+
+    def fetch(self, symbol: str) -> Dict:
+        provider = get_provider()
+        # Cùng quy ước với data._format_ticker: mã VN (<= 3 ký tự) không đuôi -> .VN
+        ticker = symbol if "." in symbol or len(symbol) > 3 else f"{symbol}.VN"
+        info = provider.info(ticker)
+        fin, bal, cash = (df if df is not None else pd.DataFrame() for df in provider.statements(ticker))
+        now = time.time()
+        previous = self.load(symbol)
+        if fin.empty and bal.empty and previous is not None and not (previous["fin"].empty and previous["bal"].empty):
+            # yfinance trả bảng rỗng khi lỗi tạm thời -> không xóa BCTC tốt gần nhất, chỉ ghi lần thử
+            logger.warning(f"Empty statements for {symbol}, keeping the previous record")
+            record = {**previous, "failed_at": now}
+            self.save(symbol, record)
+            return record
+        record = {
+            "info": {k: info[k] for k in INFO_FIELDS if k in info},
+            "fin": fin, "bal": bal, "cash": cash,
+            "history": merge_history(previous.get("history") if previous else None,
+                                     quarterly_frame(fin, bal, cash), now),
+            "fetched_at": now
+        }
+        self.save(symbol, record)
+        return record
+
+    def get_many(self, symbols: List[str], refresh: bool = False,
+                 max_workers: int = DEFAULT_SCREEN_WORKERS) -> Dict[str, Dict]:
+        """BCTC cho cả danh sách; chỉ tải các mã chưa có / đã qua mốc công bố (song song)."""
+        records = {s: self.load(s) for s in symbols}
+        stale = [s for s, r in records.items() if refresh or self.is_stale(r)]
+        if stale:
+            logger.info(f"Fundamentals: fetching {len(stale)}/{len(symbols)} symbols")
+            with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+                futures = {s: pool.submit(self.fetch, s) for s in stale}
+                for s, future in futures.items():
+                    try:
+                        records[s] = future.result()
+                    except Exception as e:
+                        # Lỗi mạng -> dùng bản cũ nếu có
+                        logger.error(f"Fundamentals fetch error for {s}: {e}")
+        return {s: r for s, r in records.items() if r is not None}
+
+# Kho dùng chung cho toàn tiến trình
+FUNDAMENTALS_STORE = FundamentalsStore()
+
+# ==============================================================================
+# 3. VECTORIZED METRICS (9 CHỈ SỐ CHO CẢ SÀN)
+# ==============================================================================
+
+# Giá trị thô cần cho 9 chỉ số: (dòng chuẩn trong backend.statements, quý: 0 = mới nhất, 4 = cùng kỳ năm trước)
+RAW_FIELDS = {
+    "rev": ("revenue", 0), "ni": ("net_income", 0), "ebit": ("ebit", 0),
+    "assets": ("total_assets", 0), "liab": ("total_liabilities", 0),
+    "curr_asset": ("current_assets", 0), "curr_liab": ("current_liabilities", 0),
+    "ocf": ("operating_cash_flow", 0), "rev_prev": ("revenue", 4),
+    "inv": ("inventory", 0), "cogs": ("cogs", 0), "ni_prev": ("net_income", 4),
+}
+
+def statement_matrix(record: Dict) -> StatementMatrix:
+    """Ma trận BCTC chuẩn hóa của 1 bản ghi (dựng 1 lần, giữ trong bộ nhớ cùng bản ghi)."""
+    if "matrix" not in record:
+        record["matrix"] = StatementMatrix.from_statements(record["fin"], record["bal"], record["cash"])
+    return record["matrix"]
+
+def raw_frame(records: Dict[str, Dict]) -> pd.DataFrame:
+    """Bảng giá trị thô (mỗi mã 1 dòng): cắt thẳng từ khối [mã x chỉ tiêu x quý]."""
+    symbols = list(records)
+    if not symbols: return pd.DataFrame()
+    width = max(col for _, col in RAW_FIELDS.values()) + 1
+    cube = stack_matrices([statement_matrix(records[s]) for s in symbols], width)
+    raw = pd.DataFrame({name: cube[:, ROW[row], col] for name, (row, col) in RAW_FIELDS.items()}, index=symbols)
+    infos = [records[s]["info"] for s in symbols]
+    raw["roe"] = [info.get("returnOnEquity", 0) or 0 for info in infos]
+    raw["sector"] = [info.get("sector") or '' for info in infos]
+    raw["financial"] = raw["sector"].str.contains("Financial", regex=False)
+    raw["market_cap"] = [info.get("marketCap", 0) or 0 for info in infos]
+    raw["last_report"] = [str(records[s]["fin"].columns[0])[:10] if not records[s]["fin"].empty else None for s in symbols]
+    return raw
+
+def _ratio(num: np.ndarray, den: np.ndarray) -> np.ndarray:
+    # Giống FundamentalAnalyzer: mẫu = 0 -> 0 (mẫu NaN -> NaN)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(den != 0, num / np.where(den != 0, den, 1), 0.0)
+
+def _score(roe, nm, bep, da, cr, ocf, rev_g, inv, inv_turn, ni_g, financial) -> np.ndarray:
+    """Điểm sức khỏe (cùng ngưỡng với FundamentalAnalyzer.analyze), vector hóa."""
+    return (
+        np.select([roe > 0.20, roe > 0.15, roe < 0.05], [2, 1, -1], 0)
+        + np.select([nm > 0.15, nm < 0.02], [1, -1], 0)
+        + (bep > 0.1)
+        + np.where(financial, np.where(da > 0.95, -1, 0), np.select([da < 0.6, da > 0.8], [1, -1], 0))
+        + np.select([cr > 1.2, cr < 0.9], [1, -1], 0)
+        + np.where(ocf > 0, 1, -1)
+        + (rev_g > 0.15)
+        + ((inv > 0) & (inv_turn > 4))
+        + np.select([ni_g > 0.15, ni_g < -0.1], [1, -1], 0)
+    ).astype(int)
+
+def _health(score: np.ndarray) -> np.ndarray:
+    return np.select([score >= 6, score >= 3], ["VỮNG MẠNH 💪", "ỔN ĐỊNH"], "YẾU KÉM ⚠️")
+
+def score_fundamentals(raw: pd.DataFrame) -> pd.DataFrame:
+    """
+    9 chỉ số + điểm sức khỏe cho mọi mã cùng lúc (cùng ngưỡng chấm điểm với FundamentalAnalyzer).
+    Trả về số thực (không format chuỗi) để sắp xếp / lọc.
+    """
+    if raw.empty: return pd.DataFrame()
+    v = {c: raw[c].to_numpy(dtype=float) for c in list(RAW_FIELDS) + ["roe", "market_cap"]}
+    financial = raw["financial"].to_numpy(dtype=bool)
+
+    roe = v["roe"]
+    nm = _ratio(v["ni"], v["rev"])
+    bep = _ratio(v["ebit"], v["assets"])
+    da = _ratio(v["liab"], v["assets"])
+    cr = _ratio(v["curr_asset"], v["curr_liab"])
+    ocf = v["ocf"]
+    rev_g = _ratio(v["rev"] - v["rev_prev"], v["rev_prev"])
+    inv_turn = _ratio(v["cogs"], v["inv"])
+    ni_g = _ratio(v["ni"] - v["ni_prev"], np.abs(v["ni_prev"]))
+
+    score = _score(roe, nm, bep, da, cr, ocf, rev_g, v["inv"], inv_turn, ni_g, financial)
+
+    return pd.DataFrame({
+        "Symbol": raw.index,
+        "ROE": roe, "Net Margin": nm, "BEP": bep,
+        "Debt/Asset": da, "Current Ratio": cr, "OCF": ocf,
+        "Rev Growth": rev_g, "Inv Turnover": np.where(v["inv"] != 0, inv_turn, np.nan), "NI Growth": ni_g,
+        "Score": score,
+        "Health": _health(score),
+        "Market Cap": v["market_cap"], "Sector": raw["sector"].to_numpy(), "Last Report": raw["last_report"].to_numpy()
+    }).reset_index(drop=True)
+
+# ==============================================================================
+# 4. QUARTERLY HISTORY & TTM (LỊCH SỬ SỨC KHỎE THEO QUÝ)
+# ==============================================================================
+
+def record_history(record: Dict) -> pd.DataFrame:
+    """Chuỗi quý của 1 bản ghi (bản ghi cũ chưa có history -> dựng từ BCTC đã lưu)."""
+    history = record.get("history")
+    if history is None:
+        history = merge_history(None, quarterly_frame(record["fin"], record["bal"], record["cash"]), record["fetched_at"])
+        record["history"] = history
+    return history
+
+def ttm_metrics(history: pd.DataFrame, sector: str = '') -> pd.DataFrame:
+    """
+    9 chỉ số cho MỌI quý trong 1 lượt vector hóa.
+    - Doanh thu, LNST, EBIT, giá vốn, OCF: TTM = tổng 4 quý liên tiếp (thiếu quý -> NaN, không chấm điểm).
+    - Số dư (tài sản, nợ...): giá trị cuối quý; thiếu dòng -> 0 (giống FundamentalAnalyzer).
+    - ROE = LNST TTM / vốn chủ (tài sản - nợ); tăng trưởng = TTM so với TTM cùng kỳ năm trước.
+    """
+    if history.empty: return pd.DataFrame()
+    # Lưới quý liên tục: quý bị thiếu thành NaN để cửa sổ 4 quý không nối qua khoảng trống
+    grid = pd.period_range(history.index.min(), history.index.max(), freq="Q")
+    q = history.reindex(grid)
+    ttm = q[list(FLOW_ROWS)].rolling(4, min_periods=4).sum()
+    bal = q.drop(columns=list(FLOW_ROWS) + ["first_seen"], errors="ignore").fillna(0.0)
+
+    rev, ni, ocf = ttm["revenue"].to_numpy(), ttm["net_income"].to_numpy(), ttm["operating_cash_flow"].to_numpy()
+    rev_prev, ni_prev = ttm["revenue"].shift(4).to_numpy(), ttm["net_income"].shift(4).to_numpy()
+    assets, liab = bal["total_assets"].to_numpy(), bal["total_liabilities"].to_numpy()
+    inv = bal["inventory"].to_numpy()
+
+    roe = _ratio(ni, assets - liab)
+    nm = _ratio(ni, rev)
+    bep = _ratio(ttm["ebit"].to_numpy(), assets)
+    da = _ratio(liab, assets)
+    cr = _ratio(bal["current_assets"].to_numpy(), bal["current_liabilities"].to_numpy())
+    rev_g = _ratio(rev - rev_prev, rev_prev)
+    inv_turn = _ratio(ttm["cogs"].to_numpy(), inv)
+    ni_g = _ratio(ni - ni_prev, np.abs(ni_prev))
+
+    score = _score(roe, nm, bep, da, cr, ocf, rev_g, inv, inv_turn, ni_g, 'Financial' in (sector or ''))
+    # Chỉ chấm điểm quý có đủ TTM và bảng cân đối
+    scored = ~np.isnan(rev) & ~np.isnan(ni) & (assets != 0)
+
+    out = pd.DataFrame({
+        "Revenue TTM": rev, "Net Income TTM": ni, "OCF TTM": ocf,
+        "ROE": roe, "Net Margin": nm, "BEP": bep,
+        "Debt/Asset": da, "Current Ratio": cr, "OCF": ocf,
+        "Rev Growth": np.where(np.isnan(rev_prev), np.nan, rev_g),
+        "Inv Turnover": np.where(inv != 0, inv_turn, np.nan),
+        "NI Growth": np.where(np.isnan(ni_prev), np.nan, ni_g),
+        "Score": np.where(scored, score, np.nan),
+        "Health": np.where(scored, _health(score), None),
+    }, index=grid)
+    out["first_seen"] = q["first_seen"] if "first_seen" in q else np.nan
+    return out.loc[history.index]
+
+def quarterly_history(symbol: str, refresh: bool = False, as_of: Optional[float] = None) -> pd.DataFrame:
+    """
+    Chỉ số TTM theo quý của 1 mã từ kho (chỉ tải khi chưa có / đã qua mốc công bố).
+    as_of (epoch): chỉ giữ các quý đã được thấy trước thời điểm đó (point-in-time).
+    """
+    symbol = symbol.strip().upper().replace(".VN", "")
+    record = FUNDAMENTALS_STORE.get_many([symbol], refresh=refresh).get(symbol)
+    if record is None: return pd.DataFrame()
+    history = record_history(record)
+    out = ttm_metrics(history, record["info"].get("sector") or '')
+    if as_of is not None and not out.empty:
+        out = out[out["first_seen"] <= as_of]
+    return out
+
+def health_history(symbol: str, refresh: bool = False) -> pd.Series:
+    """Chuỗi điểm sức khỏe theo quý (bỏ các quý chưa đủ dữ liệu TTM)."""
+    history = quarterly_history(symbol, refresh=refresh)
+    if history.empty: return pd.Series(dtype=float, name="Score")
+    return history["Score"].dropna()
+
+# ==============================================================================
+# 5. PUBLIC API
+# ==============================================================================
+
+def screen_symbols(symbols: List[str], refresh: bool = False,
+                   max_workers: int = DEFAULT_SCREEN_WORKERS) -> pd.DataFrame:
+    """9 chỉ số cơ bản cho danh sách mã (không đuôi .VN), sắp xếp theo điểm giảm dần."""
+    symbols = [s.strip().upper().replace(".VN", "") for s in symbols if s.strip()]
+    records = FUNDAMENTALS_STORE.get_many(symbols, refresh=refresh, max_workers=max_workers)
+    df = score_fundamentals(raw_frame(records))
+    if df.empty: return df
+    return df.sort_values(["Score", "ROE"], ascending=False, ignore_index=True)
+
+def screen_universe(exchange: str = "HOSE", refresh: bool = False,
+                    max_workers: int = DEFAULT_SCREEN_WORKERS) -> pd.DataFrame:
+    """
+    Bộ lọc cơ bản cho cả sàn (HOSE / HNX / UPCOM / ALL).
+    Join với Radar theo cột 'Symbol': backend.data.merge_fundamentals(radar_df, exchange).
+    """
+    return screen_symbols(get_full_market_list(exchange), refresh=refresh, max_workers=max_workers)
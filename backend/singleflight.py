@@ -0,0 +1,96 @@
+"""
+================================================================================
+MODULE: backend/singleflight.py
+PROJECT: THANG LONG TERMINAL (ENTERPRISE EDITION)
+DESCRIPTION:
+    Single-Flight Request Coalescing (Gộp các lượt gọi trùng nhau).
+    - Nhiều session cùng gọi 1 fetcher với cùng tham số -> chỉ 1 lượt gọi mạng thật,
+      các lượt còn lại chờ và dùng chung kết quả (hoặc cùng nhận lỗi).
+    - Đếm số lượt gọi đã được gộp để theo dõi tải lên Yahoo.
+================================================================================
+"""
+
+import functools
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable
+
+logger = logging.getLogger("ThangLongSingleFlight")
+
+# ==============================================================================
+# 1. SINGLE-FLIGHT GROUP
+# ==============================================================================
+
+class SingleFlight:
+    """
+    Nhóm single-flight: tại mỗi thời điểm, mỗi key chỉ có tối đa 1 lượt thực thi.
+    Lượt gọi đến sau khi lượt đầu đã xong sẽ thực thi lại (không phải cache).
+    """
+    def __init__(self):
+        self._inflight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs) -> Any:
+        with self._lock:
+            self.calls += 1
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+                self.executions += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn(*args, **kwargs)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._inflight)
+            }
+
+# Nhóm dùng chung cho toàn tiến trình
+SINGLE_FLIGHT = SingleFlight()
+
+# ==============================================================================
+# 2. DECORATOR
+# ==============================================================================
+
+def single_flight(fn: Callable = None, *, group: SingleFlight = SINGLE_FLIGHT) -> Callable:
+    """
+    Decorator: các lượt gọi đồng thời cùng (hàm, tham số) chia sẻ 1 lượt thực thi.
+    Đặt BÊN TRONG decorator cache để chỉ các lượt cache-miss mới đi qua đây.
+    Kết quả được dùng chung giữa các lượt gọi -> phía gọi không nên sửa tại chỗ.
+    """
+    def decorate(func: Callable) -> Callable:
+        name = f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (name, args, tuple(sorted(kwargs.items())))
+            try: hash(key)
+            except TypeError: return func(*args, **kwargs)  # Tham số không hash được -> gọi thẳng
+            return group.do(key, func, *args, **kwargs)
+        return wrapper
+
+    return decorate(fn) if fn is not None else decorate
@@ -0,0 +1,149 @@
+"""
+================================================================================
+MODULE: backend/statements.py
+PROJECT: THANG LONG TERMINAL (ENTERPRISE EDITION)
+DESCRIPTION:
+    Normalized Financial Statements (BCTC chuẩn hóa).
+    - Lược đồ dòng CỐ ĐỊNH: mỗi chỉ tiêu có 1 tên chuẩn, gom các tên dòng khác nhau của Yahoo
+      (vd. 'Total Liabilities Net Minority Interest' / 'Total Liabilities').
+    - Ba báo cáo quý -> 1 ma trận NumPy dày đặc [chỉ tiêu x quý], dựng 1 lần mỗi mã.
+    - 9 chỉ số cơ bản truy cập theo chỉ số dòng/cột, không tìm chuỗi.
+    - Chuỗi quý theo thời gian (point-in-time): gộp các lần tải, ghi lại lúc mỗi quý được thấy lần đầu.
+================================================================================
+"""
+
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# ==============================================================================
+# 1. CANONICAL ROW SCHEMA
+# ==============================================================================
+
+# (tên chuẩn, báo cáo, các tên dòng Yahoo theo thứ tự ưu tiên)
+STATEMENT_SCHEMA = (
+    ("revenue", "fin", ("Total Revenue", "Operating Revenue")),
+    ("net_income", "fin", ("Net Income", "Net Income Common Stockholders")),
+    ("ebit", "fin", ("EBIT", "Operating Income", "Pretax Income")),
+    ("cogs", "fin", ("Cost Of Revenue", "Cost of Goods Sold")),
+    ("total_assets", "bal", ("Total Assets",)),
+    ("total_liabilities", "bal", ("Total Liabilities Net Minority Interest", "Total Liabilities")),
+    ("current_assets", "bal", ("Current Assets", "Total Current Assets")),
+    ("current_liabilities", "bal", ("Current Liabilities", "Total Current Liabilities")),
+    ("inventory", "bal", ("Inventory",)),
+    ("operating_cash_flow", "cash", ("Operating Cash Flow", "Cash Flow From Continuing Operating Activities")),
+)
+
+# Tên chuẩn -> chỉ số dòng trong ma trận
+ROW: Dict[str, int] = {name: i for i, (name, _, _) in enumerate(STATEMENT_SCHEMA)}
+ROWS: List[str] = [name for name, _, _ in STATEMENT_SCHEMA]
+
+# Chỉ tiêu dòng chảy (cộng dồn 4 quý = TTM); phần còn lại là số dư cuối kỳ
+FLOW_ROWS = ("revenue", "net_income", "ebit", "cogs", "operating_cash_flow")
+
+def _numeric(df: pd.DataFrame) -> np.ndarray:
+    try:
+        return df.to_numpy(dtype=float)
+    except (TypeError, ValueError):
+        return df.apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+
+def _row_positions(df: pd.DataFrame, stmt: str) -> Iterator[Tuple[int, int]]:
+    """(chỉ số dòng chuẩn, vị trí dòng trong df) cho các chỉ tiêu của báo cáo `stmt` có trong df."""
+    # Vị trí đầu tiên của mỗi nhãn dòng (1 lượt băm thay vì `in df.index` cho từng chỉ số)
+    positions = {}
+    for i, label in enumerate(df.index):
+        positions.setdefault(label, i)
+    for r, (_, row_stmt, aliases) in enumerate(STATEMENT_SCHEMA):
+        if row_stmt != stmt: continue
+        pos = next((positions[a] for a in aliases if a in positions), None)
+        if pos is not None: yield r, pos
+
+# ==============================================================================
+# 2. STATEMENT MATRIX
+# ==============================================================================
+
+class StatementMatrix:
+    """
+    values[ROW[tên chuẩn], j] = giá trị của quý thứ j tính từ quý mới nhất (cột 0),
+    theo đúng thứ tự cột của từng báo cáo Yahoo.
+    Dòng không có trong báo cáo / quý vượt quá số cột -> 0.0;
+    ô NaN từ Yahoo giữ nguyên NaN.
+    periods: nhãn cột (quý) của báo cáo có nhiều cột nhất.
+    """
+    __slots__ = ("values", "periods")
+
+    def __init__(self, values: np.ndarray, periods: Sequence):
+        self.values = values
+        self.periods = list(periods)
+
+    @classmethod
+    def from_statements(cls, fin: Optional[pd.DataFrame], bal: Optional[pd.DataFrame],
+                        cash: Optional[pd.DataFrame]) -> "StatementMatrix":
+        frames = {"fin": fin, "bal": bal, "cash": cash}
+        frames = {k: df for k, df in frames.items() if df is not None and not df.empty}
+        width = max((df.shape[1] for df in frames.values()), default=0)
+        values = np.zeros((len(STATEMENT_SCHEMA), width))
+        periods = max((list(df.columns) for df in frames.values()), key=len, default=[])
+
+        for stmt, df in frames.items():
+            arr = _numeric(df)
+            for r, pos in _row_positions(df, stmt):
+                values[r, :arr.shape[1]] = arr[pos]
+        return cls(values, periods)
+
+    @property
+    def empty(self) -> bool:
+        return self.values.shape[1] == 0
+
+    def value(self, name: str, col: int = 0) -> float:
+        return float(self.values[ROW[name], col]) if col < self.values.shape[1] else 0.0
+
+    def padded(self, width: int) -> np.ndarray:
+        """Ma trận đúng `width` cột (thiếu -> 0.0) để xếp chồng nhiều mã thành khối 3 chiều."""
+        out = np.zeros((len(STATEMENT_SCHEMA), width))
+        n = min(width, self.values.shape[1])
+        out[:, :n] = self.values[:, :n]
+        return out
+
+def stack_matrices(matrices: Sequence[StatementMatrix], width: int = 5) -> np.ndarray:
+    """Khối [mã x chỉ tiêu x quý] cho tính toán vector hóa trên cả sàn."""
+    if not matrices: return np.zeros((0, len(STATEMENT_SCHEMA), width))
+    return np.stack([m.padded(width) for m in matrices])
+
+# ==============================================================================
+# 3. QUARTERLY TIME SERIES
+# ==============================================================================
+
+def quarterly_frame(fin: Optional[pd.DataFrame], bal: Optional[pd.DataFrame],
+                    cash: Optional[pd.DataFrame]) -> pd.DataFrame:
+    """
+    BCTC chuẩn hóa theo THỜI GIAN: index = quý (PeriodIndex, tăng dần), cột = ROWS.
+    Cột của từng báo cáo được khớp theo ngày kết thúc quý; ô không có dữ liệu = NaN.
+    """
+    parts = []
+    for stmt, df in (("fin", fin), ("bal", bal), ("cash", cash)):
+        if df is None or df.empty: continue
+        dates = pd.to_datetime(pd.Index(df.columns), errors="coerce")
+        valid = ~dates.isna()
+        if not valid.any(): continue
+        arr = _numeric(df)[:, valid]
+        part = pd.DataFrame({ROWS[r]: arr[pos] for r, pos in _row_positions(df, stmt)},
+                            index=pd.PeriodIndex(dates[valid], freq="Q"))
+        parts.append(part[~part.index.duplicated()])
+    if not parts:
+        return pd.DataFrame(columns=ROWS, index=pd.PeriodIndex([], freq="Q"), dtype=float)
+    return pd.concat(parts, axis=1).reindex(columns=ROWS).sort_index()
+
+def merge_history(history: Optional[pd.DataFrame], latest: pd.DataFrame, seen_at: float) -> pd.DataFrame:
+    """
+    Gộp lần tải mới vào chuỗi quý đã lưu (Yahoo chỉ trả ~5 quý gần nhất -> chuỗi dài dần theo thời gian).
+    Số liệu mới ghi đè (BCTC điều chỉnh); first_seen = lúc quý đó được thấy lần đầu (point-in-time).
+    """
+    latest = latest.copy()
+    latest["first_seen"] = seen_at
+    if history is None or history.empty: return latest
+    merged = latest.combine_first(history)
+    known = merged.index.intersection(history.index)
+    merged.loc[known, "first_seen"] = history.loc[known, "first_seen"]
+    return merged.sort_index()
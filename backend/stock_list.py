@@ -53,3 +53,9 @@ def get_full_market_list(exchange="HOSE"):
     if exchange == "HNX": return HNX
     if exchange == "UPCOM": return UPCOM
     return HOSE + HNX + UPCOM # ALL
+
+# Tra sàn niêm yết theo mã (HOSE / HNX / UPCOM); mã không có trong danh sách -> None
+_EXCHANGE_OF = {symbol: name for name, symbols in (("UPCOM", UPCOM), ("HNX", HNX), ("HOSE", HOSE)) for symbol in symbols}
+
+def get_exchange(symbol):
+    return _EXCHANGE_OF.get(symbol.upper().replace(".VN", ""))
@@ -0,0 +1,229 @@
+"""
+================================================================================
+MODULE: backend/store.py
+PROJECT: THANG LONG TERMINAL (ENTERPRISE EDITION)
+DESCRIPTION:
+    Persistent OHLCV Store (Kho dữ liệu nến trên ổ đĩa).
+    - Mỗi cặp (symbol, interval) lưu 1 file Parquet dạng cột.
+    - Chỉ tải phần nến MỚI sau timestamp cuối cùng (Delta Fetch) rồi nối vào.
+    - Yahoo điều chỉnh ngược giá cũ khi có cổ tức / chia tách -> phát hiện qua nến chồng lấn,
+      cột Dividends / Stock Splits của phần delta, hoặc định kỳ -> tải lại toàn bộ
+      (không trộn 2 cơ sở điều chỉnh trong 1 chuỗi).
+    - Dữ liệu sống sót qua restart / redeploy -> Deep Dive load tức thì.
+================================================================================
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger("ThangLongOHLCVStore")
+
+# ==============================================================================
+# 1. CONFIGURATION
+# ==============================================================================
+
+# Thư mục gốc cho mọi cache trên đĩa (có thể đổi bằng biến môi trường)
+CACHE_ROOT = os.environ.get(
+    "TL_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".tl_cache")
+)
+
+# Quy đổi chuỗi period của Yahoo sang số ngày lịch
+PERIOD_DAYS = {
+    "1d": 1, "5d": 5, "1mo": 31, "3mo": 92, "6mo": 183,
+    "1y": 366, "2y": 731, "5y": 1827, "10y": 3653
+}
+
+# Các khung thời gian tính theo ngày (delta fetch dùng start dạng 'YYYY-MM-DD')
+DAILY_INTERVALS = ("1d", "5d", "1wk", "1mo", "3mo")
+
+# Sai lệch tương đối tối đa của giá đóng cửa ở nến chồng lấn (lớn hơn -> Yahoo đã điều chỉnh lại lịch sử)
+ADJUST_TOLERANCE = 5e-4
+# Tải lại toàn bộ định kỳ (ngày) để bắt mọi điều chỉnh mà 2 cách trên bỏ sót
+FULL_REFRESH_DAYS = float(os.environ.get("TL_OHLCV_FULL_REFRESH_DAYS", 7))
+# Cột sự kiện doanh nghiệp của Ticker.history
+ACTION_COLUMNS = ("Dividends", "Stock Splits")
+
+# Fetcher: (ticker, interval, period, start) -> DataFrame OHLCV (index không timezone)
+Fetcher = Callable[[str, str, Optional[str], Optional[datetime]], pd.DataFrame]
+
+def period_start(period: str, now: Optional[datetime] = None) -> Optional[pd.Timestamp]:
+    """Mốc bắt đầu của một period ('2y', 'ytd'...). Trả về None với 'max'."""
+    now = now or datetime.now()
+    if period == "max": return None
+    if period == "ytd": return pd.Timestamp(datetime(now.year, 1, 1))
+    days = PERIOD_DAYS.get(period)
+    if days is None:
+        raise ValueError(f"Unsupported period: {period}")
+    return pd.Timestamp(now - timedelta(days=days)).normalize()
+
+# ==============================================================================
+# 2. OHLCV STORE
+# ==============================================================================
+
+class OHLCVStore:
+    """
+    Kho nến OHLCV dạng Parquet, mỗi file = 1 (symbol, interval).
+    Kèm 1 file manifest JSON nhỏ ghi lại mốc bắt đầu đã tải đủ (covered_from)
+    để biết khi nào cần tải lại toàn bộ (user xin period dài hơn).
+    """
+    def __init__(self, root: Optional[str] = None):
+        self.root = os.path.join(root or CACHE_ROOT, "ohlcv")
+        self._locks: Dict[str, threading.Lock] = {}
+        self._guard = threading.Lock()
+
+    # --- Đường dẫn & khóa ---
+    def _key(self, symbol: str, interval: str) -> str:
+        safe = "".join(c if c.isalnum() or c in ".-" else "_" for c in symbol.upper())
+        return f"{safe}__{interval}"
+
+    def _paths(self, symbol: str, interval: str):
+        key = self._key(symbol, interval)
+        return os.path.join(self.root, f"{key}.parquet"), os.path.join(self.root, f"{key}.json")
+
+    def _lock(self, symbol: str, interval: str) -> threading.Lock:
+        key = self._key(symbol, interval)
+        with self._guard:
+            if key not in self._locks: self._locks[key] = threading.Lock()
+            return self._locks[key]
+
+    # --- Đọc / Ghi ---
+    def load(self, symbol: str, interval: str = "1d") -> pd.DataFrame:
+        """Đọc toàn bộ nến đã lưu (DataFrame rỗng nếu chưa có)."""
+        data_path, _ = self._paths(symbol, interval)
+        if not os.path.exists(data_path): return pd.DataFrame()
+        try:
+            return pd.read_parquet(data_path)
+        except Exception as e:
+            logger.warning(f"Corrupted store file {data_path}: {e}")
+            return pd.DataFrame()
+
+    def _load_meta(self, symbol: str, interval: str) -> Dict:
+        _, meta_path = self._paths(symbol, interval)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save(self, symbol: str, interval: str, df: pd.DataFrame, covered_from: Optional[pd.Timestamp],
+             full_at: Optional[float] = None) -> None:
+        """
+        Ghi atomic (file tạm + os.replace) để tiến trình khác không đọc phải file dở.
+        full_at: lúc tải toàn bộ gần nhất (mặc định: bây giờ).
+        """
+        data_path, meta_path = self._paths(symbol, interval)
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            tmp_path = f"{data_path}.{os.getpid()}.tmp"
+            df.to_parquet(tmp_path)
+            os.replace(tmp_path, data_path)
+
+            meta = {
+                "covered_from": covered_from.isoformat() if covered_from is not None else "max",
+                "last_bar": df.index[-1].isoformat() if not df.empty else None,
+                "rows": int(len(df)),
+                "updated_at": time.time(),
+                "full_at": full_at if full_at is not None else time.time()
+            }
+            tmp_meta = f"{meta_path}.{os.getpid()}.tmp"
+            with open(tmp_meta, "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            os.replace(tmp_meta, meta_path)
+        except Exception as e:
+            # Không ghi được đĩa thì vẫn trả dữ liệu bình thường (store chỉ là lớp tăng tốc)
+            logger.warning(f"Cannot persist OHLCV for {symbol}/{interval}: {e}")
+
+    def _is_covered(self, meta: Dict, start: Optional[pd.Timestamp]) -> bool:
+        covered_from = meta.get("covered_from")
+        if not covered_from: return False
+        if covered_from == "max": return True
+        if start is None: return False
+        return pd.Timestamp(covered_from) <= start
+
+    @staticmethod
+    def _is_readjusted(stored: pd.DataFrame, delta: pd.DataFrame) -> Optional[str]:
+        """
+        Lý do phải tải lại toàn bộ (None = nối delta bình thường):
+        - Delta có cổ tức / chia tách mà kho chưa ghi nhận ở nến đó (Yahoo sẽ điều chỉnh ngược các nến cũ).
+        - Giá đóng cửa của nến đã hoàn thành (chồng lấn giữa kho và delta) lệch quá ADJUST_TOLERANCE.
+        """
+        for col in ACTION_COLUMNS:
+            if col not in delta.columns: continue
+            events = delta[col].fillna(0)
+            known = stored[col].reindex(events.index).fillna(0) if col in stored.columns else 0.0
+            if ((events != 0) & (events != known)).any(): return f"new {col.lower()}"
+
+        # Nến cuối trong kho có thể là nến phiên đang chạy -> chỉ so các nến trước nó
+        overlap = stored.index[:-1].intersection(delta.index)
+        if len(overlap):
+            old = stored.loc[overlap, "Close"].to_numpy(dtype=float)
+            new = delta.loc[overlap, "Close"].to_numpy(dtype=float)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                drift = np.abs(new - old) / np.abs(old)
+            if np.nanmax(drift, initial=0.0) > ADJUST_TOLERANCE: return "overlapping bars re-adjusted"
+        return None
+
+    def _full_fetch(self, symbol: str, interval: str, period: str, start: Optional[pd.Timestamp],
+                    fetcher: Fetcher) -> pd.DataFrame:
+        merged = fetcher(symbol, interval, period, None)
+        if merged is None or merged.empty: return pd.DataFrame()
+        merged = merged[~merged.index.duplicated(keep="last")].sort_index()
+        self.save(symbol, interval, merged, start)
+        return merged
+
+    # --- API chính ---
+    def get(self, symbol: str, period: str, interval: str, fetcher: Fetcher) -> pd.DataFrame:
+        """
+        Trả về nến của `period` gần nhất.
+        - Đã có dữ liệu phủ đủ period -> chỉ tải các nến từ nến hoàn thành cuối cùng (delta).
+        - Chưa có / period dài hơn / lịch sử đã bị điều chỉnh / quá FULL_REFRESH_DAYS -> tải đủ period rồi lưu.
+        Nến cuối cùng đã lưu được tải lại trong delta để cập nhật phiên đang chạy.
+        """
+        start = period_start(period)
+        with self._lock(symbol, interval):
+            stored = self.load(symbol, interval)
+            meta = self._load_meta(symbol, interval)
+            fresh = time.time() - float(meta.get("full_at", 0)) < FULL_REFRESH_DAYS * 86400
+
+            if stored.empty or not self._is_covered(meta, start) or not fresh:
+                merged = self._full_fetch(symbol, interval, period, start, fetcher)
+                if merged.empty: return merged
+            else:
+                # Lấy lùi 1 nến đã hoàn thành để đối chiếu giá (phát hiện điều chỉnh cổ tức / chia tách)
+                overlap_ts = stored.index[-2] if len(stored) > 1 else stored.index[-1]
+                delta_start = overlap_ts.normalize() if interval in DAILY_INTERVALS else overlap_ts
+                delta = fetcher(symbol, interval, None, delta_start.to_pydatetime())
+                merged = stored
+                reason = self._is_readjusted(stored, delta) if delta is not None and not delta.empty else None
+                if reason is not None:
+                    logger.info(f"Full refetch {symbol}/{interval}: {reason}")
+                    merged = self._full_fetch(symbol, interval, period, start, fetcher)
+                    if merged.empty: return merged
+                elif delta is not None and not delta.empty:
+                    merged = pd.concat([stored, delta])
+                    merged = merged[~merged.index.duplicated(keep="last")].sort_index()
+                    covered_from = None if meta["covered_from"] == "max" else pd.Timestamp(meta["covered_from"])
+                    self.save(symbol, interval, merged, covered_from, full_at=meta["full_at"])
+                    logger.info(f"Delta fetch {symbol}/{interval}: +{len(delta)} bars")
+
+        if start is not None:
+            merged = merged[merged.index >= start]
+        return merged.copy()
+
+    def clear(self, symbol: str, interval: str = "1d") -> None:
+        """Xóa dữ liệu đã lưu của 1 mã (buộc tải lại toàn bộ lần sau)."""
+        for path in self._paths(symbol, interval):
+            try: os.remove(path)
+            except OSError: pass
+
+# Store dùng chung cho toàn tiến trình
+OHLCV_STORE = OHLCVStore()
@@ -15,8 +15,8 @@ import streamlit as st
 import plotly.graph_objects as go
 import plotly.express as px  # Cần cái này để vẽ Galaxy
 from plotly.subplots import make_subplots
-import pandas_ta as ta
 import numpy as np
+from backend.features import FEATURE_STORE
 
 # ==============================================================================
 # 1. CORE VISUAL ENGINE (CSS ANIMATIONS & EFFECTS)
@@ -199,8 +199,8 @@ def render_interactive_chart(df, symbol):
 
     try:
         if 'ITS_9' not in df.columns:
-            ichi = ta.ichimoku(df['High'], df['Low'], df['Close'])
-            if ichi is not None: df = df.join(ichi[0])
+            ichi = FEATURE_STORE.get(df, "ichimoku", tenkan=9, kijun=26, senkou=52)
+            if ichi is not None: df = df.join(ichi)
     except: pass
 
     # Layout: Giá (70%) + Volume (30%)
@@ -245,11 +245,12 @@ def render_interactive_chart(df, symbol):
 # ==============================================================================
 # 6. MARKET GALAXY (VŨ TRỤ DÒNG TIỀN - VOLUME EXPLOSION)
 # ==============================================================================
-def render_market_galaxy(df):
+def render_market_galaxy(df, key="galaxy_chart_v50"):
     """
     Vẽ biểu đồ Galaxy - BẢN MỞ RỘNG (50 MÃ).
     - Top 50 mã nổ Volume nhất.
     - Giữ nguyên tính năng Zoom/Pan mượt mà.
+    - `key` riêng cho mỗi lần vẽ lại khi Radar đang stream.
     """
     if df.empty: return
 
@@ -341,4 +342,4 @@ def render_market_galaxy(df):
     }
     
     # Key mới để vẽ lại từ đầu
-    st.plotly_chart(fig, use_container_width=True, config=config, key="galaxy_chart_v50")
+    st.plotly_chart(fig, use_container_width=True, config=config, key=key)
@@ -0,0 +1,126 @@
+import threading
+import time
+
+import pytest
+
+from backend import cache as cache_mod
+from backend.cache import MemoryBackend, SQLiteBackend, configure_cache, get_default_backend
+
+
+@pytest.fixture
+def restore_default_backend():
+    previous = cache_mod._default_backend
+    yield
+    cache_mod._default_backend = previous
+
+
+def test_configure_cache_by_name_is_idempotent(restore_default_backend):
+    first = configure_cache("memory")
+    assert configure_cache("memory") is first
+    assert get_default_backend() is first
+
+
+def test_configure_cache_switches_kind_or_instance(restore_default_backend, tmp_path):
+    memory = configure_cache("memory")
+    assert isinstance(configure_cache("disk"), cache_mod.DiskBackend)
+    explicit = SQLiteBackend(str(tmp_path / "cache.sqlite"))
+    assert configure_cache(explicit) is explicit
+    assert configure_cache("memory") is not memory
+    with pytest.raises(ValueError):
+        configure_cache("redis")
+
+
+def test_sqlite_backend_degrades_on_database_errors(tmp_path, monkeypatch):
+    import sqlite3
+
+    backend = SQLiteBackend(str(tmp_path / "cache.sqlite"))
+    backend.set("ns", ("a",), ("value", 1.0, 2.0), 10)
+    assert backend.size("ns") == 1
+
+    def broken():
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(backend, "_conn", broken)
+    assert backend.get("ns", ("a",)) is None
+    backend.set("ns", ("b",), ("value", 1.0, 2.0), 10)
+    backend.delete("ns", ("a",))
+    backend.clear("ns")
+    backend.clear()
+    assert backend.size("ns") == 0
+    assert backend.acquire("ns", ("a",), 5) is True
+    backend.release("ns", ("a",))
+
+
+def test_unusable_results_skip_soft_until():
+    results = [[], ["row"], []]
+    cache = cache_mod.SWRCache(lambda: results.pop(0), soft_ttl=600, hard_ttl=3600, max_entries=4,
+                               soft_until=lambda: time.time() + 24 * 3600, backend=MemoryBackend(),
+                               usable=bool, retry_ttl=60)
+    key = ((), ())
+
+    assert cache.get((), {}) == []
+    value, soft, hard = cache.backend.get(cache.name, key)
+    assert soft - time.time() <= 60 and hard - time.time() <= 60
+
+    assert cache.warm((), {}, force=True)
+    value, soft, _ = cache.backend.get(cache.name, key)
+    assert value == ["row"] and soft - time.time() > 3600
+
+    # Lượt làm mới lỗi (rỗng) không ghi đè giá trị tốt, chỉ hẹn thử lại sớm
+    assert cache.warm((), {}, force=True)
+    value, soft, _ = cache.backend.get(cache.name, key)
+    assert value == ["row"] and soft - time.time() <= 60
+
+
+def _counting():
+    """Fetcher đếm lượt gọi; gate chặn các lượt sau lượt đầu (để quan sát làm mới nền)."""
+    calls = []
+    gate = threading.Event()
+
+    def fetch(symbol):
+        calls.append(symbol)
+        if len(calls) > 1: gate.wait(5)
+        return f"{symbol}-v{len(calls)}"
+
+    return fetch, calls, gate
+
+
+def test_stale_value_is_served_while_refreshing_in_background():
+    fetch, calls, gate = _counting()
+    cached = cache_mod.swr_cache(soft_ttl=0.05, hard_ttl=60, backend=MemoryBackend())(fetch)
+    assert cached("HPG") == "HPG-v1"
+    time.sleep(0.1)
+
+    start = time.perf_counter()
+    assert cached("HPG") == "HPG-v1"       # quá hạn mềm -> trả ngay bản cũ
+    assert cached("HPG") == "HPG-v1"       # làm mới đang chạy -> không gửi thêm lượt
+    assert time.perf_counter() - start < 0.5
+    gate.set()
+    deadline = time.time() + 5
+    while cached("HPG") != "HPG-v2" and time.time() < deadline: time.sleep(0.01)
+
+    assert calls == ["HPG", "HPG"]
+    stats = cached.stats()
+    assert stats["misses"] == 1 and stats["stale_hits"] >= 2
+
+
+def test_lru_evicts_least_recent_entry_at_max_entries():
+    fetch, calls, gate = _counting()
+    gate.set()
+    cached = cache_mod.swr_cache(soft_ttl=60, max_entries=2, backend=MemoryBackend())(fetch)
+    cached("A"); cached("B"); cached("A"); cached("C")   # B ít dùng gần đây nhất -> bị loại
+    assert cached.stats()["entries"] == 2
+    cached("A"); cached("C")
+    assert calls == ["A", "B", "C"]
+    cached("B")
+    assert calls == ["A", "B", "C", "B"]
+
+
+def test_hard_expired_entry_is_reloaded_synchronously():
+    fetch, calls, gate = _counting()
+    gate.set()
+    cached = cache_mod.swr_cache(soft_ttl=0.01, hard_ttl=0.02, backend=MemoryBackend())(fetch)
+    assert cached("HPG") == "HPG-v1"
+    time.sleep(0.05)
+    assert cached("HPG") == "HPG-v2"
+    assert cached.stats()["misses"] == 2
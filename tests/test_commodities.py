@@ -0,0 +1,115 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+from backend import commodities
+from backend.commodities import MetalsService, extract_table, parse_vnd_int
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("2.999.000", 2999000),
+    ("118,500", 118500),
+    (" 1 560 000 ", 1560000),
+    ("118.500 ▲500", 118500),
+    ("2.999.000 (+0,5%)", 2999000),
+    ("85000", 85000),
+    ("Xem tại web", None),
+    ("-", None),
+])
+def test_parse_vnd_int_reads_first_number(text, expected):
+    assert parse_vnd_int(text) == expected
+
+
+PAGE = """
+<table><tr><td>Cập nhật lúc 09:00 - Loại vàng SJC</td></tr><tr><td>x</td></tr></table>
+<table>
+  <caption>Bảng giá</caption>
+  <tr><td colspan="3">Đơn vị: nghìn đồng/lượng</td></tr>
+  <tr><th>Loại vàng</th><th>Mua vào</th><th>Bán ra</th></tr>
+  <tr><td>SJC 1L</td><td>118.500 ▲500</td><td>120.500</td></tr>
+  <tr><td>Loại vàng</td><td>Mua vào</td><td>Bán ra</td></tr>
+  <tr><td>SJC 5c</td><td>Liên hệ</td><td>120.520</td></tr>
+</table>
+"""
+
+
+def test_extract_table_matches_header_cells():
+    columns, rows = extract_table(PAGE, "loại vàng")
+    assert columns == ["Loại vàng", "Mua vào", "Bán ra"]
+    assert rows == [["SJC 1L", "118.500 ▲500", "120.500"], ["SJC 5c", "Liên hệ", "120.520"]]
+    assert extract_table(PAGE, "Sản phẩm") == ([], [])
+
+
+# =============================================================================
+# MetalsService: giữ bản tốt khi nguồn lỗi, không chờ quá deadline, chuỗi gọn
+# =============================================================================
+def _gold(buy, sell=None):
+    return pd.DataFrame({"Loại vàng": ["SJC 1L"], "Mua vào": [buy], "Bán ra": [sell or buy + 2000]})
+
+
+@pytest.fixture
+def gold_source(monkeypatch):
+    """Chỉ 1 nguồn 'gold'; script[0] là DataFrame trả về hoặc Exception sẽ raise."""
+    script = []
+
+    def crawl():
+        result = script[0]
+        if isinstance(result, Exception): raise result
+        return result
+
+    monkeypatch.setattr(commodities, "METAL_SOURCES", {"gold": (crawl, "Loại vàng", None, "Mua vào", "Bán ra")})
+    return script
+
+
+def test_failed_source_keeps_last_good_snapshot_with_real_error(tmp_path, gold_source):
+    service = MetalsService(root=str(tmp_path))
+    gold_source[:] = [_gold(118500)]
+    assert service.snapshot(force=True)["gold"]["ok"]
+
+    gold_source[:] = [ConnectionError("read timed out")]
+    snap = service.snapshot(force=True)["gold"]
+    assert not snap["ok"]
+    assert snap["error"] == "read timed out"
+    assert snap["data"]["Mua vào"].tolist() == [118500]
+
+    # Restart: bản tốt cuối được nạp lại từ đĩa
+    restarted = MetalsService(root=str(tmp_path))
+    snap = restarted.snapshot(force=True)["gold"]
+    assert snap["data"]["Mua vào"].tolist() == [118500]
+
+
+def test_snapshot_does_not_block_past_deadline(tmp_path, monkeypatch, gold_source):
+    release = threading.Event()
+    monkeypatch.setattr(commodities, "METALS_DEADLINE", 0.2)
+    monkeypatch.setitem(commodities.METAL_SOURCES, "gold",
+                        (lambda: release.wait(5) and _gold(118500), "Loại vàng", None, "Mua vào", "Bán ra"))
+    service = MetalsService(root=str(tmp_path))
+    try:
+        start = time.perf_counter()
+        snap = service.snapshot(force=True)["gold"]
+        assert time.perf_counter() - start < 1.5
+        assert not snap["ok"] and snap["data"].empty
+    finally:
+        release.set()
+
+
+def test_history_appends_only_when_prices_change(tmp_path, gold_source):
+    service = MetalsService(root=str(tmp_path))
+    for buy in (118500, 118500, 119000, 119000):
+        gold_source[:] = [_gold(buy)]
+        service.snapshot(force=True)
+    assert service.history("gold")["buy"].tolist() == [118500, 119000]
+
+
+def test_history_prunes_rows_past_retention(tmp_path, gold_source):
+    service = MetalsService(root=str(tmp_path), history_days=30)
+    old = (datetime.now() - timedelta(days=40)).isoformat(timespec="seconds")
+    pd.DataFrame({"ts": [old], "product": ["SJC 1L"], "unit": [""], "buy": [100000], "sell": [102000]}) \
+        .to_csv(tmp_path / "gold_history.csv", index=False)
+
+    gold_source[:] = [_gold(118500)]
+    service.snapshot(force=True)
+    assert service.history("gold")["buy"].tolist() == [118500]
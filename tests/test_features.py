@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+
+from backend.features import FeatureStore, tag_frame
+
+
+def _bars(n=120):
+    close = 20 + np.cumsum(np.sin(np.arange(n) / 5))
+    idx = pd.date_range("2026-01-01", periods=n, freq="D")
+    df = pd.DataFrame({"Open": close, "High": close + 1, "Low": close - 1, "Close": close, "Volume": 1000.0}, index=idx)
+    return tag_frame(df, "HPG.VN", "1d")
+
+
+def test_same_bars_hit_the_cache():
+    store = FeatureStore()
+    first = store.get(_bars(), "ema", length=34)
+    second = store.get(_bars(), "ema", length=34)
+    pd.testing.assert_frame_equal(first, second)
+    assert (store.hits, store.misses) == (1, 1)
+
+
+def test_back_adjusted_history_misses_the_cache():
+    store = FeatureStore()
+    df = _bars()
+    before = store.get(df, "ema", length=34).iloc[-1, 0]
+
+    adjusted = df.copy()
+    adjusted.iloc[:-1, :4] *= 0.9  # Yahoo điều chỉnh lại mọi nến trừ nến cuối
+    tag_frame(adjusted, "HPG.VN", "1d")
+    after = store.get(adjusted, "ema", length=34).iloc[-1, 0]
+
+    assert store.misses == 2
+    assert after != before
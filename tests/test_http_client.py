@@ -0,0 +1,58 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from backend.http_client import HttpClient
+
+
+class Handler(BaseHTTPRequestHandler):
+    hits = {}
+
+    def do_GET(self):
+        hits = Handler.hits[self.path] = Handler.hits.get(self.path, 0) + 1
+        if self.path == "/limited" and hits == 1:
+            self.send_response(429)
+            self.send_header("Retry-After", "1")
+        elif self.path == "/banned":
+            self.send_response(429)
+            self.send_header("Retry-After", "3600")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    Handler.hits = {}
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+
+
+def test_retry_after_wait_does_not_hold_host_slot(server):
+    client = HttpClient(host_limit=1, retries=2)
+    limited = threading.Thread(target=lambda: client.get(f"{server}/limited"))
+    limited.start()
+    time.sleep(0.3)  # /limited đang chờ Retry-After
+    start = time.perf_counter()
+    assert client.get(f"{server}/ok").status_code == 200
+    assert time.perf_counter() - start < 0.5
+    limited.join()
+    assert Handler.hits["/limited"] == 2
+    assert client.stats()["127.0.0.1"]["retries"] == 1
+
+
+def test_long_retry_after_returns_immediately(server):
+    client = HttpClient(host_limit=1, retries=2)
+    start = time.perf_counter()
+    assert client.get(f"{server}/banned").status_code == 429
+    assert time.perf_counter() - start < 1
+    assert Handler.hits["/banned"] == 1
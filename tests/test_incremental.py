@@ -0,0 +1,169 @@
+import json
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.features import tag_frame
+from backend.incremental import IndicatorState, IndicatorStateStore
+from backend.logic import TechnicalAnalyzer, analyze_smart_v36
+
+COLUMNS = ["SUPERT_10_3.0", "EMA_34", "EMA_89", "EMA_200", "ISA_9", "ISB_26", "ITS_9", "IKS_26",
+           "BBL_20_2.0", "BBM_20_2.0", "BBU_20_2.0", "ATRr_14", "RSI_14"]
+
+
+def make_bars(n: int = 320, seed: int = 7) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = 25_000 * np.exp(np.cumsum(rng.normal(0, 0.018, n)))
+    spread = close * rng.uniform(0.002, 0.03, n)
+    open_ = close * (1 + rng.normal(0, 0.006, n))
+    return pd.DataFrame({
+        "Open": open_,
+        "High": np.maximum(open_, close) + spread,
+        "Low": np.minimum(open_, close) - spread,
+        "Close": close,
+        "Volume": rng.integers(100_000, 5_000_000, n).astype(float),
+    }, index=pd.bdate_range("2024-01-02", periods=n, name="Date"))
+
+
+def batch_latest(df: pd.DataFrame) -> pd.Series:
+    return TechnicalAnalyzer(df.copy()).add_indicators().iloc[-1]
+
+
+def assert_matches_batch(latest: dict, df: pd.DataFrame) -> None:
+    batch = batch_latest(df)
+    for col in COLUMNS:
+        if col not in batch.index or pd.isna(batch[col]):
+            assert col not in latest or np.isnan(latest[col]), col
+        else:
+            assert latest[col] == pytest.approx(batch[col], rel=1e-9), col
+
+
+@pytest.mark.parametrize("length", [60, 120, 230, 320])
+def test_bar_by_bar_matches_batch_rebuild(length):
+    df = make_bars()
+    state = IndicatorState()
+    for ts, bar in zip(df.index[:length], df.iloc[:length].to_dict("records")):
+        latest = state.update(bar, ts)
+    assert state.n == length
+    assert_matches_batch(latest, df.iloc[:length])
+
+
+def test_intraday_revise_replaces_last_bar():
+    df = make_bars()
+    state = IndicatorState.from_history(df.iloc[:-1])
+    last_ts, final = df.index[-1], df.iloc[-1].to_dict()
+
+    # Nến đang chạy được cập nhật nhiều lần trong phiên, lần cuối = nến đóng cửa
+    for factor in (0.97, 1.04, 1.0):
+        state.update({k: v * factor for k, v in final.items()}, last_ts)
+
+    assert state.n == len(df)
+    assert state.latest() == pytest.approx(IndicatorState.from_history(df).latest(), rel=1e-12)
+    assert_matches_batch(state.latest(), df)
+
+
+def test_older_bar_is_ignored():
+    df = make_bars(80)
+    state = IndicatorState.from_history(df)
+    before = state.latest()
+    state.update(df.iloc[10].to_dict(), df.index[10])
+    assert state.n == len(df) and state.latest() == before
+
+
+def test_json_round_trip_then_continue():
+    df = make_bars()
+    state = IndicatorState.from_history(df.iloc[:250])
+    restored = IndicatorState.from_dict(json.loads(json.dumps(state.to_dict())))
+
+    assert restored.latest() == pytest.approx(state.latest(), rel=0, abs=0)
+    restored.sync(df)
+    assert restored.n == len(df)
+    assert_matches_batch(restored.latest(), df)
+
+
+def test_store_advances_only_new_bars_and_rebuilds_on_adjusted_history(tmp_path):
+    df = make_bars()
+    store = IndicatorStateStore(root=str(tmp_path))
+    store.sync("HPG.VN", df.iloc[:300])
+
+    state = store.sync("HPG.VN", df)
+    assert state.n == len(df)
+    assert_matches_batch(state.latest(), df)
+
+    # Bản trên đĩa dùng được sau restart
+    reloaded = IndicatorStateStore(root=str(tmp_path)).load("HPG.VN")
+    assert reloaded.n == len(df) and reloaded.matches(df)
+
+    # Chia cổ tức: Yahoo điều chỉnh toàn bộ giá cũ -> dựng lại, không nối tiếp trạng thái cũ
+    adjusted = df.copy()
+    adjusted.loc[:, ["Open", "High", "Low", "Close"]] *= 0.95
+    assert not state.matches(adjusted)
+    assert_matches_batch(store.sync("HPG.VN", adjusted).latest(), adjusted)
+
+    # Period dài hơn (df bắt đầu trước nến đầu của trạng thái) -> dựng lại từ đầu chuỗi dài hơn
+    store.sync("HPG.VN", adjusted.iloc[5:])
+    assert_matches_batch(store.sync("HPG.VN", adjusted).latest(), adjusted)
+
+
+def test_store_sliding_window_appends_without_rebuild(tmp_path, monkeypatch):
+    full = make_bars(322)
+    store = IndicatorStateStore(root=str(tmp_path))
+    store.sync("HPG.VN", full.iloc[:320])
+
+    def no_rebuild(df):
+        raise AssertionError("rebuilt from history")
+    monkeypatch.setattr(IndicatorState, "from_history", staticmethod(no_rebuild))
+
+    # Period "2y" trượt 1 ngày + nến EOD mới -> nối tiếp O(1), giữ khởi tạo từ chuỗi cũ
+    for end in (321, 322):
+        state = store.sync("HPG.VN", full.iloc[end - 320:end])
+        assert state.n == end
+    assert_matches_batch(state.latest(), full)
+
+    # Cửa sổ trượt nhưng giá cũ bị điều chỉnh -> mốc neo lệch -> phải dựng lại
+    adjusted = full.iloc[3:].copy()
+    adjusted.loc[:, ["Open", "High", "Low", "Close"]] *= 0.95
+    assert not state.matches(adjusted)
+
+
+def test_store_rebuild_does_not_block_other_symbols(tmp_path, monkeypatch):
+    store = IndicatorStateStore(root=str(tmp_path))
+    slow_df, fast_df = make_bars(seed=1), make_bars(seed=2)
+    entered, release = threading.Event(), threading.Event()
+    rebuild = IndicatorState.from_history
+
+    def gated(df):
+        if df is slow_df:
+            entered.set()
+            release.wait(5)
+        return rebuild(df)
+    monkeypatch.setattr(IndicatorState, "from_history", staticmethod(gated))
+
+    worker = threading.Thread(target=store.sync, args=("AAA.VN", slow_df))
+    worker.start()
+    try:
+        assert entered.wait(5)
+        start = time.perf_counter()
+        assert store.sync("BBB.VN", fast_df).n == len(fast_df)
+        assert time.perf_counter() - start < 2
+    finally:
+        release.set()
+        worker.join()
+    assert store.load("AAA.VN").n == len(slow_df)
+
+
+def test_analyze_smart_v36_uses_state_for_tagged_frames(tmp_path, monkeypatch):
+    import backend.logic as logic
+    monkeypatch.setattr(logic, "INDICATOR_STATES", IndicatorStateStore(root=str(tmp_path)))
+    df = make_bars()
+
+    expected = TechnicalAnalyzer(df.copy()).analyze()
+    result = analyze_smart_v36(tag_frame(df.copy(), "TEST.VN", "1d"))
+
+    assert result["action"] == expected["action"]
+    assert result["score"] == pytest.approx(expected["score"])
+    assert result["stop"] == pytest.approx(expected["stop"])
+    assert logic.INDICATOR_STATES.load("TEST.VN").n == len(df)
@@ -0,0 +1,219 @@
+"""
+Đối chiếu các kernel NumPy với công thức tham chiếu viết bằng pandas
+(bám theo mã nguồn pandas_ta 0.3.x, nhánh không dùng TA-Lib) và vài giá trị tính tay;
+đối chiếu thêm với thư viện pandas_ta / pandas-ta-classic nếu đã cài.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend import indicators as ind
+from backend.indicators import indicator_frame
+
+
+@pytest.fixture(scope="module")
+def bars() -> pd.DataFrame:
+    rng = np.random.default_rng(42)
+    n = 400
+    close = 30_000 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+    spread = close * rng.uniform(0.001, 0.03, n)
+    open_ = close * (1 + rng.normal(0, 0.005, n))
+    return pd.DataFrame({
+        "Open": open_,
+        "High": np.maximum(open_, close) + spread,
+        "Low": np.minimum(open_, close) - spread,
+        "Close": close,
+        "Volume": rng.integers(1e5, 5e6, n).astype(float),
+    }, index=pd.bdate_range("2023-01-02", periods=n))
+
+
+# --- Công thức tham chiếu (pandas thuần) ---
+
+def ref_ema(close: pd.Series, length: int) -> pd.Series:
+    seeded = close.copy()
+    seeded.iloc[:length - 1] = np.nan
+    seeded.iloc[length - 1] = close.iloc[:length].mean()
+    return seeded.ewm(span=length, adjust=False).mean()
+
+
+def ref_rma(x: pd.Series, length: int) -> pd.Series:
+    return x.ewm(alpha=1.0 / length, min_periods=length).mean()
+
+
+def ref_true_range(df: pd.DataFrame) -> pd.Series:
+    prev_close = df["Close"].shift(1)
+    ranges = pd.concat([df["High"] - df["Low"], df["High"] - prev_close, prev_close - df["Low"]], axis=1)
+    tr = ranges.abs().max(axis=1)
+    tr.iloc[0] = np.nan
+    return tr
+
+
+def ref_supertrend(df: pd.DataFrame, length: int, mult: float) -> pd.Series:
+    hl2 = (df["High"] + df["Low"]) / 2
+    matr = mult * ref_rma(ref_true_range(df), length)
+    upper, lower = (hl2 + matr).to_numpy(), (hl2 - matr).to_numpy()
+    close = df["Close"].to_numpy()
+    direction = np.ones(len(df))
+    trend = np.full(len(df), np.nan)
+    for i in range(1, len(df)):
+        if close[i] > upper[i - 1]:
+            direction[i] = 1
+        elif close[i] < lower[i - 1]:
+            direction[i] = -1
+        else:
+            direction[i] = direction[i - 1]
+            if direction[i] > 0 and lower[i] < lower[i - 1]: lower[i] = lower[i - 1]
+            if direction[i] < 0 and upper[i] > upper[i - 1]: upper[i] = upper[i - 1]
+        trend[i] = lower[i] if direction[i] > 0 else upper[i]
+    return pd.Series(trend, index=df.index)
+
+
+def midprice(df: pd.DataFrame, length: int) -> pd.Series:
+    return 0.5 * (df["Low"].rolling(length).min() + df["High"].rolling(length).max())
+
+
+def assert_series(actual, expected, rel=1e-10):
+    actual = np.asarray(actual, dtype=float)
+    expected = np.asarray(expected, dtype=float)
+    np.testing.assert_array_equal(np.isnan(actual), np.isnan(expected))
+    mask = ~np.isnan(expected)
+    np.testing.assert_allclose(actual[mask], expected[mask], rtol=rel)
+
+
+# --- Giá trị cố định ---
+
+def test_fixed_reference_values():
+    x = np.arange(1.0, 11.0)
+    assert_series(ind.sma(x, 3), [np.nan, np.nan, 2, 3, 4, 5, 6, 7, 8, 9])
+    # EMA(3): seed = SMA(1,2,3) = 2, alpha = 0.5 -> 3, 4, ... (chuỗi tuyến tính trễ 1)
+    assert_series(ind.ema(x, 3), [np.nan, np.nan, 2, 3, 4, 5, 6, 7, 8, 9])
+    # RSI của chuỗi chỉ tăng = 100
+    assert ind.rsi(x, 3)[-1] == pytest.approx(100.0)
+    # True Range: nến đầu NaN, sau đó max(|H-L|, |H-Cp|, |Cp-L|)
+    tr = ind.true_range([10, 12, 11], [8, 9, 7], [9, 11, 8])
+    assert_series(tr, [np.nan, 3, 4])
+    # RMA(2) của [2, 4]: ewm adjust=True -> (4 + 0.5*2) / 1.5
+    assert ind.rma([2.0, 4.0], 2)[-1] == pytest.approx(10 / 3)
+
+
+# --- Đối chiếu với công thức pandas ---
+
+@pytest.mark.parametrize("length", [20, 50])
+def test_sma(bars, length):
+    assert_series(indicator_frame(bars, "sma", length=length)[f"SMA_{length}"], bars["Close"].rolling(length).mean())
+
+
+@pytest.mark.parametrize("length", [34, 89, 200])
+def test_ema(bars, length):
+    assert_series(indicator_frame(bars, "ema", length=length)[f"EMA_{length}"], ref_ema(bars["Close"], length))
+
+
+def test_atr(bars):
+    assert_series(indicator_frame(bars, "atr", length=14)["ATRr_14"], ref_rma(ref_true_range(bars), 14))
+
+
+def test_rsi(bars):
+    diff = bars["Close"].diff()
+    pos, neg = ref_rma(diff.clip(lower=0), 14), ref_rma(diff.clip(upper=0), 14)
+    assert_series(indicator_frame(bars, "rsi", length=14)["RSI_14"], 100 * pos / (pos + neg.abs()))
+
+
+def test_bbands(bars):
+    out = indicator_frame(bars, "bbands", length=20, std=2)
+    mid = bars["Close"].rolling(20).mean()
+    dev = 2 * bars["Close"].rolling(20).std(ddof=0)
+    assert_series(out["BBM_20_2.0"], mid)
+    assert_series(out["BBL_20_2.0"], mid - dev, rel=1e-9)
+    assert_series(out["BBU_20_2.0"], mid + dev, rel=1e-9)
+    assert_series(out["BBB_20_2.0"], 100 * (2 * dev) / mid, rel=1e-8)
+    assert_series(out["BBP_20_2.0"], (bars["Close"] - (mid - dev)) / (2 * dev), rel=1e-7)
+
+
+def test_supertrend(bars):
+    out = indicator_frame(bars, "supertrend", length=10, multiplier=3)
+    assert_series(out["SUPERT_10_3.0"], ref_supertrend(bars, 10, 3.0))
+    direction = out["SUPERTd_10_3.0"]
+    assert set(direction.unique()) <= {1.0, -1.0}
+    trend = out["SUPERT_10_3.0"]
+    assert_series(out["SUPERTl_10_3.0"].iloc[1:], trend.where(direction > 0).iloc[1:])
+    assert_series(out["SUPERTs_10_3.0"].iloc[1:], trend.where(direction < 0).iloc[1:])
+
+
+def test_ichimoku(bars):
+    out = indicator_frame(bars, "ichimoku", tenkan=9, kijun=26, senkou=52)
+    tenkan, kijun = midprice(bars, 9), midprice(bars, 26)
+    assert_series(out["ITS_9"], tenkan)
+    assert_series(out["IKS_26"], kijun)
+    assert_series(out["ISA_9"], (0.5 * (tenkan + kijun)).shift(26))
+    assert_series(out["ISB_26"], midprice(bars, 52).shift(26))
+    assert_series(out["ICS_26"], bars["Close"].shift(-26))
+
+
+def test_not_enough_bars_returns_none(bars):
+    assert indicator_frame(bars.iloc[:30], "ema", length=34) is None
+    assert indicator_frame(bars.iloc[:40], "ichimoku", tenkan=9, kijun=26, senkou=52) is None
+    with pytest.raises(ValueError):
+        indicator_frame(bars, "macd")
+
+
+def test_panel_matches_single_symbol(bars):
+    # Panel 2D (thời gian x mã) phải cho đúng kết quả từng mã, kể cả mã niêm yết muộn (NaN đầu chuỗi)
+    late = bars.copy()
+    late.iloc[:60] = np.nan
+    H = np.column_stack([bars["High"], late["High"]])
+    L = np.column_stack([bars["Low"], late["Low"]])
+    C = np.column_stack([bars["Close"], late["Close"]])
+    for j, df in enumerate((bars, late)):
+        assert_series(ind.ema(C, 34)[:, j], ind.ema(df["Close"].to_numpy(), 34))
+        assert_series(ind.atr(H, L, C, 14)[:, j], ind.atr(df["High"], df["Low"], df["Close"], 14))
+        assert_series(ind.rsi(C, 14)[:, j], ind.rsi(df["Close"], 14))
+        assert_series(ind.supertrend(H, L, C, 10, 3.0)[0][:, j], ind.supertrend(df["High"], df["Low"], df["Close"], 10, 3.0)[0])
+
+
+# --- Đối chiếu với thư viện pandas_ta (bỏ qua nếu chưa cài) ---
+
+def _pandas_ta():
+    """(module, seeding): pandas_ta 0.3.x khởi tạo RMA bằng ewm(adjust=True) như kernel; bản classic bằng SMA."""
+    try:
+        import pandas_ta
+        return pandas_ta, "ewm"
+    except ImportError:
+        return pytest.importorskip("pandas_ta_classic"), "sma"
+
+
+def _library_frames(ta, df):
+    h, l, c = df["High"], df["Low"], df["Close"]
+    return {
+        ("sma", (("length", 20),)): ta.sma(c, length=20).to_frame("SMA_20"),
+        ("ema", (("length", 34),)): ta.ema(c, length=34).to_frame(),
+        ("bbands", (("length", 20), ("std", 2))): ta.bbands(c, length=20, std=2),
+        ("ichimoku", (("tenkan", 9), ("kijun", 26), ("senkou", 52))): ta.ichimoku(h, l, c, tenkan=9, kijun=26, senkou=52)[0],
+        ("atr", (("length", 14),)): ta.atr(h, l, c, length=14).to_frame(),
+        ("rsi", (("length", 14),)): ta.rsi(c, length=14).to_frame(),
+        ("supertrend", (("length", 10), ("multiplier", 3))): ta.supertrend(h, l, c, length=10, multiplier=3),
+    }
+
+
+RMA_KINDS = {"atr", "rsi", "supertrend"}
+
+
+@pytest.mark.filterwarnings("ignore::DeprecationWarning")  # ichimoku() trả tuple (pandas-ta-classic)
+def test_parity_with_pandas_ta(bars):
+    ta, seeding = _pandas_ta()
+    for (kind, params), expected in _library_frames(ta, bars).items():
+        actual = indicator_frame(bars, kind, **dict(params))
+        for col in actual.columns:
+            if col not in expected.columns: continue
+            a, b = actual[col], expected[col].astype(float)
+            if kind in RMA_KINDS and seeding == "sma":
+                # Khởi tạo RMA khác nhau -> chỉ so phần đã hội tụ (sai số ~ (13/14)^n)
+                a, b = a.iloc[250:], b.iloc[250:]
+                np.testing.assert_allclose(a.to_numpy(float), b.to_numpy(float), rtol=1e-6, err_msg=col)
+            else:
+                assert_series(a, b, rel=1e-9)
+
+
+def test_benchmark_reports_every_kernel():
+    results = ind.benchmark(n_bars=120, n_symbols=3, repeat=1)
+    assert len(results) == len(ind.KERNEL_SPECS)
+    assert all(r["single_bars_per_sec"] > 0 and r["panel_bars_per_sec"] > 0 for r in results.values())
@@ -0,0 +1,23 @@
+from datetime import date
+
+from backend.market_clock import check_holiday_coverage, clock_for_symbol
+
+
+def test_vn_ticker_resolves_listing_exchange():
+    assert clock_for_symbol("HPG.VN").name == "hose"
+    assert clock_for_symbol("SHS.VN").name == "hnx"
+    assert clock_for_symbol("BSR.VN").name == "upcom"
+    assert clock_for_symbol("ZZZ.VN").name == "hose"
+
+
+def test_upcom_closes_later_than_hose():
+    day = date(2026, 3, 10)  # thứ Ba
+    assert clock_for_symbol("BSR.VN").trading_hours(day)[1].strftime("%H:%M") == "15:00"
+    assert clock_for_symbol("HPG.VN").trading_hours(day)[1].strftime("%H:%M") == "14:45"
+
+
+def test_holiday_coverage_warns_for_missing_year():
+    assert check_holiday_coverage(date(2026, 5, 5)) == []
+    missing = check_holiday_coverage(date(2026, 12, 5))
+    assert {m.split(":")[0] for m in missing} == {"hose", "hnx", "upcom"}
+    assert all(m.endswith(":2027") for m in missing)
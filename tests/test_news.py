@@ -0,0 +1,67 @@
+import pytest
+
+from backend import news
+from backend.news import FeedCache, NewsFetcher
+from backend.news_index import NewsIndex
+
+URL = "https://news.google.com/rss/search?q=HPG"
+
+RSS = """<?xml version="1.0"?><rss version="2.0"><channel><title>t</title>
+<item><title>HPG chia cổ tức tiền mặt</title><link>https://a.vn/1</link>
+<pubDate>Fri, 16 Oct 2026 08:00:00 GMT</pubDate><description>Hòa Phát</description></item>
+</channel></rss>"""
+
+
+class ScriptedProvider:
+    """fetch_conditional trả lần lượt các phản hồi đã định; ghi lại validator được gửi."""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.sent = []
+
+    def fetch_conditional(self, url, etag=None, last_modified=None, timeout=10):
+        self.sent.append((etag, last_modified))
+        response = self.responses.pop(0)
+        if isinstance(response, Exception): raise response
+        return response
+
+
+@pytest.fixture
+def fetcher(tmp_path):
+    return NewsFetcher(max_workers=2, cache=FeedCache(str(tmp_path / "feeds")),
+                       index=NewsIndex(str(tmp_path / "index.sqlite")))
+
+
+def _use(monkeypatch, *responses):
+    provider = ScriptedProvider(responses)
+    monkeypatch.setattr(news, "get_provider", lambda: provider)
+    return provider
+
+
+def test_not_modified_returns_cached_items(fetcher, monkeypatch):
+    provider = _use(monkeypatch, (200, RSS, '"v1"', "Fri, 16 Oct 2026 08:00:00 GMT"), (304, "", '"v1"', None))
+    first = fetcher.fetch_feed(URL)
+    assert [i["title"] for i in first] == ["HPG chia cổ tức tiền mặt"]
+
+    assert fetcher.fetch_feed(URL) == first
+    assert provider.sent[1] == ('"v1"', "Fri, 16 Oct 2026 08:00:00 GMT")
+    assert fetcher.stats()["not_modified"] == 1 and fetcher.stats()["parsed"] == 1
+
+
+def test_unchanged_body_skips_parsing(fetcher, monkeypatch):
+    _use(monkeypatch, (200, RSS, None, None), (200, RSS, None, None))
+    parses = []
+    real_parse = news.parse_feed
+    monkeypatch.setattr(news, "parse_feed", lambda text: parses.append(text) or real_parse(text))
+
+    first = fetcher.fetch_feed(URL)
+    assert fetcher.fetch_feed(URL) == first
+    assert len(parses) == 1
+    assert fetcher.stats()["unchanged"] == 1
+
+
+def test_network_error_falls_back_to_saved_feed(fetcher, monkeypatch):
+    _use(monkeypatch, (200, RSS, None, None), OSError("timeout"))
+    first = fetcher.fetch_feed(URL)
+    assert fetcher.fetch_feed(URL) == first
+    assert fetcher.stats()["errors"] == 1
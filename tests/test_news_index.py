@@ -0,0 +1,41 @@
+import time
+
+from backend.news_index import NewsIndex
+
+
+def _item(n, title, summary="", ts=None):
+    return {"link": f"https://a.vn/{n}", "title": title, "summary": summary, "source": "VnExpress",
+            "published": "", "published_ts": ts if ts is not None else time.time() - n * 3600}
+
+
+ITEMS_HPG = [_item(1, "Hòa Phát chia cổ tức tiền mặt"), _item(2, "HPG: tức thời cổ phiếu tăng")]
+ITEMS_FPT = [_item(3, "FPT chốt quyền cổ tức"), _item(1, "Hòa Phát chia cổ tức tiền mặt")]
+
+
+def _filled(index: NewsIndex) -> NewsIndex:
+    assert index.add("HPG.VN", ITEMS_HPG) == 2
+    assert index.add("FPT", ITEMS_FPT) == 1   # tin trùng link chỉ được gắn thêm mã
+    return index
+
+
+def test_phrase_and_symbol_search(tmp_path):
+    index = _filled(NewsIndex(str(tmp_path / "index.sqlite")))
+
+    hits = index.search("cổ tức")
+    assert [h["link"] for h in hits] == ["https://a.vn/1", "https://a.vn/3"]
+    assert hits[0]["symbols"] == ["FPT", "HPG"]
+    # 'tức thời cổ phiếu' có đủ 2 từ nhưng không chứa cụm 'cổ tức' liền nhau
+    assert [h["link"] for h in index.search("cổ tức", symbols=["HPG"])] == ["https://a.vn/1"]
+    assert len(index.search("cổ tức", phrase=False, symbols=["HPG"])) == 2
+    assert [h["link"] for h in index.search("cổ tức", symbols=["FPT"], days=1.5 / 24)] == ["https://a.vn/1"]
+    assert [h["link"] for h in index.feed("HPG")] == ["https://a.vn/1", "https://a.vn/2"]
+    assert index.stats()["items"] == 3
+
+
+def test_unwritable_path_falls_back_to_memory(tmp_path):
+    blocker = tmp_path / "not_a_dir"
+    blocker.write_text("x")
+    index = _filled(NewsIndex(str(blocker / "index.sqlite")))
+    assert index.path.startswith("file:") and "mode=memory" in index.path
+    assert [h["link"] for h in index.search("cổ tức", symbols=["FPT"])] == ["https://a.vn/1", "https://a.vn/3"]
+    assert index.stats()["symbols"] == 2
@@ -0,0 +1,32 @@
+from datetime import datetime
+
+import pandas as pd
+
+import backend.data as data
+from backend import prewarm
+from backend.market_clock import get_clock
+from backend.prewarm import Prewarmer, ViewCounter, upcoming_runs
+
+HOSE = get_clock("hose")
+
+
+def _at(text: str) -> datetime:
+    return HOSE.localize(datetime.fromisoformat(text))
+
+
+def test_open_run_is_scheduled_inside_the_grace_window():
+    runs = upcoming_runs(HOSE, now=_at("2026-10-16 07:00"), lead_min=30, after_min=5, open_delay_min=1)
+    assert [(when.strftime("%H:%M"), label) for when, label in runs[:3]] == [
+        ("08:30", "pre-open"), ("09:01", "open"), ("15:05", "post-close")]
+
+
+def test_open_run_rescans_radar(monkeypatch, tmp_path):
+    calls = []
+    monkeypatch.setattr(data, "warm_market_indices", lambda: 0)
+    monkeypatch.setattr(data, "iter_pro_data", lambda batch, refresh=False: calls.append(refresh) or iter([pd.DataFrame({"Symbol": batch})]))
+    monkeypatch.setattr(prewarm, "PREWARM_MIN_GAP", 0)
+    warmer = Prewarmer(exchanges=["HNX"], top=0, rate=1e6, views=ViewCounter(str(tmp_path / "views.json")))
+
+    warmer.run("pre-open")
+    warmer.run("open")
+    assert set(calls[:2]) == {False} and set(calls[2:]) == {True}
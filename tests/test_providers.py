@@ -0,0 +1,107 @@
+import os
+import time
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from backend import providers
+from backend.incremental import INDICATOR_STATES
+from backend.providers import DataProvider, isolated_stores, run_load_test
+from backend.screener import FUNDAMENTALS_STORE
+from backend.store import OHLCV_STORE
+
+
+def _bars(n=300):
+    idx = pd.bdate_range(end=pd.Timestamp.today().normalize() - pd.Timedelta(days=1), periods=n)
+    close = 20 + np.cumsum(np.sin(np.arange(n) / 7))
+    return pd.DataFrame({"Open": close, "High": close + 1, "Low": close - 1, "Close": close,
+                         "Volume": 1e5, "Dividends": 0.0, "Stock Splits": 0.0}, index=idx)
+
+
+class CountingProvider(DataProvider):
+    def __init__(self):
+        self.calls = Counter()
+
+    def history(self, ticker, period=None, interval="1d", start=None):
+        self.calls["history"] += 1
+        df = _bars()
+        return df[df.index >= pd.Timestamp(start)] if start is not None else df
+
+    def download(self, tickers, period="5d", interval="1d"):
+        self.calls["download"] += 1
+        return pd.concat({t: _bars()[["Open", "High", "Low", "Close", "Volume"]] for t in tickers}, axis=1)
+
+    def info(self, ticker):
+        self.calls["info"] += 1
+        return {"sector": "Basic Materials"}
+
+    def statements(self, ticker):
+        self.calls["statements"] += 1
+        cols = pd.to_datetime(["2026-06-30", "2026-03-31"])
+        return (pd.DataFrame([[100.0, 90.0]], index=["Total Revenue"], columns=cols),
+                pd.DataFrame([[500.0, 480.0]], index=["Total Assets"], columns=cols), pd.DataFrame())
+
+    def actions(self, ticker):
+        self.calls["actions"] += 1
+        return pd.Series(dtype=float), pd.Series(dtype=float)
+
+
+def test_load_test_rounds_reach_the_provider_and_leave_real_stores_alone(monkeypatch):
+    roots = [OHLCV_STORE.root, FUNDAMENTALS_STORE.root, INDICATOR_STATES.root]
+    existed = [os.path.exists(r) and sorted(os.listdir(r)) for r in roots]
+    provider = CountingProvider()
+    per_round = []
+    original = providers.reset_stores
+
+    def counting_reset():
+        per_round.append(dict(provider.calls))
+        original()
+
+    monkeypatch.setattr(providers, "reset_stores", counting_reset)
+    results = run_load_test(["HPG", "FPT"], deep_dive=["HPG"], rounds=3, provider=provider)
+    per_round.append(dict(provider.calls))
+
+    assert [r["radar_rows"] for r in results] == [2, 2, 2]
+    deltas = [{k: per_round[i + 1].get(k, 0) - per_round[i].get(k, 0) for k in per_round[-1]} for i in range(3)]
+    assert deltas[0] == deltas[1] == deltas[2]
+    assert deltas[0]["statements"] == 1 and deltas[0]["history"] >= 1
+    assert [OHLCV_STORE.root, FUNDAMENTALS_STORE.root, INDICATOR_STATES.root] == roots
+    assert [os.path.exists(r) and sorted(os.listdir(r)) for r in roots] == existed
+
+
+def test_isolated_stores_restores_roots_and_cache_backend():
+    from backend.cache import get_default_backend
+    backend = get_default_backend()
+    with isolated_stores() as root:
+        assert OHLCV_STORE.root.startswith(root)
+        assert get_default_backend() is not backend
+    assert not os.path.exists(root)
+    assert get_default_backend() is backend
+
+
+class SlowTicker:
+    DELAY = 0.2
+
+    def __init__(self, ticker):
+        self.ticker = ticker
+
+    def history(self, period=None, interval="1d", auto_adjust=True):
+        time.sleep(self.DELAY)
+        if self.ticker == "BAD.VN": raise RuntimeError("404")
+        return _bars(5).tz_localize("Asia/Ho_Chi_Minh")
+
+
+def test_live_download_runs_concurrent_chunks_in_parallel(monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+    monkeypatch.setattr(providers.yf, "Ticker", SlowTicker)
+    live = providers.LiveProvider(pool_size=8)
+    chunks = [["AAA.VN", "BBB.VN"], ["CCC.VN", "BAD.VN"]]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        frames = list(pool.map(live.download, chunks))
+    # 2 chunk x 2 mã chạy đồng thời: ~1 lượt trễ, không phải 2 (khóa tuần tự) hay 4
+    assert time.perf_counter() - start < 2 * SlowTicker.DELAY
+    assert list(frames[0].columns.get_level_values(0).unique()) == ["AAA.VN", "BBB.VN"]
+    assert list(frames[1].columns.get_level_values(0).unique()) == ["CCC.VN"]
+    assert frames[0].index.tz is None
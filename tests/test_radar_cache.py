@@ -0,0 +1,53 @@
+from datetime import datetime
+
+from backend.cache import MemoryBackend
+from backend.market_clock import get_clock
+from backend.radar_cache import RadarCache
+
+HOSE = get_clock("hose")
+TICKER = "HPG.VN"
+
+
+def _at(text: str) -> datetime:
+    return HOSE.localize(datetime.fromisoformat(text))
+
+
+def _cache_with_row(fetched: str) -> RadarCache:
+    cache = RadarCache(intraday_ttl=300, open_grace=600, backend=MemoryBackend())
+    fetched_at = _at(fetched).timestamp()
+    row = {"Symbol": "HPG", "Price": 27.5}
+    cache.backend.set(cache.NAMESPACE, TICKER, ((row, None, fetched_at), fetched_at, fetched_at + cache.RETAIN), cache.MAX_ENTRIES)
+    return cache
+
+
+def test_prewarmed_row_is_served_at_the_open():
+    # Thứ 6 16/10/2026: prewarm 08:30, nhà phân tích quét lúc 09:00 và 09:01
+    cache = _cache_with_row("2026-10-16 08:30")
+    for now in ("2026-10-16 08:59", "2026-10-16 09:00", "2026-10-16 09:01", "2026-10-16 09:09"):
+        rows, stale = cache.partition([TICKER], now=_at(now))
+        assert stale == [] and rows[0]["Symbol"] == "HPG", now
+
+
+def test_prewarmed_row_expires_after_open_grace():
+    cache = _cache_with_row("2026-10-16 08:30")
+    _, stale = cache.partition([TICKER], now=_at("2026-10-16 09:11"))
+    assert stale == [TICKER]
+
+
+def test_post_close_row_is_served_at_next_open():
+    # Lượt post-close 15:05 thứ 6 -> vẫn dùng được lúc mở cửa thứ 2
+    cache = _cache_with_row("2026-10-16 15:05")
+    rows, stale = cache.partition([TICKER], now=_at("2026-10-19 09:00:30"))
+    assert stale == [] and len(rows) == 1
+
+
+def test_row_from_previous_session_is_not_served_at_open():
+    cache = _cache_with_row("2026-10-16 10:00")
+    _, stale = cache.partition([TICKER], now=_at("2026-10-19 09:01"))
+    assert stale == [TICKER]
+
+
+def test_intraday_rows_use_ttl():
+    cache = _cache_with_row("2026-10-16 10:00")
+    assert cache.partition([TICKER], now=_at("2026-10-16 10:04"))[1] == []
+    assert cache.partition([TICKER], now=_at("2026-10-16 10:06"))[1] == [TICKER]
@@ -0,0 +1,92 @@
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from backend import scanner
+from backend.scanner import iter_download_chunks, split_download
+
+
+def bars(n: int = 5, start: str = "2026-10-12", price: float = 10.0) -> pd.DataFrame:
+    idx = pd.bdate_range(start, periods=n)
+    return pd.DataFrame({"Open": price, "High": price + 1, "Low": price - 1, "Close": price, "Volume": 1000.0}, index=idx)
+
+
+def multi(frames: dict) -> pd.DataFrame:
+    """Giống yf.download(group_by='ticker'): cột (ticker, field), ngày hợp nhất giữa các mã."""
+    return pd.concat(frames, axis=1)
+
+
+def test_split_download_multiindex_drops_gaps_and_empty_symbols():
+    raw = multi({"AAA.VN": bars(5), "BBB.VN": bars(3, start="2026-10-14"), "CCC.VN": bars(5) * np.nan})
+    frames = split_download(raw, ["AAA.VN", "BBB.VN", "CCC.VN", "DDD.VN"])
+    assert sorted(frames) == ["AAA.VN", "BBB.VN"]
+    assert len(frames["AAA.VN"]) == 5 and len(frames["BBB.VN"]) == 3
+    assert list(frames["AAA.VN"].columns) == ["Open", "High", "Low", "Close", "Volume"]
+
+
+def test_split_download_single_flat_frame():
+    assert list(split_download(bars(), ["AAA.VN"])) == ["AAA.VN"]
+    assert split_download(pd.DataFrame(), ["AAA.VN"]) == {}
+
+
+def test_one_batch_request_per_chunk_with_per_symbol_fallback():
+    batches, singles = [], []
+
+    def batch_fetcher(symbols, period, interval):
+        batches.append(list(symbols))
+        return {s: bars() for s in symbols if s != "BAD.VN"}
+
+    def fetcher(symbol, period, interval):
+        singles.append(symbol)
+        return bars()
+
+    tickers = [f"S{i:02d}.VN" for i in range(9)] + ["BAD.VN"]
+    results = list(iter_download_chunks(tickers, chunk_size=5, max_workers=2, backoff=0,
+                                        fetcher=fetcher, batch_fetcher=batch_fetcher))
+
+    assert len(batches) == 2 and sorted(sum(batches, [])) == sorted(tickers)
+    assert singles == ["BAD.VN"]
+    received = {s for frames, _ in results for s in frames}
+    assert received == set(tickers)
+    reports = sorted((r for _, r in results), key=lambda r: r["chunk"])
+    assert [r["requests"] for r in reports] == [1, 2]
+    assert scanner.get_last_scan_report() == reports
+
+
+def test_failed_batch_falls_back_to_each_symbol():
+    def batch_fetcher(symbols, period, interval):
+        raise RuntimeError("429 Too Many Requests")
+
+    (frames, report), = iter_download_chunks(["A.VN", "B.VN"], chunk_size=5, backoff=0,
+                                             fetcher=lambda s, p, i: bars(), batch_fetcher=batch_fetcher)
+    assert sorted(frames) == ["A.VN", "B.VN"]
+    assert report["requests"] == 3 and report["missing"] == []
+
+
+def test_fetcher_only_keeps_per_symbol_mode():
+    calls = []
+    (frames, report), = iter_download_chunks(["A.VN", "B.VN"], chunk_size=5,
+                                             fetcher=lambda s, p, i: calls.append(s) or bars())
+    assert calls == ["A.VN", "B.VN"] and report["requests"] == 2
+
+
+def test_stopping_early_cancels_queued_chunks():
+    started = []
+    lock = threading.Lock()
+
+    def batch_fetcher(symbols, period, interval):
+        with lock: started.append(symbols[0])
+        time.sleep(0.05)
+        return {s: bars() for s in symbols}
+
+    tickers = [f"S{i:03d}.VN" for i in range(200)]
+    gen = iter_download_chunks(tickers, chunk_size=5, max_workers=2, batch_fetcher=batch_fetcher,
+                               fetcher=lambda s, p, i: bars())
+    t0 = time.perf_counter()
+    next(gen)
+    gen.close()
+    assert time.perf_counter() - t0 < 1.0
+    time.sleep(0.2)
+    assert len(started) < 10
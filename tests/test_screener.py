@@ -0,0 +1,75 @@
+import pandas as pd
+import pytest
+
+from backend import data, screener
+from backend.screener import FundamentalsStore
+
+QUARTERS = pd.to_datetime(["2026-06-30", "2026-03-31", "2025-12-31", "2025-09-30", "2025-06-30"])
+
+
+class FakeProvider:
+    def __init__(self):
+        self.calls = []
+
+    def info(self, ticker):
+        return {"returnOnEquity": 0.22, "sector": "Basic Materials"}
+
+    def statements(self, ticker):
+        self.calls.append(ticker)
+        fin = pd.DataFrame([[100.0] * 5, [20.0] * 5], index=["Total Revenue", "Net Income"], columns=QUARTERS)
+        bal = pd.DataFrame([[500.0] * 5, [200.0] * 5], index=["Total Assets", "Total Liabilities"], columns=QUARTERS)
+        cash = pd.DataFrame([[30.0] * 5], index=["Operating Cash Flow"], columns=QUARTERS)
+        return fin, bal, cash
+
+
+@pytest.fixture
+def provider(tmp_path, monkeypatch):
+    fake = FakeProvider()
+    store = FundamentalsStore(root=str(tmp_path))
+    monkeypatch.setattr(screener, "get_provider", lambda: fake)
+    monkeypatch.setattr(screener, "FUNDAMENTALS_STORE", store)
+    monkeypatch.setattr(data, "FUNDAMENTALS_STORE", store)
+    return fake
+
+
+def test_deep_dive_and_screener_share_one_store(provider):
+    fin, bal, cash = data._get_statements("HPG.VN")
+    assert list(fin.columns)[0] == "2026-06-30"
+    assert provider.calls == ["HPG.VN"]
+
+    screen = screener.screen_symbols(["HPG"])
+    assert screen["Symbol"].tolist() == ["HPG"]
+    assert provider.calls == ["HPG.VN"]  # không tải lại
+    # Đổi tên cột chỉ trên bản sao, bản ghi trong kho giữ nguyên quý dạng ngày
+    assert isinstance(data.FUNDAMENTALS_STORE.load("HPG")["fin"].columns[0], pd.Timestamp)
+    assert data._warm_statements("HPG.VN") == 0
+
+
+def test_merge_fundamentals_joins_radar_on_symbol(provider):
+    radar = pd.DataFrame({"Symbol": ["HPG", "FPT"], "Price": [27.5, 120.0], "Pct": [1.0, -0.5],
+                          "Signal": ["MUA", "CHỜ"], "Score": [7, 4], "Trend": [[1, 2], [2, 1]]})
+    merged = data.merge_fundamentals(radar)
+    assert merged["Symbol"].tolist() == ["HPG", "FPT"]
+    assert merged["Score"].tolist() == [7, 4]
+    assert merged["F-Score"].notna().all()
+    assert "Health" in merged
+
+
+def test_screen_without_statements_is_empty(provider, monkeypatch):
+    monkeypatch.setattr(FundamentalsStore, "fetch", lambda self, symbol: (_ for _ in ()).throw(OSError("offline")))
+    assert screener.screen_symbols(["HPG"]).empty
+    radar = pd.DataFrame({"Symbol": ["HPG"], "Price": [27.5], "Pct": [1.0], "Signal": ["MUA"], "Score": [7]})
+    assert data.merge_fundamentals(radar)["Symbol"].tolist() == ["HPG"]
+
+
+def test_empty_refetch_keeps_last_good_statements(provider, monkeypatch):
+    store = screener.FUNDAMENTALS_STORE
+    good = store.fetch("HPG")
+    empty = pd.DataFrame()
+    monkeypatch.setattr(provider, "statements", lambda ticker: (empty, empty, empty))
+    record = store.fetch("HPG")
+    assert record["fin"] is good["fin"] and record["fetched_at"] == good["fetched_at"]
+    assert record["failed_at"] >= good["fetched_at"]
+    assert not store.is_stale(record, now=record["failed_at"] + 3600)
+    raw = screener.raw_frame({"HPG": record})
+    assert raw.loc["HPG", "rev"] == 100 and raw.loc["HPG", "assets"] == 500
@@ -0,0 +1,62 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from backend.singleflight import SingleFlight, single_flight
+
+
+def _blocking_fetcher(fail: bool = False):
+    """Fetcher chặn tới khi gate được mở; calls đếm số lượt gọi thật."""
+    calls = []
+    gate = threading.Event()
+
+    def fetch(symbol):
+        calls.append(symbol)
+        gate.wait(5)
+        if fail: raise ValueError("Yahoo down")
+        return {"symbol": symbol}
+
+    return fetch, calls, gate
+
+
+def _call_concurrently(fn, group, gate, n):
+    pool = ThreadPoolExecutor(max_workers=n)
+    futures = [pool.submit(fn, "HPG") for _ in range(n)]
+    # Chờ mọi lượt gọi đã vào nhóm (leader đang chặn) rồi mới mở gate
+    deadline = time.time() + 5
+    while group.stats()["calls"] < n and time.time() < deadline: time.sleep(0.001)
+    gate.set()
+    pool.shutdown(wait=True)
+    return futures
+
+
+def test_concurrent_identical_calls_share_one_execution():
+    group = SingleFlight()
+    fetch, calls, gate = _blocking_fetcher()
+    futures = _call_concurrently(single_flight(fetch, group=group), group, gate, n=8)
+    results = [f.result() for f in futures]
+
+    assert len(calls) == 1
+    assert all(r is results[0] for r in results)
+    assert group.stats() == {"calls": 8, "executions": 1, "coalesced": 7, "in_flight": 0}
+
+
+def test_followers_receive_the_leaders_error():
+    group = SingleFlight()
+    fetch, calls, gate = _blocking_fetcher(fail=True)
+    futures = _call_concurrently(single_flight(fetch, group=group), group, gate, n=4)
+    for f in futures:
+        with pytest.raises(ValueError):
+            f.result()
+    assert len(calls) == 1
+
+
+def test_different_keys_and_later_calls_execute_again():
+    group = SingleFlight()
+    fetch, calls, gate = _blocking_fetcher()
+    gate.set()
+    wrapped = single_flight(fetch, group=group)
+    wrapped("HPG"); wrapped("FPT"); wrapped("HPG")
+    assert calls == ["HPG", "FPT", "HPG"] and group.stats()["coalesced"] == 0
@@ -0,0 +1,79 @@
+import json
+
+import pandas as pd
+import pytest
+
+from backend import store as store_mod
+from backend.store import OHLCVStore
+
+
+class FakeYahoo:
+    """Nguồn nến giả: giá điều chỉnh theo hệ số `factor`, ghi lại từng lượt gọi (full / delta)."""
+
+    def __init__(self, days: int = 30):
+        self.index = pd.bdate_range(end=pd.Timestamp.now().normalize(), periods=days)
+        self.close = pd.Series(range(100, 100 + days), index=self.index, dtype=float)
+        self.dividends = pd.Series(0.0, index=self.index)
+        self.calls = []
+
+    def frame(self) -> pd.DataFrame:
+        return pd.DataFrame({"Open": self.close, "High": self.close + 1, "Low": self.close - 1,
+                             "Close": self.close, "Volume": 1000.0,
+                             "Dividends": self.dividends, "Stock Splits": 0.0})
+
+    def __call__(self, symbol, interval, period, start):
+        self.calls.append("full" if start is None else "delta")
+        df = self.frame()
+        return df if start is None else df[df.index >= pd.Timestamp(start)]
+
+
+@pytest.fixture
+def yahoo():
+    return FakeYahoo()
+
+
+@pytest.fixture
+def ohlcv(tmp_path):
+    return OHLCVStore(root=str(tmp_path))
+
+
+def test_delta_fetch_overlaps_last_completed_bar(ohlcv, yahoo):
+    ohlcv.get("HPG.VN", "1mo", "1d", yahoo)
+    yahoo.close.iloc[-1] += 0.5        # nến phiên đang chạy đổi giá -> không phải điều chỉnh lịch sử
+    df = ohlcv.get("HPG.VN", "1mo", "1d", yahoo)
+    assert yahoo.calls == ["full", "delta"]
+    assert df["Close"].iloc[-1] == yahoo.close.iloc[-1]
+
+
+def test_readjusted_history_triggers_full_refetch(ohlcv, yahoo):
+    ohlcv.get("HPG.VN", "1mo", "1d", yahoo)
+    yahoo.close *= 0.97                # Yahoo điều chỉnh ngược toàn bộ giá cũ
+    df = ohlcv.get("HPG.VN", "1mo", "1d", yahoo)
+    assert yahoo.calls == ["full", "delta", "full"]
+    pd.testing.assert_series_equal(df["Close"], yahoo.close[yahoo.close.index >= df.index[0]], check_names=False)
+
+
+def test_new_dividend_triggers_full_refetch_once(ohlcv, yahoo):
+    ohlcv.get("HPG.VN", "1mo", "1d", yahoo)
+    yahoo.dividends.iloc[-1] = 1000.0   # cổ tức trên nến cuối: giá cũ chưa kịp điều chỉnh
+    ohlcv.get("HPG.VN", "1mo", "1d", yahoo)
+    ohlcv.get("HPG.VN", "1mo", "1d", yahoo)
+    assert yahoo.calls == ["full", "delta", "full", "delta"]
+
+
+def test_periodic_full_refresh(ohlcv, yahoo, monkeypatch):
+    ohlcv.get("HPG.VN", "1mo", "1d", yahoo)
+    monkeypatch.setattr(store_mod, "FULL_REFRESH_DAYS", 0)
+    ohlcv.get("HPG.VN", "1mo", "1d", yahoo)
+    assert yahoo.calls == ["full", "full"]
+
+
+def test_store_without_full_refresh_stamp_is_refetched(ohlcv, yahoo):
+    ohlcv.get("HPG.VN", "1mo", "1d", yahoo)
+    # Manifest do phiên bản cũ ghi (chưa có full_at)
+    _, meta_path = ohlcv._paths("HPG.VN", "1d")
+    with open(meta_path) as f: meta = json.load(f)
+    meta.pop("full_at")
+    with open(meta_path, "w") as f: json.dump(meta, f)
+    ohlcv.get("HPG.VN", "1mo", "1d", yahoo)
+    assert yahoo.calls == ["full", "full"]